@@ -6,4 +6,10 @@ class AccountConfig(AppConfig):
     label = "account"
 
     def ready(self):
+        from cotidia.account.conf import settings
+        settings.load()
+
+        import cotidia.account.checks
         import cotidia.account.signals
+        # Resolve the user model used by the authentication backend once.
+        import cotidia.account.auth
@@ -4,10 +4,31 @@ Custom authentication backends.
 Inspired by http://djangosnippets.org/snippets/2463/
 
 """
+from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
-from cotidia.account.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
-from django.apps import apps
+
+from cotidia.account.cache import get_user_cache
+from cotidia.account.hashing import get_hashing_pool
+from cotidia.account.managers import normalize_email_key
+
+# Resolved once: this module is imported by `AccountConfig.ready`.
+UserModel = get_user_model()
+
+
+def get_lookup_field(username):
+    """Return the user field to match the given login identifier against."""
+
+    # Anything without an `@` can not be an email, skip the validator.
+    if "@" not in username:
+        return "username"
+
+    try:
+        validate_email(username)
+    except ValidationError:
+        return "username"
+    return "email"
 
 
 class EmailBackend(ModelBackend):
@@ -20,35 +41,65 @@ class EmailBackend(ModelBackend):
     supports_anonymous_user = False
     supports_inactive_user = False
 
+    # Columns loaded to authenticate a user, the primary key is always
+    # included. It also covers what is read by the sign in views straight
+    # after authentication to avoid loading deferred fields one by one.
+    authentication_fields = (
+        "password",
+        "is_active",
+        "is_staff",
+        "is_superuser",
+        "last_login",
+        "email",
+        "username",
+        "uuid",
+        "first_name",
+        "last_name",
+        "token_version",
+    )
+
+    def get_authentication_queryset(self):
+        return (
+            UserModel._default_manager.select_related("auth_token")
+            .only(*self.authentication_fields, "auth_token__key", "auth_token__user")
+        )
+
     def authenticate(self, request=None, username=None, password=None):
-        app_label, model_name = settings.AUTH_USER_MODEL.split(".")
-        User = apps.get_model(app_label, model_name)
+        if username is None or password is None:
+            return None
 
-        try:
-            validate_email(username)
-        except:
-            username_is_email = False
+        if get_lookup_field(username) == "email":
+            lookup = {"email_key": normalize_email_key(username)}
         else:
-            username_is_email = True
+            lookup = {"username": username}
 
-        if username_is_email:
-            try:
-                user = User.objects.get(email=username)
-            except User.DoesNotExist:
-                return None
-        else:
-            try:
-                user = User.objects.get(username=username)
-            except User.DoesNotExist:
-                return None
-        if user.check_password(password):
+        try:
+            user = self.get_authentication_queryset().get(**lookup)
+        except UserModel.DoesNotExist:
+            return None
+
+        if get_hashing_pool().check_user_password(user, password):
             return user
         return None
 
-    def get_user(self, user_id):
-        app_label, model_name = settings.AUTH_USER_MODEL.split(".")
-        User = apps.get_model(app_label, model_name)
+    def load_user(self, user_id):
         try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
+            return UserModel._default_manager.get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+
+    def get_user(self, user_id):
+        user_cache = get_user_cache()
+        if user_cache is None:
+            user = self.load_user(user_id)
+        else:
+            user, version = user_cache.get(user_id)
+            if user is None:
+                user = self.load_user(user_id)
+                if user is not None:
+                    user_cache.set(user_id, version, user)
+
+        # Like `ModelBackend`, the sessions of deactivated users are refused.
+        if user is not None and not self.user_can_authenticate(user):
             return None
+        return user
@@ -0,0 +1,90 @@
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+from cotidia.account import tokens
+from cotidia.account.auth import EmailBackend
+from cotidia.account.cache import get_token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication caching the user of each token key.
+
+    A drop-in replacement for
+    `rest_framework.authentication.TokenAuthentication` which skips the
+    token and user lookup for keys seen recently, when `ACCOUNT_TOKEN_CACHE`
+    is set. Cached entries are dropped when the token is deleted or
+    regenerated and when the user is saved, which covers deactivation and
+    password changes.
+    """
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        if token_cache is None:
+            return super().authenticate_credentials(key)
+
+        user, state = token_cache.get(key)
+        if user is not None:
+            return (user, self.get_model()(key=key, user=user))
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, state, user)
+        return (user, token)
+
+
+class AccessTokenAuthentication(BaseAuthentication):
+    """Authenticate with a signed access token.
+
+    Clients should send the token in the "Authorization" HTTP header:
+
+        Authorization: Bearer <access token>
+
+    This is a database backed check: the signature is verified without
+    querying the database, then the user is loaded through
+    `EmailBackend.get_user`, from the user cache when enabled, and checked
+    against the revocation version of the token. Services which should not
+    query the database use `tokens.verify_access_token` instead.
+    """
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_("Invalid token header."))
+
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_("Invalid token header."))
+
+        return self.authenticate_credentials(token)
+
+    def authenticate_credentials(self, token):
+        try:
+            claims = tokens.verify_access_token(token)
+        except tokens.InvalidToken as e:
+            raise exceptions.AuthenticationFailed(str(e))
+
+        user = EmailBackend().get_user(claims["uid"])
+        if user is None:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        try:
+            tokens.check_claims(user, claims)
+        except tokens.InvalidToken as e:
+            raise exceptions.AuthenticationFailed(str(e))
+
+        return (user, claims)
+
+    def authenticate_header(self, request):
+        return self.keyword
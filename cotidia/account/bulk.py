@@ -0,0 +1,237 @@
+"""
+Bulk actions over a selection of users from the admin user lists.
+
+The users are processed by chunks of primary keys. Each action changes a
+chunk with set based queries: one `UPDATE` to activate or deactivate users,
+one insert in the membership table to add groups. Deleted users are
+deactivated and queued as `UserDeletionJob`, see `cotidia.account.deletion`,
+unless `ACCOUNT_USER_DELETION_ASYNC` is off. The invitations of a chunk are
+sent within a transaction, so with the `OutboxEmailBackend` they are queued
+in the outbox together.
+
+`post_save` is not sent for the users changed with `UPDATE`, the
+`user_bulk_action` signal is sent after each chunk instead. The user
+counters and caches are updated here, the caches once the chunk is
+committed.
+
+Selections larger than `ACCOUNT_BULK_ACTION_SYNC_LIMIT` and the invitations
+are saved as a `UserBulkJob`, run with its progress recorded by the
+`run_user_bulk_jobs` command.
+
+"""
+import json
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from cotidia.account import deletion
+from cotidia.account.cache import invalidate_cached_users
+from cotidia.account.conf import settings
+from cotidia.account.counts import SEGMENTS, adjust_counters, batch_counters
+from cotidia.account.models import User, UserBulkJob
+from cotidia.account.search import get_search_backend
+from cotidia.account.signals import user_bulk_action
+
+
+ACTIONS = (
+    "activate",
+    "deactivate",
+    "invite",
+    "add_groups",
+    "remove_groups",
+    "delete",
+)
+
+# Actions sending emails, always run as a job whatever the selection size.
+JOB_ACTIONS = ("invite",)
+
+
+def get_selection(segment=None, search=None, uuids=None, exclude=None):
+    """Return the users of a list filter result or of a selection.
+
+    `exclude` are primary keys of users left out, like the current user.
+    """
+    queryset = User.objects.all()
+    if exclude:
+        queryset = queryset.exclude(pk__in=exclude)
+    if segment is not None:
+        queryset = queryset.filter(SEGMENTS[segment])
+    if search:
+        queryset = get_search_backend().search(queryset, search)
+    if uuids is not None:
+        queryset = queryset.filter(uuid__in=uuids)
+    return queryset
+
+
+class UserBulkAction:
+    """Run `action` over the users of a queryset by chunks of `chunk_size`.
+
+    `groups` are the primary keys of the groups added or removed,
+    `requested_by` the user recorded on the deletion jobs.
+    """
+
+    def __init__(self, action, groups=None, chunk_size=None, requested_by=None):
+        if action not in ACTIONS:
+            raise ValueError("Unknown bulk action: {}".format(action))
+        self.action = action
+        self.groups = list(groups or [])
+        self.requested_by = requested_by
+        self.chunk_size = chunk_size or settings.ACCOUNT_BULK_ACTION_CHUNK_SIZE
+
+    def set_active(self, ids, is_active):
+        changed = User.objects.filter(pk__in=ids, is_active=not is_active).update(
+            is_active=is_active
+        )
+        delta = changed if is_active else -changed
+        adjust_counters({"active": delta, "pending": -delta})
+        invalidate_cached_users(ids)
+        return changed
+
+    def activate(self, ids):
+        changed = self.set_active(ids, True)
+        deletion.cancel_deletion(ids)
+        return changed
+
+    def deactivate(self, ids):
+        return self.set_active(ids, False)
+
+    def invite(self, ids):
+        # Like `UserInvite`, only the active users without password.
+        users = User.objects.filter(pk__in=ids, is_active=True).filter(
+            Q(password="") | Q(password__isnull=True)
+        )
+        count = 0
+        for user in users:
+            user.send_invitation_email()
+            count += 1
+        return count
+
+    def add_groups(self, ids):
+        Membership = User.groups.through
+        existing = set(
+            Membership.objects.filter(
+                user_id__in=ids, group_id__in=self.groups
+            ).values_list("user_id", "group_id")
+        )
+        memberships = [
+            Membership(user_id=user_id, group_id=group_id)
+            for user_id in ids
+            for group_id in self.groups
+            if (user_id, group_id) not in existing
+        ]
+        Membership.objects.bulk_create(memberships)
+        invalidate_cached_users(ids)
+        return len({membership.user_id for membership in memberships})
+
+    def remove_groups(self, ids):
+        Membership = User.groups.through
+        memberships = Membership.objects.filter(
+            user_id__in=ids, group_id__in=self.groups
+        )
+        changed = len(set(memberships.values_list("user_id", flat=True)))
+        memberships.delete()
+        invalidate_cached_users(ids)
+        return changed
+
+    def delete(self, ids):
+        if settings.ACCOUNT_USER_DELETION_ASYNC:
+            self.set_active(ids, False)
+            return deletion.request_deletions(ids, requested_by=self.requested_by)
+
+        with batch_counters():
+            deleted, per_model = User.objects.filter(pk__in=ids).delete()
+        return per_model.get(User._meta.label, 0)
+
+    def run(self, queryset, start_after=0, on_progress=None):
+        """Run the action and return the number of users changed.
+
+        Users with a primary key up to `start_after` are skipped.
+        `on_progress` is called after each chunk with the number of users
+        processed, of users changed and the primary key of the last user.
+        """
+        ids_queryset = queryset.order_by("pk").values_list("pk", flat=True)
+        last_id = start_after
+        processed = affected = 0
+
+        while True:
+            ids = list(ids_queryset.filter(pk__gt=last_id)[:self.chunk_size])
+            if not ids:
+                break
+
+            with transaction.atomic():
+                affected += getattr(self, self.action)(ids)
+            user_bulk_action.send(sender=User, action=self.action, user_ids=ids)
+
+            last_id = ids[-1]
+            processed += len(ids)
+            if on_progress is not None:
+                on_progress(processed, affected, last_id)
+
+        return affected
+
+
+def create_job(action, selection, groups=None, created_by=None, total=None):
+    """Save a job running `action` over the `get_selection` kwargs."""
+    if total is None:
+        total = get_selection(**selection).count()
+    params = {"selection": selection, "groups": list(groups or [])}
+    return UserBulkJob.objects.create(
+        action=action,
+        params=json.dumps(params),
+        total=total,
+        created_by=created_by,
+    )
+
+
+def claim_job(resume=False):
+    """Return the next pending job marked as running, or None.
+
+    With `resume`, jobs left running by an interrupted worker are claimed.
+    """
+    statuses = [UserBulkJob.PENDING]
+    if resume:
+        statuses.append(UserBulkJob.RUNNING)
+
+    with transaction.atomic():
+        job = (
+            UserBulkJob.objects.select_for_update(skip_locked=True)
+            .filter(status__in=statuses)
+            .order_by("created_at", "id")
+            .first()
+        )
+        if job is not None:
+            job.status = UserBulkJob.RUNNING
+            job.save(update_fields=["status"])
+    return job
+
+
+def run_job(job, on_progress=None):
+    """Run a claimed job, recording its progress after each chunk."""
+    params = json.loads(job.params)
+    action = UserBulkAction(
+        job.action, groups=params.get("groups"), requested_by=job.created_by
+    )
+    queryset = get_selection(**params["selection"])
+    processed_before = job.processed
+    affected_before = job.affected
+
+    def record_progress(processed, affected, last_id):
+        job.processed = min(processed_before + processed, job.total)
+        job.affected = affected_before + affected
+        job.last_user_id = last_id
+        job.save(update_fields=["processed", "affected", "last_user_id"])
+        if on_progress is not None:
+            on_progress(job)
+
+    try:
+        action.run(queryset, start_after=job.last_user_id, on_progress=record_progress)
+    except Exception as e:
+        job.status = UserBulkJob.FAILED
+        job.error = "{}: {}".format(type(e).__name__, e)
+    else:
+        job.status = UserBulkJob.DONE
+        job.processed = job.total
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "processed", "finished_at"])
+    return job
@@ -0,0 +1,317 @@
+"""
+Cross-request caches of the users loaded by the authentication backend and
+by the API token authentication.
+
+The caches are disabled unless `ACCOUNT_USER_CACHE` and
+`ACCOUNT_TOKEN_CACHE` are set, either to `"locmem"` for a cache local to the
+process or to the alias of one of the Django caches defined in `CACHES`.
+With several processes, only a shared Django cache sees the invalidations
+made by the other processes.
+
+Cached users are stored under their primary key and a version token. The
+version is replaced whenever the user changes so a request that loaded the
+user before the change can not write a stale copy back. A global generation
+token is replaced when groups or permissions change. The tokens are replaced
+once the transaction making the change is committed.
+
+"""
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import partial
+
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+from cotidia.account.conf import settings
+
+
+DEFAULT_TIMEOUT = object()
+
+
+class LRUCache:
+    """A thread-safe mapping bounded in size and in time.
+
+    The least recently used entries are evicted once `max_entries` is
+    reached and entries expire `timeout` seconds after being set. It follows
+    the subset of the Django cache API used by the account caches.
+    """
+
+    def __init__(self, max_entries=1000, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _get(self, key, now):
+        expires, value = self._data[key]
+        if expires is not None and expires <= now:
+            del self._data[key]
+            raise KeyError(key)
+        self._data.move_to_end(key)
+        return value
+
+    def _set(self, key, value, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.timeout
+        expires = None if timeout is None else time.monotonic() + timeout
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                return self._get(key, time.monotonic())
+            except KeyError:
+                return default
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        values = {}
+        with self._lock:
+            for key in keys:
+                try:
+                    values[key] = self._get(key, now)
+                except KeyError:
+                    pass
+        return values
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        with self._lock:
+            self._set(key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        with self._lock:
+            try:
+                self._get(key, time.monotonic())
+            except KeyError:
+                self._set(key, value, timeout)
+                return True
+            return False
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class UserCache:
+    """Cache users by primary key on top of a Django compatible cache."""
+
+    key_prefix = "account:user"
+
+    def __init__(self, storage, timeout):
+        self.storage = storage
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    def _generation_key(self):
+        return "{}:generation".format(self.key_prefix)
+
+    def _version_key(self, pk):
+        return "{}:version:{}".format(self.key_prefix, pk)
+
+    def _user_key(self, pk, version):
+        return "{}:{}:{}".format(self.key_prefix, pk, version)
+
+    def _get_token(self, key):
+        """Return the token stored under `key`, creating it if missing."""
+        token = uuid.uuid4().hex
+        if self.storage.add(key, token, None):
+            return token
+        return self.storage.get(key, token)
+
+    def get_version(self, pk):
+        generation_key = self._generation_key()
+        version_key = self._version_key(pk)
+        tokens = self.storage.get_many([generation_key, version_key])
+
+        generation = tokens.get(generation_key) or self._get_token(generation_key)
+        version = tokens.get(version_key) or self._get_token(version_key)
+        return "{}:{}".format(generation, version)
+
+    def get(self, pk):
+        """Return a `(user, version)` tuple, `user` is None on a miss.
+
+        The version must be passed back to `set` once the user is loaded.
+        """
+        version = self.get_version(pk)
+        data = self.storage.get(self._user_key(pk, version))
+        if data is None:
+            self.misses += 1
+            return None, version
+        self.hits += 1
+        return pickle.loads(data), version
+
+    def set(self, pk, version, user):
+        # Drop the write if the user changed since the version was read.
+        if self.get_version(pk) != version:
+            return
+        self.storage.set(
+            self._user_key(pk, version),
+            pickle.dumps(user, pickle.HIGHEST_PROTOCOL),
+            self.timeout,
+        )
+
+    def invalidate(self, pk):
+        self.storage.set(self._version_key(pk), uuid.uuid4().hex, None)
+
+    def invalidate_all(self):
+        self.storage.set(self._generation_key(), uuid.uuid4().hex, None)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class TokenCache(UserCache):
+    """Cache the users authenticated by API token key.
+
+    Users are stored under the token key and the version of the user, the
+    same version tokens as `UserCache`, so saving a user only drops its own
+    entries. The user of a key is recorded on the first lookup and the user
+    cached from the second one, its version is then read before the user is
+    loaded and a concurrent change can not write a stale copy.
+    """
+
+    key_prefix = "account:token"
+
+    def _owner_key(self, key):
+        return "{}:owner:{}".format(self.key_prefix, key)
+
+    def _token_key(self, key, version):
+        return "{}:key:{}:{}".format(self.key_prefix, key, version)
+
+    def get(self, key):
+        """Return a `(user, state)` tuple, `user` is None on a miss.
+
+        The state must be passed back to `set` once the user is loaded.
+        """
+        pk = self.storage.get(self._owner_key(key))
+        if pk is None:
+            self.misses += 1
+            return None, None
+
+        version = self.get_version(pk)
+        data = self.storage.get(self._token_key(key, version))
+        if data is None:
+            self.misses += 1
+            return None, (pk, version)
+        self.hits += 1
+        return pickle.loads(data), (pk, version)
+
+    def set(self, key, state, user):
+        self.storage.set(self._owner_key(key), user.pk, self.timeout)
+        if state is None or state[0] != user.pk:
+            return
+        # Drop the write if the user changed since the version was read.
+        if self.get_version(user.pk) != state[1]:
+            return
+        self.storage.set(
+            self._token_key(key, state[1]),
+            pickle.dumps(user, pickle.HIGHEST_PROTOCOL),
+            self.timeout,
+        )
+
+    def invalidate_user(self, pk):
+        super().invalidate(pk)
+
+    def invalidate(self, key, pk=None):
+        """Forget the token key, and the cached users of `pk` if given."""
+        self.storage.delete(self._owner_key(key))
+        if pk is not None:
+            self.invalidate_user(pk)
+
+    def clear(self):
+        self.invalidate_all()
+
+
+_user_cache = None
+_user_cache_lock = threading.Lock()
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    """Return the configured user cache or None if it is disabled."""
+    global _user_cache
+
+    if not settings.ACCOUNT_USER_CACHE:
+        return None
+
+    if _user_cache is None:
+        with _user_cache_lock:
+            if _user_cache is None:
+                if settings.ACCOUNT_USER_CACHE == "locmem":
+                    storage = LRUCache(
+                        max_entries=settings.ACCOUNT_USER_CACHE_MAX_ENTRIES,
+                        timeout=settings.ACCOUNT_USER_CACHE_TIMEOUT,
+                    )
+                else:
+                    storage = caches[settings.ACCOUNT_USER_CACHE]
+                _user_cache = UserCache(
+                    storage, timeout=settings.ACCOUNT_USER_CACHE_TIMEOUT
+                )
+    return _user_cache
+
+
+def get_token_cache():
+    """Return the cache used by `CachedTokenAuthentication` or None if it is
+    disabled."""
+    global _token_cache
+
+    if not settings.ACCOUNT_TOKEN_CACHE:
+        return None
+
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                if settings.ACCOUNT_TOKEN_CACHE == "locmem":
+                    storage = LRUCache(
+                        max_entries=settings.ACCOUNT_TOKEN_CACHE_MAX_ENTRIES,
+                        timeout=settings.ACCOUNT_TOKEN_CACHE_TIMEOUT,
+                    )
+                else:
+                    storage = caches[settings.ACCOUNT_TOKEN_CACHE]
+                _token_cache = TokenCache(
+                    storage, timeout=settings.ACCOUNT_TOKEN_CACHE_TIMEOUT
+                )
+    return _token_cache
+
+
+def invalidate_cached_users(ids):
+    """Invalidate the users changed without `post_save`, like with
+    `QuerySet.update`, once the transaction is committed."""
+    transaction.on_commit(partial(_invalidate_cached_users, list(ids)))
+
+
+def _invalidate_cached_users(ids):
+    user_cache = get_user_cache()
+    token_cache = get_token_cache()
+    for pk in ids:
+        if user_cache is not None:
+            user_cache.invalidate(pk)
+        if token_cache is not None:
+            token_cache.invalidate_user(pk)
+
+
+@receiver(setting_changed)
+def reset_user_cache(sender, setting, **kwargs):
+    global _user_cache, _token_cache
+
+    if setting.startswith("ACCOUNT_USER_CACHE") or setting == "CACHES":
+        _user_cache = None
+    if setting.startswith("ACCOUNT_TOKEN_CACHE") or setting == "CACHES":
+        _token_cache = None
@@ -0,0 +1,38 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+
+from cotidia.account.conf import settings
+
+
+@register()
+def check_hashing_cache(app_configs, **kwargs):
+    """The hashing limit must be counted in a cache shared by the processes."""
+    if settings.ACCOUNT_HASHING_MAX_IN_PROGRESS is None:
+        return []
+    if not isinstance(caches[settings.ACCOUNT_HASHING_CACHE], LocMemCache):
+        return []
+    return [
+        Warning(
+            "ACCOUNT_HASHING_CACHE is a LocMemCache, "
+            "ACCOUNT_HASHING_MAX_IN_PROGRESS limits each process on its own.",
+            hint="Use a cache shared by the processes, like Memcached or Redis.",
+            id="account.W001",
+        )
+    ]
+
+
+@register()
+def check_user_count_cache(app_configs, **kwargs):
+    """The counts to refresh are queued for the `refresh_user_counts` command
+    in a cache it must share with the web processes."""
+    if not isinstance(caches[settings.ACCOUNT_USER_COUNT_CACHE], LocMemCache):
+        return []
+    return [
+        Warning(
+            "ACCOUNT_USER_COUNT_CACHE is a LocMemCache, the counts of the "
+            "filtered user lists are not refreshed by refresh_user_counts.",
+            hint="Use a cache shared by the processes, like Memcached or Redis.",
+            id="account.W002",
+        )
+    ]
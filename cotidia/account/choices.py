@@ -0,0 +1,105 @@
+"""
+Cached choices of the group and permission fields of the admin forms.
+
+Listing every permission with its content type on each form render costs
+thousands of rows on large projects. The `(pk, label)` choices are built
+once, with the labels rendered, and kept in the `ACCOUNT_CHOICES_CACHE`
+cache under a version token. The token is replaced when groups or
+permissions change and after migrations, by the signals of
+`cotidia.account.signals`.
+
+The version token only changes in the cache of the current process when the
+cache is local, like the `LocMemCache` of a default setup. The choices are
+then kept `ACCOUNT_CHOICES_LOCAL_CACHE_TIMEOUT` seconds only, the delay
+before the other processes see a change.
+
+"""
+import uuid
+
+from django import forms
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from cotidia.account.conf import settings
+
+
+VERSION_KEY = "account:choices:version"
+
+
+def get_group_choices():
+    return [(group.pk, str(group)) for group in Group.objects.order_by("name")]
+
+
+def get_permission_choices():
+    permissions = Permission.objects.select_related("content_type")
+    return [(permission.pk, str(permission)) for permission in permissions]
+
+
+CHOICE_LISTS = {"groups": get_group_choices, "permissions": get_permission_choices}
+
+
+def get_cache():
+    return caches[settings.ACCOUNT_CHOICES_CACHE]
+
+
+def get_timeout(cache):
+    timeout = settings.ACCOUNT_CHOICES_CACHE_TIMEOUT
+    if isinstance(cache, LocMemCache):
+        return min(timeout, settings.ACCOUNT_CHOICES_LOCAL_CACHE_TIMEOUT)
+    return timeout
+
+
+def get_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def get_choices(name):
+    """Return the `(pk, label)` choices of the `name` choice list."""
+    cache = get_cache()
+    key = "account:choices:{}:{}".format(name, get_version())
+    choices = cache.get(key)
+    if choices is None:
+        choices = CHOICE_LISTS[name]()
+        cache.set(key, choices, get_timeout(cache))
+    return choices
+
+
+def invalidate():
+    """Make the cached choices stale, they are rebuilt on next use."""
+    get_cache().set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+class CachedChoiceIterator:
+    def __init__(self, name):
+        self.name = name
+
+    def __iter__(self):
+        return iter(get_choices(self.name))
+
+    def __len__(self):
+        return len(get_choices(self.name))
+
+
+class CachedModelMultipleChoiceField(forms.ModelMultipleChoiceField):
+    """A multiple choice field rendering the cached `choice_list`.
+
+    Submitted values are still validated against `queryset`.
+    """
+
+    def __init__(self, queryset, choice_list, **kwargs):
+        self.choice_list = choice_list
+        super().__init__(queryset, **kwargs)
+
+    def _get_choices(self):
+        if hasattr(self, "_choices"):
+            return self._choices
+        return CachedChoiceIterator(self.choice_list)
+
+    choices = property(_get_choices, forms.ChoiceField._set_choices)
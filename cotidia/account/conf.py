@@ -1,4 +1,17 @@
-from django.conf import settings
+"""
+Settings of the account app.
+
+The `ACCOUNT_*` settings are read from `settings`, an immutable snapshot
+built when the app is ready and rebuilt when a setting changes, instead of
+through the lazy settings object on every access. Other settings are read
+from Django's settings.
+
+"""
+from types import MappingProxyType
+
+from django.conf import settings as django_settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
 from appconf import AppConf
 
@@ -20,13 +33,152 @@ class AccountConf(AppConf):
     # Force all admin users to sign in using two-factor authentication.
     # Only applies if `ENABLE_TWO_FACTOR` is set to `True`.
     FORCE_ADMIN_TWO_FACTOR = False
+    # Path prefixes skipped by `AccountMiddleware`, like "/static/" or
+    # "/api/", the user is not loaded for them.
+    MIDDLEWARE_EXEMPT_PATHS = []
 
-    # Define the profile model to use if any
+    # Define the profile model to use if any, and the dotted path of the form
+    # adding a profile with a new user from the admin.
     PROFILE_MODEL = None
+    PROFILE_FORM = None
 
     # Do we need to send an invitation email when the user is created and
     # is active?
     AUTO_SEND_INVITATION_EMAIL = True
 
+    # Cache the users loaded on each authenticated request. Set to "locmem"
+    # for a cache local to the process or to the alias of a Django cache.
+    USER_CACHE = None
+    USER_CACHE_TIMEOUT = 300
+    # Only applies to the "locmem" cache.
+    USER_CACHE_MAX_ENTRIES = 10000
+
+    # Cache the users authenticated by `CachedTokenAuthentication`, set like
+    # `USER_CACHE`.
+    TOKEN_CACHE = None
+    TOKEN_CACHE_TIMEOUT = 60
+    # Only applies to the "locmem" cache.
+    TOKEN_CACHE_MAX_ENTRIES = 10000
+
+    # Issue signed access and refresh tokens along with the database token.
+    ACCESS_TOKEN_ENABLED = False
+    # Lifetimes in seconds.
+    ACCESS_TOKEN_LIFETIME = 300
+    REFRESH_TOKEN_LIFETIME = 60 * 60 * 24 * 14
+    # Keys signing the tokens, the first one signs new tokens. Defaults to
+    # `SECRET_KEY`.
+    ACCESS_TOKEN_KEYS = []
+
+    # Page the admin user lists with a cursor instead of an offset.
+    USER_LIST_KEYSET_PAGINATION = False
+
+    # Filtered admin user lists are counted exactly up to this number of
+    # users. Above, the count is served from `USER_COUNT_CACHE` and queued
+    # for the `refresh_user_counts` command once older than
+    # `USER_COUNT_REFRESH_INTERVAL` seconds.
+    USER_COUNT_EXACT_THRESHOLD = 10000
+    USER_COUNT_CACHE = "default"
+    USER_COUNT_CACHE_TIMEOUT = 60 * 60 * 24
+    USER_COUNT_REFRESH_INTERVAL = 300
+
+    # Bulk actions over more users than `BULK_ACTION_SYNC_LIMIT` are run in
+    # the background by the `run_user_bulk_jobs` command.
+    BULK_ACTION_SYNC_LIMIT = 10000
+    BULK_ACTION_CHUNK_SIZE = 1000
+
+    # Imports of more rows are refused by the API, see `import_users`.
+    IMPORT_SYNC_LIMIT = 1000
+
+    # Deactivate the users deleted from the admin and delete them in the
+    # background with the `delete_pending_users` command, by chunks of
+    # dependent rows.
+    USER_DELETION_ASYNC = True
+    USER_DELETION_CHUNK_SIZE = 1000
+
+    # Cache of the group and permission choices of the admin forms.
+    CHOICES_CACHE = "default"
+    CHOICES_CACHE_TIMEOUT = 60 * 60 * 24
+    # Used instead when the cache is local to each process.
+    CHOICES_LOCAL_CACHE_TIMEOUT = 60
+
+    # The account requests hashing a password while
+    # `HASHING_MAX_IN_PROGRESS` hashes are in progress, counted in the
+    # `HASHING_CACHE` cache shared by the processes, fail with a 503 asking
+    # to retry after `HASHING_RETRY_AFTER` seconds. Passwords are hashed in the request
+    # thread, or by `HASHING_WORKERS` processes per web process.
+    HASHING_WORKERS = 0
+    HASHING_MAX_IN_PROGRESS = None
+    HASHING_CACHE = "default"
+    HASHING_RETRY_AFTER = 1
+
+    # Backend searching the users in the admin lists.
+    USER_SEARCH_BACKEND = "cotidia.account.search.TokenIndexSearchBackend"
+
+    # Backend delivering the emails stored by `OutboxEmailBackend`, used by
+    # the `send_outbox_emails` command.
+    OUTBOX_EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+    # Number of emails sent per connection.
+    OUTBOX_BATCH_SIZE = 50
+    # Failed emails are retried after `OUTBOX_RETRY_DELAY` seconds, doubled
+    # on every attempt, until `OUTBOX_MAX_ATTEMPTS` is reached.
+    OUTBOX_MAX_ATTEMPTS = 5
+    OUTBOX_RETRY_DELAY = 60
+    # Seconds a batch is reserved by a worker before others may claim it.
+    OUTBOX_LEASE = 300
+
     class Meta:
         prefix = "account"
+
+
+# Settings added to the template context by `account_settings`.
+TEMPLATE_SETTINGS = (
+    "ACCOUNT_ADMIN_LOGIN_URL",
+    "ACCOUNT_PUBLIC_LOGIN_URL",
+    "ACCOUNT_FORCE_ACTIVATION",
+    "ACCOUNT_ENABLE_TWO_FACTOR",
+    "ACCOUNT_FORCE_ADMIN_TWO_FACTOR",
+)
+
+
+class AccountSettings:
+    """A read-only snapshot of the `ACCOUNT_*` settings.
+
+    Lists are stored as tuples. Settings which are not in the snapshot are
+    read from Django's settings.
+    """
+
+    def load(self):
+        values = {}
+        for name in dir(django_settings):
+            if name.startswith("ACCOUNT_"):
+                value = getattr(django_settings, name)
+                if isinstance(value, list):
+                    value = tuple(value)
+                values[name] = value
+        values["template_context"] = MappingProxyType(
+            {name: values[name] for name in TEMPLATE_SETTINGS}
+        )
+        # Replaced at once for the threads reading the snapshot.
+        object.__setattr__(self, "__dict__", values)
+
+    def __getattr__(self, name):
+        if "template_context" not in self.__dict__:
+            # Used before the app is ready.
+            self.load()
+            return getattr(self, name)
+        return getattr(django_settings, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("The account settings are read-only.")
+
+    def __delattr__(self, name):
+        raise AttributeError("The account settings are read-only.")
+
+
+settings = AccountSettings()
+
+
+@receiver(setting_changed)
+def reload_settings(sender, setting, **kwargs):
+    if setting.startswith("ACCOUNT_"):
+        settings.load()
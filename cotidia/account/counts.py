@@ -0,0 +1,259 @@
+"""
+Counts of the users shown by the admin user lists.
+
+Counting a large filtered table costs more than fetching a page of it, so
+the lists count the users in three ways:
+
+- An unfiltered list reads the `UserCounter` of its segment, kept up to date
+  by the `User` save and delete signals. The changes are applied once the
+  transaction is committed, so the counter rows every sign up updates are
+  not locked until the end of the request. Run the `refresh_user_counts`
+  command after changing users with `QuerySet.update` to fix the counters.
+- A filtered list is counted exactly up to
+  `ACCOUNT_USER_COUNT_EXACT_THRESHOLD` users, the count query stops there.
+- Above, the last count of the same query is served from the cache and
+  queued for the `refresh_user_counts` command once older than
+  `ACCOUNT_USER_COUNT_REFRESH_INTERVAL`. Before the first refresh, the
+  estimate of the query planner is used on PostgreSQL.
+
+"""
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from cotidia.account.conf import settings
+from cotidia.account.models import User, UserCounter
+
+
+# The users counted by each segment.
+SEGMENTS = {
+    "user": Q(is_staff=False, is_superuser=False),
+    "staff": Q(is_staff=True, is_superuser=False),
+    "superuser": Q(is_superuser=True),
+    "active": Q(is_active=True),
+    "pending": Q(is_active=False),
+}
+
+# Fields of the user deciding its segments.
+COUNTED_FIELDS = ("is_active", "is_staff", "is_superuser")
+
+# The cache keys and queries of the filtered counts to refresh.
+REFRESH_QUEUE_KEY = "account:user-count:queue"
+
+
+def get_segments(is_active, is_staff, is_superuser):
+    """Return the segments of a user with the given flags."""
+    segments = {"active" if is_active else "pending"}
+    if is_superuser:
+        segments.add("superuser")
+    elif is_staff:
+        segments.add("staff")
+    else:
+        segments.add("user")
+    return segments
+
+
+_batch = threading.local()
+
+
+@contextmanager
+def batch_counters():
+    """Apply the counter changes made within the block in one query.
+
+    Used when deleting or saving many users, which would otherwise update
+    the counters once per user.
+    """
+    if getattr(_batch, "deltas", None) is not None:
+        # Nested, the outer block applies the changes.
+        yield
+        return
+
+    _batch.deltas = {}
+    try:
+        yield
+        deltas = _batch.deltas
+    finally:
+        _batch.deltas = None
+    adjust_counters(deltas)
+
+
+def adjust_counters(deltas):
+    """Add the `{segment: delta}` changes to the counters in one query, once
+    the current transaction is committed."""
+    batch = getattr(_batch, "deltas", None)
+    if batch is not None:
+        for segment, delta in deltas.items():
+            batch[segment] = batch.get(segment, 0) + delta
+        return
+
+    deltas = {segment: delta for segment, delta in deltas.items() if delta}
+    if deltas:
+        transaction.on_commit(partial(update_counters, deltas))
+
+
+def update_counters(deltas):
+    UserCounter.objects.filter(segment__in=list(deltas)).update(
+        count=F("count")
+        + Case(
+            *(When(segment=s, then=Value(d)) for s, d in deltas.items()),
+            default=Value(0)
+        )
+    )
+
+
+def refresh_counters():
+    """Recount the users of every segment and return the counts."""
+    counts = {}
+    for segment, query in SEGMENTS.items():
+        counts[segment] = User.objects.filter(query).count()
+        UserCounter.objects.update_or_create(
+            segment=segment,
+            defaults={"count": counts[segment], "refreshed_at": timezone.now()},
+        )
+    return counts
+
+
+def get_flags(instance, saved_flags=None):
+    """Return the counted fields of a user.
+
+    Deferred fields are taken from `saved_flags`, None is returned if they
+    are not known.
+    """
+    flags = []
+    for i, name in enumerate(COUNTED_FIELDS):
+        if name in instance.__dict__:
+            flags.append(instance.__dict__[name])
+        elif saved_flags is not None:
+            flags.append(saved_flags[i])
+        else:
+            return None
+    return tuple(flags)
+
+
+def get_counter(segment):
+    try:
+        return UserCounter.objects.values_list("count", flat=True).get(
+            segment=segment
+        )
+    except UserCounter.DoesNotExist:
+        return None
+
+
+def get_cache():
+    return caches[settings.ACCOUNT_USER_COUNT_CACHE]
+
+
+def get_cache_key(queryset):
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5(repr((sql, params)).encode()).hexdigest()
+    return "account:user-count:{}".format(digest)
+
+
+def estimate_count(queryset):
+    """Return the number of rows estimated by the query planner, or None."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def refresh_count(queryset, key):
+    """Count the queryset exactly and cache the result."""
+    count = queryset.count()
+    get_cache().set(
+        key, (count, time.time()), settings.ACCOUNT_USER_COUNT_CACHE_TIMEOUT
+    )
+    return count
+
+
+def queue_refresh(queryset, key):
+    """Queue the count of the queryset for the `refresh_user_counts` command."""
+    cache = get_cache()
+    queued_key = "{}:queued".format(key)
+    # Queued once per interval. A query lost by concurrent writes of the
+    # queue is queued again after it.
+    if not cache.add(queued_key, True, settings.ACCOUNT_USER_COUNT_REFRESH_INTERVAL):
+        return
+    queue = cache.get(REFRESH_QUEUE_KEY) or {}
+    queue[key] = queryset.query
+    cache.set(REFRESH_QUEUE_KEY, queue, settings.ACCOUNT_USER_COUNT_CACHE_TIMEOUT)
+
+
+def refresh_queued_counts():
+    """Count the queued querysets and return their number."""
+    cache = get_cache()
+    queue = cache.get(REFRESH_QUEUE_KEY) or {}
+    cache.delete(REFRESH_QUEUE_KEY)
+    for key, query in queue.items():
+        queryset = User.objects.all()
+        queryset.query = query
+        refresh_count(queryset, key)
+        cache.delete("{}:queued".format(key))
+    return len(queue)
+
+
+def get_cached_count(queryset, minimum):
+    """Return the cached count of the queryset, at least `minimum`."""
+    key = get_cache_key(queryset)
+    cached = get_cache().get(key)
+
+    if cached is None:
+        estimate = estimate_count(queryset)
+        if estimate is None:
+            # Without an estimate, count now so the next pages are right.
+            return max(refresh_count(queryset, key), minimum)
+        queue_refresh(queryset, key)
+        return max(estimate, minimum)
+
+    count, refreshed_at = cached
+    if time.time() - refreshed_at > settings.ACCOUNT_USER_COUNT_REFRESH_INTERVAL:
+        queue_refresh(queryset, key)
+    return max(count, minimum)
+
+
+def get_count(queryset, segment=None):
+    """Return the number of users in `queryset`.
+
+    `segment` is the counter matching the whole queryset, if any.
+    """
+    if segment is not None:
+        count = get_counter(segment)
+        if count is not None:
+            return count
+
+    queryset = queryset.order_by()
+    threshold = settings.ACCOUNT_USER_COUNT_EXACT_THRESHOLD
+    count = queryset[:threshold + 1].count()
+    if count <= threshold:
+        return count
+    return get_cached_count(queryset, count)
+
+
+class UserCountPaginator(Paginator):
+    """A paginator counting the users with `get_count`."""
+
+    def __init__(self, *args, segment=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.segment = segment
+
+    @cached_property
+    def count(self):
+        return get_count(self.object_list, self.segment)
+
@@ -0,0 +1,203 @@
+"""
+Background deletion of users with many dependent rows.
+
+Deleting a user cascades to its API token, OTP devices, profile, group
+memberships and any row referencing it, in a single transaction holding
+locks on all of them. `request_deletion` instead deactivates the user and
+revokes its tokens straight away, and queues a `UserDeletionJob`. The
+sessions of an inactive user are refused by `EmailBackend.get_user`.
+
+Reactivating the user cancels its pending deletion, see `cancel_deletion`.
+A job finding its user active again stops and is marked as cancelled.
+
+The `delete_pending_users` command runs the jobs: the rows referencing the
+user are deleted, or detached for `SET_NULL` relations, by chunks of
+`ACCOUNT_USER_DELETION_CHUNK_SIZE` in their own transactions, then the user
+itself is deleted. Each chunk is looked up again from the remaining rows,
+so a job interrupted at any point resumes where it stopped.
+
+"""
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from cotidia.account.conf import settings
+from cotidia.account.models import User, UserDeletionJob
+
+
+def request_deletion(user, requested_by=None):
+    """Deactivate the user now and queue the deletion of its data.
+
+    The user is signed out of its sessions, which `EmailBackend` refuses for
+    inactive users, and its API and signed tokens are revoked.
+    """
+    with transaction.atomic():
+        user.is_active = False
+        user.deletion_requested_at = timezone.now()
+        user.save(update_fields=["is_active", "deletion_requested_at"])
+        # Revoke the signed access and refresh tokens. Incremented by the
+        # database, like `request_deletions`, so a concurrent revocation is
+        # not lost.
+        User.objects.filter(pk=user.pk).update(token_version=F("token_version") + 1)
+        user.refresh_from_db(fields=["token_version"])
+        Token.objects.filter(user=user).delete()
+
+        job, created = UserDeletionJob.objects.update_or_create(
+            user_id=user.pk,
+            defaults={
+                "email": user.email,
+                "status": UserDeletionJob.PENDING,
+                "requested_by": requested_by,
+                "error": "",
+            },
+        )
+    return job
+
+
+def request_deletions(user_ids, requested_by=None):
+    """Like `request_deletion` for many users, with set based queries.
+
+    The users must already be deactivated, `post_save` is not sent.
+    Return the number of deletions queued.
+    """
+    users = User.objects.filter(pk__in=user_ids)
+    emails = dict(users.values_list("pk", "email"))
+    users.update(
+        deletion_requested_at=timezone.now(), token_version=F("token_version") + 1
+    )
+    Token.objects.filter(user_id__in=user_ids).delete()
+
+    jobs = UserDeletionJob.objects.filter(user_id__in=list(emails))
+    queued = set(jobs.values_list("user_id", flat=True))
+    jobs.update(status=UserDeletionJob.PENDING, requested_by=requested_by, error="")
+    UserDeletionJob.objects.bulk_create([
+        UserDeletionJob(user_id=pk, email=email, requested_by=requested_by)
+        for pk, email in emails.items()
+        if pk not in queued
+    ])
+    return len(emails)
+
+
+def cancel_deletion(user_ids):
+    """Cancel the pending deletion of reactivated users.
+
+    Return the number of jobs cancelled.
+    """
+    cancelled = UserDeletionJob.objects.filter(
+        user_id__in=user_ids, status=UserDeletionJob.PENDING
+    ).update(status=UserDeletionJob.CANCELLED, finished_at=timezone.now())
+    User.objects.filter(pk__in=user_ids, deletion_requested_at__isnull=False).update(
+        deletion_requested_at=None
+    )
+    return cancelled
+
+
+def get_dependent_relations():
+    """Yield `(model, field_name, on_delete)` for the rows referencing users.
+
+    Relations which neither cascade nor set null are left to the final
+    delete of the user, which fails on `PROTECT`.
+    """
+    for relation in User._meta.get_fields(include_hidden=True):
+        if relation.many_to_many and not relation.auto_created:
+            # Forward many to many fields of the user, like `groups`.
+            through = relation.remote_field.through
+            yield through, relation.m2m_field_name(), models.CASCADE
+        elif relation.auto_created and not relation.concrete:
+            if relation.related_model._meta.auto_created:
+                # The table of a forward many to many field, handled above.
+                continue
+            if relation.many_to_many:
+                through = relation.through
+                yield through, relation.field.m2m_reverse_field_name(), models.CASCADE
+            elif relation.on_delete in (models.CASCADE, models.SET_NULL):
+                yield relation.related_model, relation.field.name, relation.on_delete
+
+
+class UserDeletion:
+    """Delete the user of a job by chunks of `chunk_size` dependent rows."""
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or settings.ACCOUNT_USER_DELETION_CHUNK_SIZE
+        self.relations = list(get_dependent_relations())
+
+    def delete_chunk(self, user_id):
+        """Delete or detach a chunk of rows referencing the user.
+
+        Return the number of rows changed, 0 once none is left.
+        """
+        for model, field_name, on_delete in self.relations:
+            manager = model._base_manager
+            queryset = manager.filter(**{field_name: user_id})
+            ids = list(queryset.values_list("pk", flat=True)[:self.chunk_size])
+            if not ids:
+                continue
+
+            with transaction.atomic():
+                chunk = manager.filter(pk__in=ids)
+                if on_delete is models.SET_NULL:
+                    return chunk.update(**{field_name: None})
+                # Rows referencing the chunk cascade with it.
+                deleted, per_model = chunk.delete()
+                return deleted
+        return 0
+
+    def is_reactivated(self, user_id):
+        return User.objects.filter(pk=user_id, is_active=True).exists()
+
+    def run(self, job, on_progress=None):
+        """Run a claimed job, recording its progress after each chunk.
+
+        The job is cancelled if the user is active again, its remaining rows
+        are kept.
+        """
+        try:
+            while not self.is_reactivated(job.user_id):
+                changed = self.delete_chunk(job.user_id)
+                if not changed:
+                    break
+                job.deleted += changed
+                job.save(update_fields=["deleted"])
+                if on_progress is not None:
+                    on_progress(job)
+
+            deleted, per_model = User.objects.filter(
+                pk=job.user_id, is_active=False
+            ).delete()
+        except Exception as e:
+            job.status = UserDeletionJob.FAILED
+            job.error = "{}: {}".format(type(e).__name__, e)
+        else:
+            if self.is_reactivated(job.user_id):
+                job.status = UserDeletionJob.CANCELLED
+                User.objects.filter(pk=job.user_id).update(deletion_requested_at=None)
+            else:
+                job.status = UserDeletionJob.DONE
+            job.deleted += deleted
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "deleted", "finished_at"])
+        return job
+
+
+def claim_job(resume=False):
+    """Return the next pending job marked as running, or None.
+
+    With `resume`, jobs left running by an interrupted worker are claimed.
+    """
+    statuses = [UserDeletionJob.PENDING]
+    if resume:
+        statuses.append(UserDeletionJob.RUNNING)
+
+    with transaction.atomic():
+        job = (
+            UserDeletionJob.objects.select_for_update(skip_locked=True)
+            .filter(status__in=statuses)
+            .order_by("created_at", "id")
+            .first()
+        )
+        if job is not None:
+            job.status = UserDeletionJob.RUNNING
+            job.save(update_fields=["status"])
+    return job
@@ -0,0 +1,181 @@
+"""
+Streaming export of the users to CSV or JSON lines.
+
+Users are read by chunks of primary keys (keyset pagination), so the memory
+used is bounded by the chunk size whatever the number of users. The groups,
+permissions and profile columns of a chunk are loaded with one query each.
+
+"""
+import csv
+import io
+import json
+
+from cotidia.account.models import User
+from cotidia.account.profiles import get_profile_model
+
+
+FORMATS = ("csv", "jsonl")
+
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+FIELDS = (
+    "id",
+    "uuid",
+    "username",
+    "email",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "date_joined",
+    "last_login",
+)
+
+
+def to_json(value):
+    if value is None or isinstance(value, (bool, int, float, str, list)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def to_csv(value):
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ",".join(value)
+    return to_json(value)
+
+
+class UserExport:
+    """Export the users of `queryset`, all users by default.
+
+    `groups` and `permissions` add the names of the user groups and the
+    `app_label.codename` of its permissions, `profile` adds the fields of
+    `ACCOUNT_PROFILE_MODEL` prefixed with `profile.`.
+    """
+
+    def __init__(
+        self,
+        queryset=None,
+        groups=False,
+        permissions=False,
+        profile=False,
+        chunk_size=2000,
+    ):
+        self.queryset = User.objects.all() if queryset is None else queryset
+        self.groups = groups
+        self.permissions = permissions
+        self.chunk_size = chunk_size
+
+        self.profile_model = get_profile_model() if profile else None
+        self.profile_user_field = None
+        self.profile_fields = []
+        if self.profile_model is not None:
+            for field in self.profile_model._meta.concrete_fields:
+                if field.one_to_one and field.related_model is User:
+                    self.profile_user_field = field.attname
+                elif not field.primary_key:
+                    self.profile_fields.append(field.attname)
+            if self.profile_user_field is None:
+                # Not linked to the users, there is nothing to export.
+                self.profile_fields = []
+
+    def get_columns(self):
+        columns = list(FIELDS)
+        if self.groups:
+            columns.append("groups")
+        if self.permissions:
+            columns.append("permissions")
+        columns.extend("profile.{}".format(name) for name in self.profile_fields)
+        return columns
+
+    def get_groups(self, ids):
+        groups = {}
+        memberships = User.groups.through.objects.filter(user_id__in=ids)
+        for user_id, name in memberships.values_list("user_id", "group__name"):
+            groups.setdefault(user_id, []).append(name)
+        return groups
+
+    def get_permissions(self, ids):
+        permissions = {}
+        user_permissions = User.user_permissions.through.objects.filter(
+            user_id__in=ids
+        ).values_list(
+            "user_id",
+            "permission__content_type__app_label",
+            "permission__codename",
+        )
+        for user_id, app_label, codename in user_permissions:
+            permissions.setdefault(user_id, []).append(
+                "{}.{}".format(app_label, codename)
+            )
+        return permissions
+
+    def get_profiles(self, ids):
+        profiles = self.profile_model._default_manager.filter(
+            **{"{}__in".format(self.profile_user_field): ids}
+        ).values_list(self.profile_user_field, *self.profile_fields)
+        return {row[0]: row[1:] for row in profiles}
+
+    def iter_chunks(self):
+        """Yield lists of rows, each row is a list of column values."""
+        queryset = self.queryset.order_by("pk").values_list(*FIELDS)
+        empty_profile = [None] * len(self.profile_fields)
+
+        last_id = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_id)[:self.chunk_size])
+            if not rows:
+                break
+            ids = [row[0] for row in rows]
+            last_id = ids[-1]
+
+            groups = self.get_groups(ids) if self.groups else None
+            permissions = self.get_permissions(ids) if self.permissions else None
+            profiles = self.get_profiles(ids) if self.profile_fields else None
+
+            chunk = []
+            for row in rows:
+                row = list(row)
+                if groups is not None:
+                    row.append(groups.get(row[0], []))
+                if permissions is not None:
+                    row.append(permissions.get(row[0], []))
+                if profiles is not None:
+                    row.extend(profiles.get(row[0], empty_profile))
+                chunk.append(row)
+            yield chunk
+
+    def iter_csv(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        writer.writerow(self.get_columns())
+        for chunk in self.iter_chunks():
+            writer.writerows([to_csv(value) for value in row] for row in chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        # Only the header is left when there is no user.
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def iter_jsonl(self):
+        columns = self.get_columns()
+        for chunk in self.iter_chunks():
+            yield "".join(
+                json.dumps(dict(zip(columns, map(to_json, row)))) + "\n"
+                for row in chunk
+            )
+
+    def stream(self, format):
+        """Return an iterator of strings, one per chunk of users."""
+        if format == "csv":
+            return self.iter_csv()
+        if format == "jsonl":
+            return self.iter_jsonl()
+        raise ValueError("Unknown export format: {}".format(format))
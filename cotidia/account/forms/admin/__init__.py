@@ -12,6 +12,8 @@ from django.contrib.auth.forms import (
 from django.contrib.auth.models import Group, Permission
 
 from cotidia.account.conf import settings
+from cotidia.account.hashing import get_hashing_pool
+from cotidia.account.managers import normalize_email_key
 from cotidia.account.models import User
 
 
@@ -34,7 +36,7 @@ def generate_username(email):
 
     """
     try:
-        User.objects.get(email=email)
+        User.objects.get_by_email(email)
         raise Exception(
             "Cannot generate new username. A user with this email" "already exists."
         )
@@ -85,21 +87,42 @@ class AccountPasswordResetForm(PasswordResetForm):
 
         user_model = get_user_model()
         active_users = user_model._default_manager.filter(
-            email__iexact=email, is_active=True
+            email_key=normalize_email_key(email), is_active=True
         )
-        if active_users.count() == 0:
+        if not active_users.exists():
             raise forms.ValidationError(
                 "There are no active accounts associated to this email."
             )
 
         return email
 
+    def get_users(self, email):
+        """Look up the active users through the indexed email key."""
+        active_users = get_user_model()._default_manager.filter(
+            email_key=normalize_email_key(email), is_active=True
+        )
+        return (u for u in active_users if u.has_usable_password())
+
     def save(self, *args, **kwargs):
         domain_override = settings.SITE_URL
         super(AccountPasswordResetForm, self).save(domain_override, *args, **kwargs)
 
 
-class AccountSetPasswordForm(SetPasswordForm):
+class HashingPoolSetPasswordMixin:
+    """Hash the new password of a password form in the hashing pool."""
+
+    new_password_field = "new_password1"
+
+    def save(self, commit=True):
+        get_hashing_pool().set_user_password(
+            self.user, self.cleaned_data[self.new_password_field]
+        )
+        if commit:
+            self.user.save()
+        return self.user
+
+
+class AccountSetPasswordForm(HashingPoolSetPasswordMixin, SetPasswordForm):
     required_css_class = "required"
 
     def __init__(self, *args, **kwargs):
@@ -116,7 +139,7 @@ class AccountSetPasswordForm(SetPasswordForm):
             self.fields[field].widget.attrs["class"] = "form__text"
 
 
-class AccountPasswordChangeForm(PasswordChangeForm):
+class AccountPasswordChangeForm(HashingPoolSetPasswordMixin, PasswordChangeForm):
     """A form that change the password for the logged in user.
 
     The old password is asked to validate its identity.
@@ -127,6 +150,15 @@ class AccountPasswordChangeForm(PasswordChangeForm):
         self.fields["new_password1"].widget.attrs["autocomplete"] = "off"
         self.fields["new_password2"].widget.attrs["autocomplete"] = "off"
 
+    def clean_old_password(self):
+        old_password = self.cleaned_data["old_password"]
+        if not get_hashing_pool().check_user_password(self.user, old_password):
+            raise forms.ValidationError(
+                self.error_messages["password_incorrect"],
+                code="password_incorrect",
+            )
+        return old_password
+
 
 class UpdateDetailsForm(forms.ModelForm):
 
@@ -143,8 +175,9 @@ class UpdateDetailsForm(forms.ModelForm):
         email = self.cleaned_data["email"]
 
         if (
-            User.objects.filter(email=email).count() > 0
-            and self.instance.email != email
+            User.objects.filter(email_key=normalize_email_key(email))
+            .exclude(pk=self.instance.pk)
+            .exists()
         ):
             raise forms.ValidationError("This email is already used.")
 
@@ -157,6 +190,11 @@ class AccountUserCreationForm(forms.ModelForm):
     error_messages = {"password_mismatch": "The two password fields didn't match."}
     email = forms.EmailField()
 
+    # Set by the views inserting the user with `UserManager.insert`, which
+    # report a duplicate email from the `IntegrityError` instead of looking
+    # it up before the insert.
+    defer_unique_email = False
+
     password1 = forms.CharField(label="Password", widget=forms.PasswordInput)
 
     password2 = forms.CharField(
@@ -182,12 +220,19 @@ class AccountUserCreationForm(forms.ModelForm):
         email = self.cleaned_data["email"]
 
         # Force all emails to be lowercase and strip trailing spaces
-        email = email.lower().strip()
+        return email.lower().strip()
 
-        if User.objects.filter(email=email).count() > 0:
-            raise forms.ValidationError("This email is already used.")
+    def validate_unique(self):
+        if not self.defer_unique_email:
+            return super().validate_unique()
 
-        return email
+        # The email uniqueness is left to the insert.
+        exclude = self._get_validation_exclusions()
+        exclude.append("email")
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except forms.ValidationError as e:
+            self._update_errors(e)
 
 
 class AccountUserChangeForm(forms.ModelForm):
@@ -207,7 +252,9 @@ class AccountUserChangeForm(forms.ModelForm):
     def clean_email(self):
         """Validate that the supplied email address is unique for the site."""
 
-        query = User.objects.filter(email__iexact=self.cleaned_data["email"])
+        query = User.objects.filter(
+            email_key=normalize_email_key(self.cleaned_data["email"])
+        )
         query = query.exclude(username=self.cleaned_data["username"])
         query = query.exclude(username=self.initial["username"])
         if self.cleaned_data.get("email") and query:
@@ -3,12 +3,15 @@ from django.contrib.auth.models import Group, Permission
 
 from betterforms.forms import BetterModelForm
 
+from cotidia.account.choices import CachedModelMultipleChoiceField
+
 
 class GroupAddForm(BetterModelForm):
 
-    permissions = forms.ModelMultipleChoiceField(
+    permissions = CachedModelMultipleChoiceField(
         widget=forms.CheckboxSelectMultiple,
         queryset=Permission.objects.all(),
+        choice_list='permissions',
         required=False)
 
     class Meta:
@@ -12,6 +12,8 @@ from django.urls import reverse
 
 from betterforms.forms import BetterModelForm, BetterForm
 
+from cotidia.account.choices import CachedModelMultipleChoiceField
+from cotidia.account.forms.admin import HashingPoolSetPasswordMixin
 from cotidia.account.models import User
 
 
@@ -39,15 +41,17 @@ class UserAddForm(BetterModelForm):
 
 class SuperUserAddForm(UserAddForm):
 
-    groups = forms.ModelMultipleChoiceField(
+    groups = CachedModelMultipleChoiceField(
         widget=forms.CheckboxSelectMultiple,
         queryset=Group.objects.all(),
+        choice_list="groups",
         required=False,
     )
 
-    user_permissions = forms.ModelMultipleChoiceField(
+    user_permissions = CachedModelMultipleChoiceField(
         widget=forms.CheckboxSelectMultiple,
         queryset=Permission.objects.all(),
+        choice_list="permissions",
         required=False,
     )
 
@@ -132,14 +136,16 @@ class SuperUserUpdateForm(UserAddForm, UserChangeForm):
 
     password = ReadOnlyPasswordHashField()
 
-    groups = forms.ModelMultipleChoiceField(
+    groups = CachedModelMultipleChoiceField(
         widget=forms.CheckboxSelectMultiple,
         queryset=Group.objects.all(),
+        choice_list="groups",
         required=False,
     )
-    user_permissions = forms.ModelMultipleChoiceField(
+    user_permissions = CachedModelMultipleChoiceField(
         widget=forms.CheckboxSelectMultiple,
         queryset=Permission.objects.all(),
+        choice_list="permissions",
         required=False,
     )
 
@@ -199,7 +205,11 @@ class UserInviteForm(forms.ModelForm):
         fields = []
 
 
-class UserChangePasswordForm(BetterForm, AdminPasswordChangeForm):
+class UserChangePasswordForm(
+    HashingPoolSetPasswordMixin, BetterForm, AdminPasswordChangeForm
+):
+    new_password_field = "password1"
+
     def __init__(self, user, *args, **kwargs):
         super().__init__(user, *args, **kwargs)
 
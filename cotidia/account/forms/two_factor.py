@@ -12,6 +12,8 @@ from two_factor.forms import (
 from two_factor.utils import totp_digits
 from two_factor.validators import validate_international_phonenumber
 
+from cotidia.account.hashing import get_hashing_pool
+
 
 class AuthenticationTokenForm(BaseAuthenticationTokenForm):
     otp_token = forms.IntegerField(
@@ -49,7 +51,7 @@ class PasswordProtectionForm(forms.Form):
 
     def clean_password(self):
         password = self.cleaned_data.get("password", None)
-        if not self.user.check_password(password):
+        if not get_hashing_pool().check_user_password(self.user, password):
             raise forms.ValidationError("Invalid password")
 
 
@@ -0,0 +1,252 @@
+"""
+Password hashing of the account requests.
+
+Hashing a password takes tens of milliseconds of CPU, a burst of sign-ins
+would keep every web process busy. The account views and forms checking or
+setting a password, sign in with `EmailBackend.authenticate`, sign up, the
+password set, change and reset views and the two-factor password forms,
+hash through `get_hashing_pool()`. The management commands and the importer
+call `User.set_password` directly.
+
+With `ACCOUNT_HASHING_MAX_IN_PROGRESS`, each hash in progress holds one of as
+many slots of the `ACCOUNT_HASHING_CACHE` cache. When all of them are taken,
+`HashingOverloaded` is raised straight away and answered with a 503 by the
+API views and by `AccountMiddleware`, so requests are shed instead of queued
+behind the others. The limit only spans the processes sharing the cache: a
+`LocMemCache` limits each process on its own, the `account.W001` check warns
+about it.
+
+`ACCOUNT_HASHING_WORKERS` processes may hash the passwords instead of the
+request threads, which still wait for the result. Each web process starts
+its own pool, the CPUs used for hashing are then the number of web processes
+times `ACCOUNT_HASHING_WORKERS`. It is off by default.
+
+`get_hashing_pool().stats()` reports the queue depth, the slots taken by all
+the processes sharing the cache, and the hash latencies of the current
+process.
+
+"""
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import (
+    UNUSABLE_PASSWORD_PREFIX,
+    get_hasher,
+    identify_hasher,
+    make_password,
+)
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from rest_framework.exceptions import APIException
+
+from cotidia.account.conf import settings
+
+
+SLOT_KEY = "account:hashing:slot:{}"
+
+# A slot expires after this delay, so the slots of a process killed in the
+# middle of a hash are freed. Longer than any hash.
+SLOT_TIMEOUT = 60
+
+
+class HashingOverloaded(APIException):
+    """Too many passwords are being hashed, the client should retry later."""
+
+    status_code = 503
+    default_detail = "Too many requests are being processed, please retry later."
+    default_code = "hashing_overloaded"
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        # Sent as the `Retry-After` header.
+        self.wait = wait
+
+
+class HashingPool:
+    """Run the hashers in `workers` processes, or in the calling thread if 0.
+
+    At most `limit` hashes are in progress at once across the processes
+    sharing `cache`, None for no limit.
+    """
+
+    def __init__(self, workers=0, limit=None, cache=None, retry_after=1):
+        self.workers = workers
+        self.limit = limit
+        self.cache = cache
+        self.retry_after = retry_after
+        self.executor = ProcessPoolExecutor(workers) if workers else None
+
+        self.lock = threading.Lock()
+        self.in_progress = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def acquire(self):
+        """Take a slot, raise `HashingOverloaded` if none is free.
+
+        Return the key and the token of the slot, None without a limit.
+        """
+        if self.limit is None:
+            return None
+
+        token = uuid.uuid4().hex
+        # Start from a random slot, so the first ones are not always tried.
+        first = random.randrange(self.limit) if self.limit else 0
+        for i in range(self.limit):
+            key = SLOT_KEY.format((first + i) % self.limit)
+            if self.cache.add(key, token, SLOT_TIMEOUT):
+                return key, token
+
+        with self.lock:
+            self.rejected += 1
+        raise HashingOverloaded(wait=self.retry_after)
+
+    def release(self, slot):
+        if slot is None:
+            return
+        key, token = slot
+        # Not a slot expired and taken since by another hash.
+        if self.cache.get(key) == token:
+            self.cache.delete(key)
+
+    def queue_depth(self):
+        """Return the number of hashes in progress, in all the processes
+        sharing the cache when there is a limit."""
+        if self.limit is None:
+            with self.lock:
+                return self.in_progress
+        keys = [SLOT_KEY.format(i) for i in range(self.limit)]
+        return len(self.cache.get_many(keys))
+
+    def run(self, func, *args):
+        """Return `func(*args)` computed by a worker.
+
+        Hashers are plain objects, they are sent to the pool processes so
+        the workers do not need the Django settings.
+        """
+        slot = self.acquire()
+        with self.lock:
+            self.in_progress += 1
+        start = time.monotonic()
+        try:
+            if self.executor is None:
+                return func(*args)
+            return self.executor.submit(func, *args).result()
+        finally:
+            latency = time.monotonic() - start
+            with self.lock:
+                self.in_progress -= 1
+                self.completed += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+            self.release(slot)
+
+    def make_password(self, password):
+        """Like `django.contrib.auth.hashers.make_password`."""
+        if password is None:
+            return make_password(None)
+        hasher = get_hasher()
+        return self.run(hasher.encode, password, hasher.salt())
+
+    def check_password(self, password, encoded, setter=None):
+        """Like `django.contrib.auth.hashers.check_password`."""
+        if password is None or not encoded:
+            return False
+        if encoded.startswith(UNUSABLE_PASSWORD_PREFIX):
+            return False
+
+        preferred = get_hasher()
+        try:
+            hasher = identify_hasher(encoded)
+        except ValueError:
+            return False
+
+        is_correct = self.run(hasher.verify, password, encoded)
+        hasher_changed = hasher.algorithm != preferred.algorithm
+        must_update = hasher_changed or preferred.must_update(encoded)
+        if setter and is_correct and must_update:
+            setter(password)
+        elif not is_correct and not hasher_changed and must_update:
+            # Take as long as the check of an up to date hash.
+            self.run(hasher.harden_runtime, password, encoded)
+        return is_correct
+
+    def set_user_password(self, user, raw_password):
+        """Like `User.set_password`."""
+        user.password = self.make_password(raw_password)
+        user._password = raw_password
+
+    def check_user_password(self, user, raw_password):
+        """Like `User.check_password`, upgrading the hash of the user."""
+
+        def setter(raw_password):
+            self.set_user_password(user, raw_password)
+            # Password hash upgrades shouldn't be considered password changes.
+            user._password = None
+            user.save(update_fields=["password"])
+
+        return self.check_password(raw_password, user.password, setter)
+
+    def stats(self):
+        """Return the queue depth, the hashes in progress in this process
+        and their latencies, in seconds."""
+        queue_depth = self.queue_depth()
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "limit": self.limit,
+                "queue_depth": queue_depth,
+                "in_progress": self.in_progress,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "average_latency": (
+                    self.total_latency / self.completed if self.completed else 0.0
+                ),
+                "max_latency": self.max_latency,
+            }
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+
+_hashing_pool = None
+_hashing_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """Return the pool hashing the passwords of the current process."""
+    global _hashing_pool
+
+    if _hashing_pool is None:
+        with _hashing_pool_lock:
+            if _hashing_pool is None:
+                limit = settings.ACCOUNT_HASHING_MAX_IN_PROGRESS
+                _hashing_pool = HashingPool(
+                    workers=settings.ACCOUNT_HASHING_WORKERS,
+                    limit=limit,
+                    cache=(
+                        caches[settings.ACCOUNT_HASHING_CACHE]
+                        if limit is not None
+                        else None
+                    ),
+                    retry_after=settings.ACCOUNT_HASHING_RETRY_AFTER,
+                )
+    return _hashing_pool
+
+
+@receiver(setting_changed)
+def reset_hashing_pool(sender, setting, **kwargs):
+    global _hashing_pool
+
+    if setting.startswith("ACCOUNT_HASHING_") or setting == "CACHES":
+        if _hashing_pool is not None:
+            _hashing_pool.shutdown()
+        _hashing_pool = None
@@ -0,0 +1,254 @@
+"""
+Bulk import of users from CSV or JSON lines files.
+
+Each row has an `email`, a `full_name` and optionally a `password`, a list of
+`groups` names (comma separated in CSV) and an `is_active` flag. Rows are
+validated by chunks with `UserImportSerializer`, the passwords of a chunk are
+hashed in a process pool, then the users, their API tokens and their groups
+are inserted with one `bulk_create` each.
+
+Chunks are committed one by one and the number of rows processed is reported
+after each, an interrupted import resumes by skipping them.
+
+"""
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.contrib.auth.models import Group
+from django.db import transaction
+
+from rest_framework.authtoken.models import Token
+
+from cotidia.account.counts import adjust_counters
+from cotidia.account.managers import normalize_email_key
+from cotidia.account.models import User
+from cotidia.account.search import get_search_backend
+from cotidia.account.serializers import (
+    UserImportSerializer,
+    make_username,
+    split_full_name,
+)
+
+
+FORMATS = ("csv", "jsonl")
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        # Blank cells are missing values.
+        row = {key: value for key, value in row.items() if value}
+        if "groups" in row:
+            row["groups"] = [
+                name.strip() for name in row["groups"].split(",") if name.strip()
+            ]
+        yield row
+
+
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_rows(stream, format):
+    """Return an iterator over the rows of a CSV or JSON lines stream."""
+    if format == "csv":
+        return read_csv(stream)
+    if format == "jsonl":
+        return read_jsonl(stream)
+    raise ValueError("Unknown import format: {}".format(format))
+
+
+def encode_password(hasher, password):
+    # Hashers are plain objects, they are sent to the pool processes so the
+    # workers do not need the Django settings.
+    return hasher.encode(password, hasher.salt())
+
+
+class UserImport:
+    """Import users by chunks of `chunk_size` rows.
+
+    Passwords are hashed by `workers` processes, all the CPUs by default,
+    or in the current process if `workers` is 0.
+    """
+
+    def __init__(self, chunk_size=1000, workers=None):
+        self.chunk_size = chunk_size
+        self.pool_size = os.cpu_count() if workers is None else workers
+        self.executor = None
+        self.group_ids = None
+
+    def get_group_ids(self):
+        if self.group_ids is None:
+            self.group_ids = dict(Group.objects.values_list("name", "id"))
+        return self.group_ids
+
+    def validate(self, rows, first_row):
+        """Return the valid rows of a chunk and the errors of the others.
+
+        Valid rows are `(number, validated_data)` tuples, rows are numbered
+        from `first_row`.
+        """
+        email_taken = UserImportSerializer().fields["email"].error_messages[
+            "unique"
+        ]
+        group_ids = self.get_group_ids()
+
+        valid = {}
+        errors = []
+        for number, row in enumerate(rows, first_row):
+            serializer = UserImportSerializer(data=row)
+            if not serializer.is_valid():
+                errors.append({"row": number, "errors": serializer.errors})
+                continue
+
+            data = serializer.validated_data
+            email_key = normalize_email_key(data["email"])
+            unknown_groups = set(data.get("groups", [])) - set(group_ids)
+            if email_key in valid:
+                errors.append({"row": number, "errors": {"email": [email_taken]}})
+            elif unknown_groups:
+                errors.append({
+                    "row": number,
+                    "errors": {
+                        "groups": [
+                            "Unknown group: {}".format(name)
+                            for name in sorted(unknown_groups)
+                        ]
+                    }
+                })
+            else:
+                valid[email_key] = (number, data)
+
+        # A single query to find the emails already used.
+        taken = User.objects.filter(email_key__in=list(valid)).values_list(
+            "email_key", flat=True
+        )
+        for email_key in taken:
+            number, data = valid.pop(email_key)
+            errors.append({"row": number, "errors": {"email": [email_taken]}})
+
+        errors.sort(key=lambda error: error["row"])
+        return list(valid.values()), errors
+
+    def hash_passwords(self, passwords):
+        """Return the hashes of the passwords, unusable for blank ones."""
+        hasher = get_hasher()
+        to_hash = [password for password in passwords if password]
+
+        if self.executor is None:
+            hashes = [encode_password(hasher, password) for password in to_hash]
+        else:
+            hashes = self.executor.map(
+                partial(encode_password, hasher),
+                to_hash,
+                chunksize=max(1, len(to_hash) // (self.pool_size * 4)),
+            )
+
+        hashes = iter(hashes)
+        return [
+            next(hashes) if password else make_password(None)
+            for password in passwords
+        ]
+
+    def insert(self, rows):
+        """Insert the validated rows and return the number of users created."""
+        passwords = self.hash_passwords(
+            [data.get("password", "").strip() for _, data in rows]
+        )
+
+        users = []
+        groups = {}
+        for (number, data), password in zip(rows, passwords):
+            first_name, last_name = split_full_name(data["full_name"])
+            email = data["email"].strip()
+            # `bulk_create` does not call `save`, set the email key here.
+            user = User(
+                username=make_username(email),
+                email=email,
+                email_key=normalize_email_key(email),
+                first_name=first_name,
+                last_name=last_name,
+                password=password,
+                is_active=data.get("is_active", True),
+            )
+            users.append(user)
+            groups[user.email_key] = data.get("groups", [])
+
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+
+            # Primary keys are not set by `bulk_create` on every database.
+            user_ids = dict(
+                User.objects.filter(email_key__in=list(groups)).values_list(
+                    "email_key", "id"
+                )
+            )
+
+            tokens = []
+            for user in users:
+                user.pk = user_ids[user.email_key]
+                token = Token(user_id=user.pk)
+                token.key = token.generate_key()
+                tokens.append(token)
+            Token.objects.bulk_create(tokens)
+
+            # `bulk_create` does not send `post_save`, index and count the
+            # users here.
+            get_search_backend().index_many(users, replace=False)
+            active = sum(user.is_active for user in users)
+            adjust_counters(
+                {"user": len(users), "active": active, "pending": len(users) - active}
+            )
+
+            group_ids = self.get_group_ids()
+            Membership = User.groups.through
+            Membership.objects.bulk_create([
+                Membership(user_id=user_ids[email_key], group_id=group_ids[name])
+                for email_key, names in groups.items()
+                for name in names
+            ])
+
+        return len(users)
+
+    def run(self, rows, start=0, on_progress=None):
+        """Import the rows, skipping the first `start` ones.
+
+        Return a dict with the number of `rows` processed, of users
+        `created` and the `errors` of the rejected rows. `on_progress` is
+        called with the same dict after each chunk is committed.
+        """
+        rows = iter(rows)
+        # Consume the rows already imported.
+        next(islice(rows, start, start), None)
+
+        result = {"rows": start, "created": 0, "errors": []}
+
+        if self.pool_size:
+            self.executor = ProcessPoolExecutor(self.pool_size)
+        try:
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+
+                valid, errors = self.validate(chunk, result["rows"] + 1)
+                if valid:
+                    result["created"] += self.insert(valid)
+                result["errors"].extend(errors)
+                result["rows"] += len(chunk)
+
+                if on_progress is not None:
+                    on_progress(result)
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+        return result
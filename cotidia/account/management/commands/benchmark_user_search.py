@@ -0,0 +1,139 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cotidia.account.models import User
+from cotidia.account.search import INDEXED_FIELDS, get_search_backend
+
+
+FIRST_NAMES = (
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael",
+    "Linda", "William", "Elizabeth", "David", "Barbara", "Richard", "Susan",
+    "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Alexander",
+    "Jane", "Mohammed", "Fatima", "Wei", "Yuki", "Olga", "Pierre", "Ana",
+)
+LAST_NAMES = (
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+    "Davis", "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez",
+    "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark",
+    "Nguyen", "Kowalski", "Dubois", "Tanaka", "Grant",
+)
+DOMAINS = ("example.com", "example.org", "mail.example.net", "company.example")
+
+# Prefix, several words, typos and email searches.
+SEARCHES = ("jo", "smith", "jane smith", "alexnader", "willaims", "example.org")
+
+# Users fetched per search, a page of the admin user list.
+PAGE_SIZE = 25
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the latency of the admin user search. With --users, users "
+        "are generated first, in a transaction rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "searches",
+            nargs="*",
+            help="The searched values, a sample of searches by default.",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=0,
+            help="Generate users until there are this many, like 1000000.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Number of times each search is run.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Number of users generated per query.",
+        )
+
+    def generate(self, total, chunk_size):
+        """Create and index users until there are `total` of them."""
+        rng = random.Random(0)
+        backend = get_search_backend()
+        start = time.monotonic()
+
+        count = User.objects.count()
+        for offset in range(count, total, chunk_size):
+            users = []
+            for i in range(offset, min(offset + chunk_size, total)):
+                first_name = rng.choice(FIRST_NAMES)
+                last_name = rng.choice(LAST_NAMES)
+                users.append(
+                    User(
+                        username="search-benchmark-{}".format(i),
+                        first_name=first_name,
+                        last_name=last_name,
+                        email="{}.{}{}@{}".format(
+                            first_name.lower(),
+                            last_name.lower(),
+                            i,
+                            rng.choice(DOMAINS),
+                        ),
+                    )
+                )
+            last_pk = (
+                User.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+            )
+            User.objects.bulk_create(users)
+            # `bulk_create` only sets the primary keys on PostgreSQL.
+            backend.index_many(
+                User.objects.filter(pk__gt=last_pk).only("pk", *INDEXED_FIELDS),
+                replace=False,
+            )
+            self.stdout.write(
+                "{} users generated".format(offset + len(users)), ending="\r"
+            )
+
+        if total > count:
+            self.stdout.write(
+                "{} users generated in {:.2f}s".format(
+                    total - count, time.monotonic() - start
+                )
+            )
+        return max(total, count)
+
+    def measure(self, value, repeat):
+        """Return the latencies of a search in milliseconds, sorted."""
+        backend = get_search_backend()
+        latencies = []
+        for i in range(repeat):
+            start = time.monotonic()
+            list(backend.search(User.objects.order_by("pk"), value)[:PAGE_SIZE])
+            latencies.append((time.monotonic() - start) * 1000)
+        return sorted(latencies)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = self.generate(options["users"], options["chunk_size"])
+            self.stdout.write(
+                "Searching {} users, first page of {} users".format(total, PAGE_SIZE)
+            )
+
+            for value in options["searches"] or SEARCHES:
+                latencies = self.measure(value, options["repeat"])
+                self.stdout.write(
+                    "{!r}: median {:.1f}ms, p95 {:.1f}ms, max {:.1f}ms".format(
+                        value,
+                        latencies[len(latencies) // 2],
+                        latencies[int((len(latencies) - 1) * 0.95)],
+                        latencies[-1],
+                    )
+                )
+
+            # The generated users are not kept.
+            transaction.set_rollback(True)
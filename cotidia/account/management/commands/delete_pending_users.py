@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cotidia.account.deletion import UserDeletion, claim_job
+
+
+class Command(BaseCommand):
+    help = "Delete the users deactivated for deletion from the admin."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help=(
+                "Dependent rows deleted per transaction, "
+                "ACCOUNT_USER_DELETION_CHUNK_SIZE by default."
+            ),
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Also resume the jobs left running by an interrupted worker.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for jobs instead of exiting once none is left.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls with --loop.",
+        )
+
+    def report(self, job):
+        self.stdout.write(
+            "User {}: {} rows deleted".format(job.user_id, job.deleted)
+        )
+
+    def handle(self, *args, **options):
+        user_deletion = UserDeletion(chunk_size=options["chunk_size"])
+        resume = options["resume"]
+        while True:
+            job = claim_job(resume=resume)
+            if job is None:
+                if not options["loop"]:
+                    break
+                # Interrupted jobs are only resumed on start.
+                resume = False
+                time.sleep(options["interval"])
+                continue
+
+            start = time.monotonic()
+            user_deletion.run(job, on_progress=self.report)
+            self.stdout.write(
+                "User {} {} in {:.2f}s, {} rows deleted{}".format(
+                    job.user_id,
+                    job.status,
+                    time.monotonic() - start,
+                    job.deleted,
+                    ": {}".format(job.error) if job.error else "",
+                )
+            )
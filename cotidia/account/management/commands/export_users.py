@@ -0,0 +1,61 @@
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from cotidia.account.exporter import FORMATS, UserExport
+
+
+class Command(BaseCommand):
+    help = "Export the users to a CSV or JSON lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", help="The file to write, the standard output by default."
+        )
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of users loaded per query.",
+        )
+        parser.add_argument("--groups", action="store_true")
+        parser.add_argument("--permissions", action="store_true")
+        parser.add_argument("--profile", action="store_true")
+
+    def handle(self, *args, **options):
+        export = UserExport(
+            groups=options["groups"],
+            permissions=options["permissions"],
+            profile=options["profile"],
+            chunk_size=options["chunk_size"],
+        )
+
+        if options["output"]:
+            output = open(options["output"], "w", newline="", encoding="utf-8")
+        else:
+            output = sys.stdout
+
+        size = 0
+        start = time.monotonic()
+        try:
+            for data in export.stream(options["format"]):
+                output.write(data)
+                size += len(data.encode("utf-8"))
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.monotonic() - start
+
+        # `ru_maxrss` is in kilobytes on Linux.
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stderr.write(
+            "Exported {:.1f}MB in {:.2f}s ({:.1f}MB/s), peak RSS {:.0f}MB".format(
+                size / 1024 / 1024,
+                elapsed,
+                size / 1024 / 1024 / elapsed if elapsed else 0,
+                peak_rss,
+            )
+        )
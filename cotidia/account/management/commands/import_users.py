@@ -0,0 +1,109 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cotidia.account.importer import FORMATS, UserImport, read_rows
+
+
+class Command(BaseCommand):
+    help = "Import users from a CSV or JSON lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The file to import.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Format of the file, guessed from its extension by default.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Rows validated and inserted together.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help=(
+                "Processes hashing the passwords, the number of CPUs by "
+                "default, 0 hashes them in the current process."
+            ),
+        )
+        parser.add_argument(
+            "--state",
+            help=(
+                "File recording the rows already imported. The import "
+                "resumes from it if it exists."
+            ),
+        )
+
+    def get_format(self, options):
+        if options["format"]:
+            return options["format"]
+        extension = os.path.splitext(options["path"])[1].lstrip(".").lower()
+        if extension in FORMATS:
+            return extension
+        raise CommandError(
+            "Can not guess the format of {}, use --format.".format(options["path"])
+        )
+
+    def read_state(self, path):
+        if path is None or not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            return json.load(f)["rows"]
+
+    def write_state(self, path, rows):
+        tmp_path = "{}.tmp".format(path)
+        with open(tmp_path, "w") as f:
+            json.dump({"rows": rows}, f)
+        os.replace(tmp_path, path)
+
+    def handle(self, *args, **options):
+        file_format = self.get_format(options)
+        start = self.read_state(options["state"])
+        if start:
+            self.stdout.write("Resuming after row {}".format(start))
+
+        started_at = time.monotonic()
+        reported_errors = 0
+
+        def on_progress(result):
+            nonlocal reported_errors
+
+            if options["state"]:
+                self.write_state(options["state"], result["rows"])
+
+            for error in result["errors"][reported_errors:]:
+                self.stderr.write(
+                    "Row {}: {}".format(error["row"], json.dumps(error["errors"]))
+                )
+            reported_errors = len(result["errors"])
+
+            elapsed = time.monotonic() - started_at
+            self.stdout.write(
+                "{} rows processed, {} users created ({:.0f} rows/s)".format(
+                    result["rows"],
+                    result["created"],
+                    (result["rows"] - start) / elapsed if elapsed else 0,
+                )
+            )
+
+        user_import = UserImport(
+            chunk_size=options["chunk_size"], workers=options["workers"]
+        )
+        with open(options["path"], newline="", encoding="utf-8-sig") as f:
+            result = user_import.run(
+                read_rows(f, file_format), start=start, on_progress=on_progress
+            )
+
+        self.stdout.write(
+            "Imported {} users, {} rows rejected in {:.2f}s".format(
+                result["created"],
+                len(result["errors"]),
+                time.monotonic() - started_at,
+            )
+        )
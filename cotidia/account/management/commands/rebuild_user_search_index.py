@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cotidia.account.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the user search index, after users were changed without "
+        "being saved one by one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of users indexed per query.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        get_search_backend().rebuild(chunk_size=options["chunk_size"])
+        self.stdout.write(
+            "Search index rebuilt in {:.2f}s".format(time.monotonic() - start)
+        )
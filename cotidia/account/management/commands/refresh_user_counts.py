@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cotidia.account.counts import refresh_counters, refresh_queued_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the users of the admin list counters, after users were "
+        "changed without being saved one by one, and the queued counts of "
+        "the filtered lists."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help=(
+                "Keep refreshing the queued counts of the filtered lists, the "
+                "counters are only recounted on start."
+            ),
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=10,
+            help="Seconds to wait between refreshes with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        counts = refresh_counters()
+        for segment, count in sorted(counts.items()):
+            self.stdout.write("{}: {}".format(segment, count))
+        self.stdout.write(
+            "User counts refreshed in {:.2f}s".format(time.monotonic() - start)
+        )
+
+        while True:
+            start = time.monotonic()
+            refreshed = refresh_queued_counts()
+            if refreshed:
+                self.stdout.write(
+                    "{} filtered counts refreshed in {:.2f}s".format(
+                        refreshed, time.monotonic() - start
+                    )
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cotidia.account.bulk import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Run the bulk actions over users queued from the admin user lists."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Also resume the jobs left running by an interrupted worker.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for jobs instead of exiting once none is left.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls with --loop.",
+        )
+
+    def report(self, job):
+        self.stdout.write(
+            "Job {}: {}/{} users processed, {} changed".format(
+                job.pk, job.processed, job.total, job.affected
+            )
+        )
+
+    def handle(self, *args, **options):
+        resume = options["resume"]
+        while True:
+            job = claim_job(resume=resume)
+            if job is None:
+                if not options["loop"]:
+                    break
+                # Interrupted jobs are only resumed on start.
+                resume = False
+                time.sleep(options["interval"])
+                continue
+
+            start = time.monotonic()
+            run_job(job, on_progress=self.report)
+            self.stdout.write(
+                "Job {} {} in {:.2f}s{}".format(
+                    job.pk,
+                    job.status,
+                    time.monotonic() - start,
+                    ": {}".format(job.error) if job.error else "",
+                )
+            )
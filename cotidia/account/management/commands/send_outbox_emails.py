@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cotidia.account.outbox import send_outbox_emails
+
+
+class Command(BaseCommand):
+    help = "Send the emails stored in the outbox by OutboxEmailBackend."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Emails sent per connection, ACCOUNT_OUTBOX_BATCH_SIZE by default.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of concurrent connections to the mail server.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting once it is empty.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.monotonic()
+            sent = send_outbox_emails(
+                batch_size=options["batch_size"], workers=options["workers"]
+            )
+            if sent or options["verbosity"] > 1:
+                self.stdout.write(
+                    "Sent {} email(s) in {:.2f}s".format(
+                        sent, time.monotonic() - start
+                    )
+                )
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -1,7 +1,78 @@
+from django.apps import apps
 from django.contrib.auth.models import BaseUserManager
+from django.db import transaction
+from django.db.models import Prefetch, QuerySet
 
+from django_otp.models import Device
 
-class UserManager(BaseUserManager):
+
+# The name `two_factor` gives to the primary device of a user.
+DEFAULT_DEVICE_NAME = "default"
+
+
+def normalize_email_key(email):
+    """Return the case-insensitive lookup key of an email, None if blank."""
+    if not email:
+        return None
+    return email.strip().lower() or None
+
+
+def get_device_models():
+    """Return the OTP device models, in the order `devices_for_user` uses."""
+    return [model for model in apps.get_models() if issubclass(model, Device)]
+
+
+def get_default_device_attr(model):
+    return "_default_{}".format(model._meta.model_name)
+
+
+class UserQuerySet(QuerySet):
+
+    def with_two_factor_status(self):
+        """Prefetch the default device of the users.
+
+        One query per device model resolves the two-factor status of all
+        the users, read by `User.two_factor_auth_enabled`.
+        """
+        prefetches = []
+        for model in get_device_models():
+            field = model._meta.get_field("user")
+            prefetches.append(
+                Prefetch(
+                    field.remote_field.get_accessor_name(),
+                    queryset=model._default_manager.filter(
+                        name=DEFAULT_DEVICE_NAME, confirmed=True
+                    ),
+                    to_attr=get_default_device_attr(model),
+                )
+            )
+        return self.prefetch_related(*prefetches)
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+
+    def get_by_natural_key(self, username):
+        return self.get_by_email(username)
+
+    def get_by_email(self, email):
+        """Return the user matching the email regardless of its case."""
+        email_key = normalize_email_key(email)
+        if email_key is None:
+            # Looking up a null key would match every user without email.
+            raise self.model.DoesNotExist
+        return self.get(email_key=email_key)
+
+    def insert(self, user):
+        """Insert a new user with a single query.
+
+        Uniqueness is left to the database constraints instead of being
+        checked beforehand, which also closes the race between the check and
+        the insert. Raise `IntegrityError` if the email or username is taken,
+        the savepoint keeps the surrounding transaction usable.
+        """
+        with transaction.atomic(using=self.db):
+            user.save(using=self.db, force_insert=True)
+        return user
 
     def create_user(
             self,
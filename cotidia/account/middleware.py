@@ -1,37 +1,71 @@
-from django.http import HttpResponseRedirect
-from django.urls import reverse
+from django.http import HttpResponse, HttpResponseRedirect
+from django.urls import get_urlconf, reverse
 from django.contrib import messages
 from django.utils.deprecation import MiddlewareMixin
 
 from cotidia.account.conf import settings
+from cotidia.account.hashing import HashingOverloaded
 
 
 __all__ = ['AccountMiddleware']
 
 
+# Pages reachable before the two-factor authentication is set up.
+TWO_FACTOR_SETUP_URL_NAMES = [
+    'account-admin:setup',
+    'account-admin:logout',
+    'account-admin:qr',
+]
+
+
 class AccountMiddleware(MiddlewareMixin):
 
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        # The reversed setup pages of each URL configuration.
+        self._setup_urls = {}
+
+    def get_setup_urls(self):
+        """Return the paths of the setup pages, reversed once."""
+        urlconf = get_urlconf()
+        if urlconf not in self._setup_urls:
+            self._setup_urls[urlconf] = [
+                reverse(name) for name in TWO_FACTOR_SETUP_URL_NAMES
+            ]
+        return self._setup_urls[urlconf]
+
     def process_request(self, request):
 
-        if settings.ACCOUNT_ENABLE_TWO_FACTOR is True:
+        if settings.ACCOUNT_ENABLE_TWO_FACTOR is True \
+                and settings.ACCOUNT_FORCE_ADMIN_TWO_FACTOR is True:
+
+            # Checked before the user, which is loaded on first access.
+            if request.path.startswith(settings.ACCOUNT_MIDDLEWARE_EXEMPT_PATHS):
+                return None
+
+            setup_urls = self.get_setup_urls()
+            if request.path in setup_urls:
+                return None
 
             # If the account had two factor enabled and forces admin to
             # setup the two-factor auth we then check if:
             # - They are authenticated (first step)
             # - They are not verified (second step)
-            if settings.ACCOUNT_FORCE_ADMIN_TWO_FACTOR is True \
-                    and request.user.is_authenticated \
-                    and not request.user.is_verified():
-
-                setup_url = reverse('account-admin:setup')
-                logout_url = reverse('account-admin:logout')
-                qrcode_url = reverse('account-admin:qr')
-                if request.path not in [setup_url, logout_url, qrcode_url]:
-                    messages.warning(
-                        request,
-                        "You must setup two-factor authentication to access "
-                        "the administration panel."
-                    )
-                    return HttpResponseRedirect(reverse('account-admin:setup'))
+            if request.user.is_authenticated and not request.user.is_verified():
+                messages.warning(
+                    request,
+                    "You must setup two-factor authentication to access "
+                    "the administration panel."
+                )
+                return HttpResponseRedirect(setup_urls[0])
+
+        return None
 
+    def process_exception(self, request, exception):
+        # The API views answer it with the same status.
+        if isinstance(exception, HashingOverloaded):
+            response = HttpResponse(str(exception.detail), status=exception.status_code)
+            if exception.wait:
+                response["Retry-After"] = "%d" % exception.wait
+            return response
         return None
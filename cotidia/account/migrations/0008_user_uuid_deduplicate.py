@@ -0,0 +1,34 @@
+# Generated by Django 2.1.15 on 2026-10-18 09:40
+
+import uuid
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def deduplicate_uuids(apps, schema_editor):
+    """Give a new uuid to every user sharing it with an older user."""
+    User = apps.get_model('account', 'User')
+
+    duplicates = (
+        User.objects.values('uuid')
+        .annotate(count=Count('id'), first_id=Min('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        users = User.objects.filter(uuid=duplicate['uuid']).exclude(
+            id=duplicate['first_id']
+        )
+        for user_id in users.values_list('id', flat=True):
+            User.objects.filter(id=user_id).update(uuid=uuid.uuid4())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0007_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_uuids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.1.15 on 2026-10-18 09:41
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0008_user_uuid_deduplicate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
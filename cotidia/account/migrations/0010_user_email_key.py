@@ -0,0 +1,53 @@
+# Generated by Django 2.1.15 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower, Trim
+
+
+def populate_email_keys(apps, schema_editor):
+    """Set the email key of existing users.
+
+    Fail, listing them, when several emails differ only in case: they must be
+    changed or the users merged before migrating, as only one of them could
+    sign in with the key.
+    """
+    User = apps.get_model('account', 'User')
+
+    users = User.objects.exclude(email='').annotate(key=Lower(Trim('email')))
+
+    duplicates = (
+        users.values('key')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .values_list('key', flat=True)
+    )
+    conflicts = [
+        ', '.join(
+            users.filter(key=key).order_by('id').values_list('email', flat=True)
+        )
+        for key in duplicates
+    ]
+    if conflicts:
+        raise RuntimeError(
+            'Users whose emails differ only in case, change the emails or '
+            'merge the users before migrating:\n%s' % '\n'.join(conflicts)
+        )
+
+    User.objects.exclude(email='').update(email_key=Lower(Trim('email')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0009_user_uuid_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_key',
+            field=models.CharField(editable=False, max_length=254, null=True, unique=True),
+        ),
+        migrations.RunPython(populate_email_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 2.1.15 on 2026-10-18 11:20
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+
+# The terms of `cotidia.account.search` when this migration was written.
+WORD_RE = re.compile(r"\w+")
+
+MAX_TERM_LENGTH = 100
+
+
+def get_terms(first_name, last_name, email):
+    words = set()
+    for value in (first_name, last_name, email):
+        words.update(
+            word[:MAX_TERM_LENGTH] for word in WORD_RE.findall((value or "").lower())
+        )
+
+    trigrams = set()
+    for word in words:
+        padded = "  {} ".format(word)
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return words, trigrams
+
+
+def build_search_index(apps, schema_editor):
+    """Index the users by chunks, each committed on its own."""
+    User = apps.get_model('account', 'User')
+    UserSearchTerm = apps.get_model('account', 'UserSearchTerm')
+
+    users = User.objects.order_by('pk').values_list(
+        'pk', 'first_name', 'last_name', 'email'
+    )
+    last_pk = 0
+    while True:
+        chunk = list(users.filter(pk__gt=last_pk)[:1000])
+        if not chunk:
+            break
+
+        terms = []
+        for pk, first_name, last_name, email in chunk:
+            words, trigrams = get_terms(first_name, last_name, email)
+            terms.extend(
+                UserSearchTerm(user_id=pk, term=word, is_trigram=False)
+                for word in words
+            )
+            terms.extend(
+                UserSearchTerm(user_id=pk, term=trigram, is_trigram=True)
+                for trigram in trigrams
+            )
+        with transaction.atomic():
+            UserSearchTerm.objects.bulk_create(terms)
+        last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    # The index of a large user table is not built in a single transaction.
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('account', '0011_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=100)),
+                ('is_trigram', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User search term',
+                'verbose_name_plural': 'User search terms',
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.1.15 on 2026-10-18 12:30
+
+from django.db import migrations, models
+from django.db.models import Q
+import django.utils.timezone
+
+
+# The segments of `cotidia.account.counts` when this migration was written.
+SEGMENTS = {
+    "user": Q(is_staff=False, is_superuser=False),
+    "staff": Q(is_staff=True, is_superuser=False),
+    "superuser": Q(is_superuser=True),
+    "active": Q(is_active=True),
+    "pending": Q(is_active=False),
+}
+
+
+def count_users(apps, schema_editor):
+    User = apps.get_model('account', 'User')
+    UserCounter = apps.get_model('account', 'UserCounter')
+
+    UserCounter.objects.bulk_create([
+        UserCounter(segment=segment, count=User.objects.filter(query).count())
+        for segment, query in SEGMENTS.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0013_user_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('segment', models.CharField(max_length=20, unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'User counter',
+                'verbose_name_plural': 'User counters',
+            },
+        ),
+        migrations.RunPython(count_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.15 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0016_user_deletion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userdeletionjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], db_index=True, default='pending', max_length=10),
+        ),
+    ]
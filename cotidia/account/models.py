@@ -1,5 +1,8 @@
+import json
 import uuid
 from django.db import models
+from django.utils import timezone
+from django.core.exceptions import ValidationError
 from django.contrib.auth.models import AbstractUser
 from django.urls import reverse
 from django.contrib.auth.tokens import default_token_generator
@@ -14,17 +17,34 @@ from two_factor.utils import default_device
 
 from cotidia.account.conf import settings
 from cotidia.account.notices import NewUserActivationNotice, UserInvitationNotice
-from cotidia.account.managers import UserManager
+from cotidia.account.managers import (
+    UserManager,
+    get_default_device_attr,
+    get_device_models,
+    normalize_email_key,
+)
 
 
 class User(AbstractUser):
-    uuid = models.UUIDField(default=uuid.uuid4, editable=False)
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     email = models.EmailField(
         _("email address"),
         blank=True,
         unique=True,
         error_messages={"unique": _("A user with that email already exists.")},
     )
+    # Lower case copy of `email` used for lookups, it prevents duplicates
+    # differing only in case. Kept up to date by `save`.
+    email_key = models.CharField(
+        max_length=254, unique=True, null=True, editable=False
+    )
+    # Incremented to revoke the signed access and refresh tokens of the user.
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+    # Set when the user is deactivated to be deleted in the background by
+    # the `delete_pending_users` command.
+    deletion_requested_at = models.DateTimeField(
+        null=True, blank=True, editable=False
+    )
     objects = UserManager()
 
     # Used in createsuperuser manage command
@@ -35,6 +55,50 @@ class User(AbstractUser):
         ordering = ["first_name", "last_name"]
         verbose_name = "User"
         verbose_name_plural = "Users"
+        indexes = [
+            # Sort key of the keyset pagination of the user lists.
+            models.Index(
+                fields=["first_name", "last_name", "id"], name="account_user_name_idx"
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        email_key = normalize_email_key(self.email)
+        # Report a changed email taken by another user in another case as a
+        # validation error, the unique constraint would raise on the update.
+        if (
+            not self._state.adding
+            and email_key is not None
+            and email_key != self.__dict__.get("email_key")
+            and User._default_manager.filter(email_key=email_key)
+            .exclude(pk=self.pk)
+            .exists()
+        ):
+            raise ValidationError(
+                {"email": self._meta.get_field("email").error_messages["unique"]}
+            )
+        self.email_key = email_key
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "email" in update_fields:
+            kwargs["update_fields"] = set(update_fields) | {"email_key"}
+        super().save(*args, **kwargs)
+
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude)
+
+        # `email_key` is not editable, report a clash on the email field.
+        if exclude and "email" in exclude:
+            return
+        email_key = normalize_email_key(self.email)
+        if email_key is None:
+            return
+        users = User._default_manager.filter(email_key=email_key)
+        if not self._state.adding and self.pk is not None:
+            users = users.exclude(pk=self.pk)
+        if users.exists():
+            raise ValidationError(
+                {"email": self._meta.get_field("email").error_messages["unique"]}
+            )
 
     def __str__(self):
         if self.first_name or self.last_name:
@@ -43,15 +107,26 @@ class User(AbstractUser):
 
     @property
     def token(self):
-        token, created = Token.objects.get_or_create(user=self)
-        return token
+        # Use the reverse accessor so a token attached on creation or joined
+        # with `select_related("auth_token")` does not cost another query.
+        try:
+            return self.auth_token
+        except Token.DoesNotExist:
+            return Token.objects.create(user=self)
 
     @property
     def name(self):
+        # The admin lists annotate the name instead of loading its parts.
+        loaded = "first_name" in self.__dict__ and "last_name" in self.__dict__
+        if not loaded and "_name" in self.__dict__:
+            return self.__dict__["_name"]
         return "{} {}".format(self.first_name, self.last_name)
 
     @property
     def has_password(self):
+        # Annotated by the admin lists, which do not load the password hash.
+        if "password" not in self.__dict__ and "_has_password" in self.__dict__:
+            return self.__dict__["_has_password"]
         if self.password:
             return True
         else:
@@ -60,7 +135,14 @@ class User(AbstractUser):
     @property
     def two_factor_auth_enabled(self):
         if self.is_staff or self.is_superuser:
-            return default_device(self)
+            # Prefetched by `User.objects.with_two_factor_status()`.
+            attrs = [get_default_device_attr(model) for model in get_device_models()]
+            if not all(attr in self.__dict__ for attr in attrs):
+                return default_device(self)
+            for attr in attrs:
+                if self.__dict__[attr]:
+                    return self.__dict__[attr][0]
+            return None
         return False
 
     def get_absolute_url(self):
@@ -127,3 +209,175 @@ class User(AbstractUser):
 def create_auth_token(sender, instance=None, created=False, **kwargs):
     if created:
         Token.objects.create(user=instance)
+
+
+class UserSearchTerm(models.Model):
+    """A word or trigram of a user name or email, used to search users.
+
+    Maintained by `cotidia.account.search.TokenIndexSearchBackend`.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="search_terms"
+    )
+    term = models.CharField(max_length=100, db_index=True)
+    is_trigram = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "User search term"
+        verbose_name_plural = "User search terms"
+
+    def __str__(self):
+        return self.term
+
+
+class OutboxEmail(models.Model):
+    """An email stored by `OutboxEmailBackend` until it is delivered.
+
+    Rows are written within the transaction of the sender so only emails of
+    committed transactions are sent, by the `send_outbox_emails` command.
+    """
+
+    # The MIME text of the message and the JSON encoded sender and
+    # recipients, the `Bcc` recipients are not part of the MIME headers.
+    message = models.BinaryField()
+    envelope = models.TextField(default="{}")
+    created_at = models.DateTimeField(auto_now_add=True)
+    # The email is not claimed before this date, used for leases and retries.
+    available_at = models.DateTimeField(default=timezone.now, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Set once the maximum number of attempts is reached.
+    failed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Outbox email"
+        verbose_name_plural = "Outbox emails"
+
+    def __str__(self):
+        return "Outbox email {}".format(self.pk)
+
+    @classmethod
+    def from_message(cls, message):
+        envelope = {
+            "from_email": message.from_email,
+            "to": list(message.to),
+            "cc": list(message.cc),
+            "bcc": list(message.bcc),
+        }
+        return cls(
+            message=message.message().as_bytes(),
+            envelope=json.dumps(envelope),
+        )
+
+    def get_message(self):
+        from cotidia.account.outbox import StoredEmailMessage
+
+        return StoredEmailMessage(bytes(self.message), **json.loads(self.envelope))
+
+
+class UserCounter(models.Model):
+    """The number of users of a segment, like the active or staff users.
+
+    Maintained by the signals of `cotidia.account.counts`.
+    """
+
+    segment = models.CharField(max_length=20, unique=True)
+    count = models.BigIntegerField(default=0)
+    # Last time the count was recomputed from the users.
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "User counter"
+        verbose_name_plural = "User counters"
+
+    def __str__(self):
+        return "{}: {}".format(self.segment, self.count)
+
+
+class UserBulkJob(models.Model):
+    """A bulk action over too many users to run within a request.
+
+    Run by the `run_user_bulk_jobs` command, see `cotidia.account.bulk`.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    action = models.CharField(max_length=20)
+    # JSON encoded selection of users and parameters of the action.
+    params = models.TextField(default="{}")
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True
+    )
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    # Number of users changed by the action, like the users activated.
+    affected = models.PositiveIntegerField(default=0)
+    # Primary key of the last user processed, the job resumes after it.
+    last_user_id = models.PositiveIntegerField(default=0)
+    created_by = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "User bulk job"
+        verbose_name_plural = "User bulk jobs"
+
+    def __str__(self):
+        return "{} ({}/{})".format(self.action, self.processed, self.total)
+
+
+class UserDeletionJob(models.Model):
+    """The deletion of a user and of the rows referencing it.
+
+    Run by the `delete_pending_users` command, see `cotidia.account.deletion`.
+    The job is kept once the user is deleted.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    # The user was reactivated before the job deleted it.
+    CANCELLED = "cancelled"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+        (CANCELLED, "Cancelled"),
+    )
+
+    # Not a foreign key, the user is deleted by the job.
+    user_id = models.PositiveIntegerField(unique=True)
+    email = models.CharField(max_length=254, blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True
+    )
+    # Number of rows deleted or detached so far.
+    deleted = models.PositiveIntegerField(default=0)
+    requested_by = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "User deletion job"
+        verbose_name_plural = "User deletion jobs"
+
+    def __str__(self):
+        return "Deletion of user {} ({})".format(self.user_id, self.status)
@@ -0,0 +1,191 @@
+"""
+Transactional outbox for the emails sent by the project.
+
+Set `EMAIL_BACKEND` to `"cotidia.account.outbox.OutboxEmailBackend"` to store
+the emails in the database instead of sending them during the request. They
+are written within the current transaction, so the emails of a request
+rolled back are never sent and a slow mail server does not hold the
+transaction open.
+
+The `send_outbox_emails` management command delivers them in batches with
+the backend set in `ACCOUNT_OUTBOX_EMAIL_BACKEND`, one connection per batch.
+Batches are claimed with `SELECT ... FOR UPDATE SKIP LOCKED` and a lease, so
+several workers can run at the same time. The lease of each email is renewed
+right before it is sent, an email reclaimed by another worker meanwhile is
+skipped instead of being sent twice.
+
+Emails are stored as their MIME text, so queued rows do not depend on the
+code that wrote them.
+
+"""
+import threading
+from datetime import timedelta
+from email import message_from_bytes
+from email.message import Message
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import MIMEMixin
+from django.db import connection as db_connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from cotidia.account.conf import settings
+from cotidia.account.models import OutboxEmail
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """Email backend storing the messages in the outbox."""
+
+    def send_messages(self, email_messages):
+        emails = [
+            OutboxEmail.from_message(message)
+            for message in email_messages
+            if message.recipients()
+        ]
+        OutboxEmail.objects.bulk_create(emails)
+        return len(emails)
+
+
+class StoredMIMEMessage(MIMEMixin, Message):
+    """A parsed MIME message, serialized like the ones of Django."""
+
+
+class StoredEmailMessage(EmailMessage):
+    """An email of the outbox, sent as the MIME text it was stored with."""
+
+    def __init__(self, mime, from_email=None, to=None, cc=None, bcc=None):
+        super().__init__(from_email=from_email, to=to, cc=cc, bcc=bcc)
+        self.mime = mime
+        self.subject = self.message()["Subject"] or ""
+
+    def message(self):
+        return message_from_bytes(self.mime, _class=StoredMIMEMessage)
+
+
+def get_retry_delay(attempts):
+    """Return the seconds to wait after the given number of attempts."""
+    return settings.ACCOUNT_OUTBOX_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+
+
+def claim(batch_size=None):
+    """Reserve a batch of emails ready to be sent and return it.
+
+    The emails are hidden from other workers for `ACCOUNT_OUTBOX_LEASE`
+    seconds, after which they are claimed again if they were not sent.
+    """
+    if batch_size is None:
+        batch_size = settings.ACCOUNT_OUTBOX_BATCH_SIZE
+
+    now = timezone.now()
+    lease_end = now + timedelta(seconds=settings.ACCOUNT_OUTBOX_LEASE)
+
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(failed_at__isnull=True, available_at__lte=now)
+            .order_by("available_at", "id")[:batch_size]
+        )
+        if emails:
+            OutboxEmail.objects.filter(pk__in=[e.pk for e in emails]).update(
+                available_at=lease_end, attempts=F("attempts") + 1
+            )
+
+    for email in emails:
+        email.available_at = lease_end
+        email.attempts += 1
+    return emails
+
+
+def retry_later(email, error):
+    """Record a failed attempt, the email fails for good after the last one."""
+    now = timezone.now()
+    values = {"last_error": "{}: {}".format(type(error).__name__, error)}
+    if email.attempts >= settings.ACCOUNT_OUTBOX_MAX_ATTEMPTS:
+        values["failed_at"] = now
+    else:
+        values["available_at"] = now + timedelta(
+            seconds=get_retry_delay(email.attempts)
+        )
+    OutboxEmail.objects.filter(pk=email.pk).update(**values)
+
+
+def renew_lease(email):
+    """Extend the lease of a claimed email, return False if it was lost.
+
+    The lease is lost once another worker claimed the email again.
+    """
+    lease_end = timezone.now() + timedelta(seconds=settings.ACCOUNT_OUTBOX_LEASE)
+    renewed = OutboxEmail.objects.filter(
+        pk=email.pk, available_at=email.available_at
+    ).update(available_at=lease_end)
+    if renewed:
+        email.available_at = lease_end
+    return bool(renewed)
+
+
+def send_batch(emails):
+    """Send the emails over a single connection and return the number sent."""
+    sent = 0
+    connection = get_connection(settings.ACCOUNT_OUTBOX_EMAIL_BACKEND)
+
+    try:
+        for email in emails:
+            if not renew_lease(email):
+                continue
+            try:
+                # No-op while the connection is open, reconnects after an
+                # error closed it.
+                connection.open()
+                connection.send_messages([email.get_message()])
+            except Exception as e:
+                retry_later(email, e)
+                connection.close()
+            else:
+                OutboxEmail.objects.filter(pk=email.pk).delete()
+                sent += 1
+    finally:
+        connection.close()
+
+    return sent
+
+
+def drain(batch_size=None, max_batches=None):
+    """Send batches until the outbox is empty, return the number sent."""
+    sent = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        emails = claim(batch_size)
+        if not emails:
+            break
+        sent += send_batch(emails)
+        batches += 1
+    return sent
+
+
+def send_outbox_emails(batch_size=None, workers=1, max_batches=None):
+    """Drain the outbox with up to `workers` concurrent connections.
+
+    Each worker runs in its own thread and database connection, except when
+    a single worker is requested which runs in the current thread.
+    """
+    if workers <= 1:
+        return drain(batch_size, max_batches)
+
+    results = []
+    lock = threading.Lock()
+
+    def work():
+        try:
+            sent = drain(batch_size, max_batches)
+            with lock:
+                results.append(sent)
+        finally:
+            db_connection.close()
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(results)
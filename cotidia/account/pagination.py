@@ -0,0 +1,222 @@
+"""
+Keyset (cursor) pagination of the user lists.
+
+Instead of skipping the rows of the previous pages with OFFSET, each page
+starts after the sort key of the last row of the previous page. With an
+index on the sort key, every page costs the same as the first one.
+
+The cursors are opaque strings, a page is requested with the cursor of the
+next or previous page of the page before.
+
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.http import Http404
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# Unique sort key of the user lists, backed by the index of `User.Meta`.
+USER_ORDERING = ("first_name", "last_name", "id")
+
+
+class InvalidCursor(Exception):
+    """The cursor can not be decoded."""
+
+
+def encode_cursor(direction, values):
+    data = json.dumps([direction, values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, values = json.loads(data.decode())
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+    if direction not in ("next", "previous") or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+class KeysetPage:
+    """A page of a `KeysetPaginator`.
+
+    It follows the interface of `django.core.paginator.Page` where it can,
+    the "page numbers" being cursors.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.number = None
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.next_cursor
+
+    def previous_page_number(self):
+        return self.previous_cursor
+
+
+class KeysetPaginator:
+    """Paginate a queryset ordered by the unique sort key `ordering`.
+
+    The fields of the key are sorted in ascending order and must not be
+    null. The last one must be unique, usually the primary key.
+    """
+
+    def __init__(self, queryset, per_page, ordering=USER_ORDERING):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    def get_key(self, obj):
+        return [getattr(obj, field) for field in self.ordering]
+
+    def get_filter(self, values, lookup):
+        """Return the filter selecting the rows after or before `values`.
+
+        `(a, b) > (x, y)` is expanded to `a > x OR (a = x AND b > y)`.
+        """
+        query = Q()
+        for i, field in enumerate(self.ordering):
+            condition = Q(**{"{}__{}".format(field, lookup): values[i]})
+            for previous_field, value in zip(self.ordering[:i], values):
+                condition &= Q(**{previous_field: value})
+            query |= condition
+        return query
+
+    def page(self, cursor=None):
+        """Return the page of `cursor`, the first page if None."""
+        direction, values = "next", None
+        if cursor:
+            direction, values = decode_cursor(cursor)
+            if len(values) != len(self.ordering):
+                raise InvalidCursor(cursor)
+
+        queryset = self.queryset
+        try:
+            if direction == "next":
+                queryset = queryset.order_by(*self.ordering)
+                if values is not None:
+                    queryset = queryset.filter(self.get_filter(values, "gt"))
+            else:
+                queryset = queryset.order_by(
+                    *("-{}".format(field) for field in self.ordering)
+                )
+                queryset = queryset.filter(self.get_filter(values, "lt"))
+        except (TypeError, ValueError):
+            # The values of the cursor do not match the fields.
+            raise InvalidCursor(cursor)
+
+        # One more row tells if there is a page after this one.
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        if direction == "previous":
+            object_list.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = previous_cursor = None
+        if object_list and has_next:
+            next_cursor = encode_cursor("next", self.get_key(object_list[-1]))
+        if object_list and has_previous:
+            previous_cursor = encode_cursor("previous", self.get_key(object_list[0]))
+
+        return KeysetPage(object_list, self, next_cursor, previous_cursor)
+
+
+class KeysetPaginationMixin:
+    """Page the list views with `KeysetPaginator` when `keyset_pagination`.
+
+    The cursor is read from the usual page parameter, so the links built
+    with `page_obj.next_page_number` keep working. Page numbers, like the
+    `page=1` of the first page, start from the first page.
+    """
+
+    keyset_pagination = False
+    keyset_ordering = USER_ORDERING
+
+    def get_keyset_pagination(self):
+        return self.keyset_pagination
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.get_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        cursor = self.kwargs.get(self.page_kwarg) or self.request.GET.get(
+            self.page_kwarg
+        )
+        if cursor is not None and cursor.isdigit():
+            cursor = None
+
+        try:
+            page = paginator.page(cursor)
+        except InvalidCursor:
+            raise Http404("Invalid page.")
+
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+
+class KeysetPagination(BasePagination):
+    """Django REST framework pagination with `KeysetPaginator`."""
+
+    page_size = 50
+    cursor_query_param = "cursor"
+    ordering = USER_ORDERING
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = KeysetPaginator(queryset, self.page_size, self.ordering)
+        try:
+            self.page = paginator.page(
+                request.query_params.get(self.cursor_query_param)
+            )
+        except InvalidCursor:
+            raise NotFound("Invalid cursor.")
+        return self.page.object_list
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_link(self.page.next_cursor),
+                "previous": self.get_link(self.page.previous_cursor),
+                "results": data,
+            }
+        )
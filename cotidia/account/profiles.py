@@ -0,0 +1,98 @@
+"""
+The profile model and form set by `ACCOUNT_PROFILE_MODEL` and
+`ACCOUNT_PROFILE_FORM`.
+
+They are resolved on first use and kept until the settings change, along
+with the form classes adding the profile form to the user forms of the
+admin.
+
+"""
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from betterforms.multiform import MultiModelForm
+
+from cotidia.account.conf import settings
+
+
+_resolved = {}
+
+
+def get_profile_model():
+    """Return the profile model, None if `ACCOUNT_PROFILE_MODEL` is not set."""
+    if "model" not in _resolved:
+        model = None
+        if settings.ACCOUNT_PROFILE_MODEL:
+            try:
+                model = apps.get_model(settings.ACCOUNT_PROFILE_MODEL)
+            except (LookupError, ValueError) as e:
+                raise ImproperlyConfigured(
+                    "ACCOUNT_PROFILE_MODEL refers to an unknown model: {}".format(e)
+                )
+        _resolved["model"] = model
+    return _resolved["model"]
+
+
+def get_profile_form():
+    """Return the form adding a profile with a new user, or None."""
+    if "form" not in _resolved:
+        form = None
+        if get_profile_model() is not None:
+            if not settings.ACCOUNT_PROFILE_FORM:
+                raise ImproperlyConfigured(
+                    "ACCOUNT_PROFILE_FORM must be set with ACCOUNT_PROFILE_MODEL."
+                )
+            try:
+                form = import_string(settings.ACCOUNT_PROFILE_FORM)
+            except ImportError as e:
+                raise ImproperlyConfigured(
+                    "ACCOUNT_PROFILE_FORM cannot be imported: {}".format(e)
+                )
+        _resolved["form"] = form
+    return _resolved["form"]
+
+
+class UserProfileForm(MultiModelForm):
+    """Save the user then its profile, return the user."""
+
+    def save(self, commit=True):
+        objects = super().save(commit=False)
+
+        if commit:
+            user = objects["user"]
+            user.save()
+            profile = objects["profile"]
+            profile.user = user
+            profile.save()
+
+        return objects.get("user")
+
+
+def get_user_form_class(user_form_class):
+    """Return `user_form_class`, combined with the profile form if any."""
+    profile_form_class = get_profile_form()
+    if profile_form_class is None:
+        return user_form_class
+
+    forms = _resolved.setdefault("forms", {})
+    if user_form_class not in forms:
+        forms[user_form_class] = type(
+            "{}WithProfile".format(user_form_class.__name__),
+            (UserProfileForm,),
+            {
+                "form_classes": {
+                    "user": user_form_class,
+                    "profile": profile_form_class,
+                }
+            },
+        )
+    return forms[user_form_class]
+
+
+@receiver(setting_changed)
+def reset_profile(sender, setting, **kwargs):
+    if setting in ("ACCOUNT_PROFILE_MODEL", "ACCOUNT_PROFILE_FORM"):
+        _resolved.clear()
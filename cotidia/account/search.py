@@ -0,0 +1,247 @@
+"""
+Search backends used by the admin user filter.
+
+The backend is set with `ACCOUNT_USER_SEARCH_BACKEND`. The default,
+`TokenIndexSearchBackend`, keeps the words and trigrams of the name and
+email of each user in the indexed `UserSearchTerm` table, kept up to date
+when users are saved. A search matches the users with a word starting with
+each of the searched words, or sharing enough trigrams with it to allow
+typos. The trigrams are only compared for a bounded number of candidate
+users, found from the rarest trigrams of the word. `ContainsSearchBackend`
+is the former `icontains` search, without an index.
+
+The `benchmark_user_search` command measures the latency of the searches.
+
+"""
+import math
+import re
+import threading
+import uuid
+
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Count, Q
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from cotidia.account.cache import LRUCache
+from cotidia.account.conf import settings
+from cotidia.account.models import User, UserSearchTerm
+
+
+WORD_RE = re.compile(r"\w+")
+
+# Fields of the user the terms are built from.
+INDEXED_FIELDS = ("first_name", "last_name", "email")
+
+MAX_TERM_LENGTH = 100
+
+
+def get_words(value):
+    return [word[:MAX_TERM_LENGTH] for word in WORD_RE.findall(value.lower())]
+
+
+def get_trigrams(word):
+    # Padded like PostgreSQL's pg_trgm, so the start of words weighs more.
+    padded = "  {} ".format(word)
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def get_terms(first_name, last_name, email):
+    """Return the `(words, trigrams)` sets indexed for a user."""
+    words = set()
+    for value in (first_name, last_name, email):
+        words.update(get_words(value or ""))
+
+    trigrams = set()
+    for word in words:
+        trigrams.update(get_trigrams(word))
+    return words, trigrams
+
+
+class BaseSearchBackend:
+    """Search users, the backends must implement `filter`."""
+
+    def search(self, queryset, value):
+        # A user ID is matched exactly.
+        try:
+            return queryset.filter(uuid=uuid.UUID(value, version=4))
+        except ValueError:
+            pass
+        return self.filter(queryset, value)
+
+    def filter(self, queryset, value):
+        raise NotImplementedError
+
+    def index(self, user):
+        """Update the index of a user saved."""
+
+    def index_many(self, users, replace=True):
+        """Update the index of users saved in bulk.
+
+        `replace` may be False for users which were never indexed.
+        """
+
+    def rebuild(self, chunk_size=1000):
+        """Rebuild the index of all the users."""
+
+
+class ContainsSearchBackend(BaseSearchBackend):
+    """Match the value anywhere in the name or email, with a table scan."""
+
+    def filter(self, queryset, value):
+        return queryset.filter(
+            Q(first_name__icontains=value)
+            | Q(last_name__icontains=value)
+            | Q(email__icontains=value)
+        )
+
+
+class TokenIndexSearchBackend(BaseSearchBackend):
+    """Match words by prefix or by trigram similarity using the term index."""
+
+    # Proportion of the trigrams of a searched word a user must have.
+    similarity = 0.5
+    # Words shorter than this are only matched by prefix.
+    fuzzy_min_length = 3
+    # Most users compared by trigrams for a searched word. A word made of
+    # common trigrams may miss fuzzy matches beyond, not prefix matches.
+    max_fuzzy_candidates = 1000
+    # Users of a trigram are counted up to this number to find the rarest.
+    frequency_cap = 10000
+    # Seconds the number of users of a trigram is kept.
+    frequency_timeout = 3600
+
+    def __init__(self):
+        self.frequencies = LRUCache(max_entries=10000, timeout=self.frequency_timeout)
+
+    def get_frequencies(self, trigrams):
+        """Return the number of users with each trigram, up to `frequency_cap`.
+
+        The counts only order the trigrams by rarity, they are cached in the
+        process.
+        """
+        frequencies = self.frequencies.get_many(trigrams)
+        for trigram in trigrams:
+            if trigram not in frequencies:
+                frequencies[trigram] = UserSearchTerm.objects.filter(
+                    is_trigram=True, term=trigram
+                )[:self.frequency_cap].count()
+                self.frequencies.set(trigram, frequencies[trigram])
+        return frequencies
+
+    def get_fuzzy_matches(self, word):
+        """Return the users sharing enough trigrams with the word."""
+        trigrams = get_trigrams(word)
+        needed = math.ceil(len(trigrams) * self.similarity)
+
+        # A match has at least one of any `len(trigrams) - needed + 1` of the
+        # trigrams, the rarest ones give the fewest candidates.
+        frequencies = self.get_frequencies(trigrams)
+        rarest = sorted(trigrams, key=lambda trigram: (frequencies[trigram], trigram))
+        candidates = UserSearchTerm.objects.filter(
+            is_trigram=True, term__in=rarest[:len(trigrams) - needed + 1]
+        ).values("user_id")[:self.max_fuzzy_candidates]
+
+        return (
+            UserSearchTerm.objects.filter(
+                user_id__in=candidates, is_trigram=True, term__in=trigrams
+            )
+            .values("user_id")
+            .annotate(count=Count("id"))
+            .filter(count__gte=needed)
+            .values("user_id")
+        )
+
+    def filter(self, queryset, value):
+        words = get_words(value)
+        if not words:
+            return queryset
+
+        for word in words:
+            matches = Q(
+                pk__in=UserSearchTerm.objects.filter(
+                    is_trigram=False, term__startswith=word
+                ).values("user_id")
+            )
+
+            if len(word) >= self.fuzzy_min_length:
+                matches |= Q(pk__in=self.get_fuzzy_matches(word))
+
+            queryset = queryset.filter(matches)
+        return queryset
+
+    def get_user_terms(self, user):
+        words, trigrams = get_terms(*(getattr(user, f) for f in INDEXED_FIELDS))
+        return [
+            UserSearchTerm(user_id=user.pk, term=word, is_trigram=False)
+            for word in words
+        ] + [
+            UserSearchTerm(user_id=user.pk, term=trigram, is_trigram=True)
+            for trigram in trigrams
+        ]
+
+    def index(self, user):
+        self.index_many([user])
+
+    def index_many(self, users, replace=True):
+        terms = [term for user in users for term in self.get_user_terms(user)]
+        if replace:
+            # Only the terms of the changed values are deleted and inserted.
+            keys = {(term.user_id, term.term, term.is_trigram) for term in terms}
+            existing = UserSearchTerm.objects.filter(
+                user_id__in=[u.pk for u in users]
+            ).values_list("id", "user_id", "term", "is_trigram")
+
+            stale_ids = []
+            for pk, *key in existing:
+                if tuple(key) in keys:
+                    keys.discard(tuple(key))
+                else:
+                    stale_ids.append(pk)
+            if stale_ids:
+                UserSearchTerm.objects.filter(id__in=stale_ids).delete()
+            terms = [
+                term for term in terms
+                if (term.user_id, term.term, term.is_trigram) in keys
+            ]
+        if terms:
+            UserSearchTerm.objects.bulk_create(terms)
+
+    @transaction.atomic
+    def rebuild(self, chunk_size=1000):
+        UserSearchTerm.objects.all().delete()
+
+        users = User.objects.order_by("pk").only("pk", *INDEXED_FIELDS)
+        last_pk = 0
+        while True:
+            chunk = list(users.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            self.index_many(chunk, replace=False)
+            last_pk = chunk[-1].pk
+
+
+_search_backend = None
+_search_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """Return the backend set in `ACCOUNT_USER_SEARCH_BACKEND`."""
+    global _search_backend
+
+    if _search_backend is None:
+        with _search_backend_lock:
+            if _search_backend is None:
+                _search_backend = import_string(
+                    settings.ACCOUNT_USER_SEARCH_BACKEND
+                )()
+    return _search_backend
+
+
+@receiver(setting_changed)
+def reset_search_backend(sender, setting, **kwargs):
+    global _search_backend
+
+    if setting == "ACCOUNT_USER_SEARCH_BACKEND":
+        _search_backend = None
@@ -3,7 +3,9 @@ import hashlib
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth import authenticate
 from django.utils.timezone import now
+from django.db import IntegrityError
 from cotidia.account.conf import settings
+from cotidia.account.hashing import get_hashing_pool
 
 from rest_framework import serializers
 
@@ -11,7 +13,22 @@ from cotidia.account.models import User
 from cotidia.account.validators import is_alpha
 
 
-class SignUpSerializer(serializers.Serializer):
+def split_full_name(full_name):
+    """Return the first and last names of a full name."""
+    names = full_name.strip().split(' ')
+    return names[0], ' '.join(names[1:])
+
+
+def make_username(email):
+    """Hash the email address to generate a unique username."""
+    m = hashlib.md5()
+    m.update(email.encode("utf-8"))
+    return m.hexdigest()[0:30]
+
+
+class NewUserSerializer(serializers.Serializer):
+    """The fields of a new user, validated for the sign up and the imports."""
+
     full_name = serializers.CharField(
         max_length=100,
         min_length=2,
@@ -35,10 +52,8 @@ class SignUpSerializer(serializers.Serializer):
         })
 
     def validate_email(self, value):
-        email = value.lower().strip()
-        if User.objects.filter(email=email.strip()).count() > 0:
-            raise serializers.ValidationError(_("This email is already used."))
-        return email
+        # Uniqueness is checked by the database when the user is inserted.
+        return value.lower().strip()
 
     def validate_full_name(self, value):
         full_name = value
@@ -74,27 +89,22 @@ class SignUpSerializer(serializers.Serializer):
             )
         return password
 
+
+class SignUpSerializer(NewUserSerializer):
+
     def create(self, validated_data):
 
-        full_name = validated_data["full_name"].strip()
-        if len(full_name.split(' ')) > 1:
-            first_name = full_name.split(' ')[0]
-            last_name = ' '.join(full_name.split(' ')[1:])
-        else:
-            first_name = full_name
-            last_name = ''
+        first_name, last_name = split_full_name(validated_data["full_name"])
 
         email = validated_data["email"].strip()
         password = validated_data["password"].strip()
 
-        m = hashlib.md5()
-        m.update(email.encode("utf-8"))
-        username = m.hexdigest()[0:30]
+        username = make_username(email)
 
         active = not settings.ACCOUNT_FORCE_ACTIVATION
 
-        # Create the user
-        user = User.objects.create(
+        # Create the user with its password in a single insert
+        user = User(
             username=username,
             email=email,
             first_name=first_name,
@@ -102,12 +112,43 @@ class SignUpSerializer(serializers.Serializer):
             last_login=now(),
             is_active=active
         )
-        user.set_password(password)
-        user.save()
+        get_hashing_pool().set_user_password(user, password)
+
+        try:
+            User.objects.insert(user)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {"email": [self.fields["email"].error_messages["unique"]]}
+            )
 
         return user
 
 
+class UserImportSerializer(NewUserSerializer):
+    """Validate a row of a user import with the sign up rules.
+
+    The password is optional, users imported without one must reset it.
+    The users are created by `cotidia.account.importer.UserImport`.
+    """
+
+    password = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        error_messages={
+            'invalid': _("This password is not valid.")
+        })
+    groups = serializers.ListField(
+        child=serializers.CharField(),
+        required=False
+    )
+    is_active = serializers.BooleanField(required=False)
+
+    def validate_password(self, value):
+        if not value:
+            return value
+        return super().validate_password(value)
+
+
 class SignInTokenSerializer(serializers.Serializer):
     email = serializers.EmailField(error_messages={
         'blank': _("Please enter your email."),
@@ -166,6 +207,10 @@ class AuthenticateTokenSerializer(serializers.Serializer):
     token = serializers.CharField()
 
 
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh_token = serializers.CharField()
+
+
 class UserSerializer(serializers.ModelSerializer):
     first_name = serializers.CharField(
         error_messages={
@@ -199,6 +244,21 @@ class UserSerializer(serializers.ModelSerializer):
         ]
 
 
+class UserListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = [
+            'uuid',
+            'email',
+            'first_name',
+            'last_name',
+            'is_active',
+            'is_staff',
+            'is_superuser',
+            'date_joined',
+        ]
+
+
 #
 # Requires the user to submit his email to receive a reset password link
 #
@@ -265,7 +325,7 @@ class ChangePasswordSerializer(serializers.Serializer):
 
     def validate_current_password(self, value):
 
-        if not self.user.check_password(value):
+        if not get_hashing_pool().check_user_password(self.user, value):
             raise serializers.ValidationError(
                 _("The current password is invalid.")
             )
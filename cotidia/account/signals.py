@@ -1,7 +1,28 @@
+from functools import partial
+
+from django.db import transaction
 from django.dispatch import Signal, receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import (
+    post_save,
+    post_delete,
+    post_migrate,
+    pre_save,
+    m2m_changed,
+)
+from django.contrib.auth.models import Group, Permission
+
+from rest_framework.authtoken.models import Token
 
+from cotidia.account import choices, deletion
+from cotidia.account.cache import get_user_cache, get_token_cache
+from cotidia.account.counts import (
+    COUNTED_FIELDS,
+    adjust_counters,
+    get_flags,
+    get_segments,
+)
 from cotidia.account.models import User
+from cotidia.account.search import INDEXED_FIELDS, get_search_backend
 
 
 @receiver(post_save, sender=User)
@@ -12,6 +33,9 @@ def user_update(sender, instance, created, **kwargs):
 user_sign_up = Signal(providing_args=["request", "user"])
 # user_sign_in = Signal(providing_args=["request", "user"])
 user_activate = Signal(providing_args=["request", "user"])
+# Sent by `cotidia.account.bulk` after changing a chunk of users with
+# set based queries, which do not send `post_save`.
+user_bulk_action = Signal(providing_args=["action", "user_ids"])
 # user_authenticate = Signal(providing_args=["request", "user"])
 # user_set_password = Signal(providing_args=["request", "user"])
 
@@ -20,3 +44,138 @@ user_activate = Signal(providing_args=["request", "user"])
 def user_activate_update(sender, request, user, **kwargs):
     """Call upon `user_activate` signal sent."""
     pass
+
+
+@receiver(post_save, sender=User)
+def cancel_reactivated_user_deletion(sender, instance, **kwargs):
+    """Keep a user reactivated while its deletion is pending."""
+    fields = instance.__dict__
+    if fields.get("is_active") and fields.get("deletion_requested_at"):
+        deletion.cancel_deletion([instance.pk])
+        instance.deletion_requested_at = None
+
+
+# User cache invalidation
+#
+# The caches are invalidated once the transaction is committed, before that
+# a concurrent request would load the previous rows and cache them again.
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache = get_user_cache()
+    if user_cache is not None:
+        transaction.on_commit(partial(user_cache.invalidate, instance.pk))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_cached_user_relations(sender, instance, action, reverse, **kwargs):
+    user_cache = get_user_cache()
+    if user_cache is None or not action.startswith("post_"):
+        return
+
+    if reverse:
+        # Changed from the group or permission side, any user may be affected.
+        transaction.on_commit(user_cache.invalidate_all)
+    else:
+        transaction.on_commit(partial(user_cache.invalidate, instance.pk))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_cached_users(sender, **kwargs):
+    user_cache = get_user_cache()
+    if user_cache is not None:
+        transaction.on_commit(user_cache.invalidate_all)
+
+
+# Form choices invalidation
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_migrate)
+def invalidate_choices(sender, **kwargs):
+    choices.invalidate()
+
+
+# Token cache invalidation, also on commit
+
+@receiver(post_save, sender=User)
+def invalidate_cached_token_user(sender, instance, **kwargs):
+    token_cache = get_token_cache()
+    if token_cache is not None:
+        transaction.on_commit(partial(token_cache.invalidate_user, instance.pk))
+
+
+@receiver(post_save, sender=Token)
+def invalidate_regenerated_token(sender, instance, **kwargs):
+    token_cache = get_token_cache()
+    if token_cache is not None:
+        transaction.on_commit(
+            partial(token_cache.invalidate_user, instance.user_id)
+        )
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    token_cache = get_token_cache()
+    if token_cache is not None:
+        transaction.on_commit(
+            partial(token_cache.invalidate, instance.key, instance.user_id)
+        )
+
+
+# Search index
+
+@receiver(post_save, sender=User)
+def update_user_search_index(sender, instance, created, update_fields, **kwargs):
+    # Skip saves that do not touch the indexed fields, like `last_login`.
+    if update_fields is not None and not set(update_fields) & set(INDEXED_FIELDS):
+        return
+    get_search_backend().index_many([instance], replace=not created)
+
+
+# User counters
+
+@receiver(pre_save, sender=User)
+def load_counted_flags(sender, instance, update_fields, **kwargs):
+    # Read the saved flags when the save may change the segments of the user,
+    # the counters are changed once the save is committed.
+    instance._counted_flags = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(COUNTED_FIELDS):
+        return
+    instance._counted_flags = (
+        User.objects.filter(pk=instance.pk).values_list(*COUNTED_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=User)
+def update_user_counters(sender, instance, created, **kwargs):
+    saved_flags = instance._counted_flags
+    flags = get_flags(instance, saved_flags)
+    if flags is None:
+        return
+
+    deltas = dict.fromkeys(get_segments(*flags), 1)
+    if not created:
+        if saved_flags is None or saved_flags == flags:
+            return
+        for segment in get_segments(*saved_flags):
+            deltas[segment] = deltas.get(segment, 0) - 1
+
+    adjust_counters(deltas)
+
+
+@receiver(post_delete, sender=User)
+def decrement_user_counters(sender, instance, **kwargs):
+    flags = get_flags(instance)
+    if flags is not None:
+        adjust_counters(dict.fromkeys(get_segments(*flags), -1))
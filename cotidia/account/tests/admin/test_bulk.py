@@ -0,0 +1,206 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission
+from django.core import mail
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+from cotidia.account.bulk import UserBulkAction, get_selection
+from cotidia.account.models import User, UserBulkJob, UserCounter, UserDeletionJob
+from cotidia.account.signals import user_bulk_action
+from cotidia.account.tests.admin.utils import BaseAdminTestCase
+from cotidia.account.tests.utils import run_on_commit
+
+
+class UserBulkTests(BaseAdminTestCase):
+
+    def setUp(self):
+        with run_on_commit():
+            super().setUp()
+            self.users = [
+                User.objects.create(
+                    username='user{}'.format(i),
+                    email='user{}@example.com'.format(i),
+                    first_name='User',
+                    last_name=str(i),
+                    is_active=False,
+                )
+                for i in range(5)
+            ]
+        self.editors = Group.objects.create(name='Editors')
+
+    def counter(self, segment):
+        return UserCounter.objects.get(segment=segment).count
+
+    def post(self, data):
+        return self.client.post(reverse('account-admin:user-bulk'), data)
+
+    def as_admin(self):
+        self.admin_user.user_permissions.add(
+            Permission.objects.get(codename='change_user')
+        )
+        self.client.login(username=self.admin_user.email, password=self.admin_user_pwd)
+
+    def test_activate_selection(self):
+        self.as_admin()
+        with run_on_commit():
+            response = self.post({
+                'action': 'activate',
+                'users': [str(u.uuid) for u in self.users[:2]],
+            })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            User.objects.filter(pk__in=[u.pk for u in self.users], is_active=True)
+            .count(),
+            2
+        )
+        self.assertEqual(self.counter('pending'), 3)
+
+    def test_action_by_chunks(self):
+        chunks = []
+
+        def receiver(sender, action, user_ids, **kwargs):
+            chunks.append(user_ids)
+
+        user_bulk_action.connect(receiver)
+        try:
+            # Per chunk: the ids, a savepoint, the users update and the
+            # cancellation of pending deletions. The counters are updated on
+            # commit.
+            with self.assertNumQueries(3 * 6 + 1):
+                affected = UserBulkAction('activate', chunk_size=2).run(
+                    get_selection(uuids=[u.uuid for u in self.users])
+                )
+        finally:
+            user_bulk_action.disconnect(receiver)
+
+        self.assertEqual(affected, 5)
+        self.assertEqual([len(ids) for ids in chunks], [2, 2, 1])
+
+    def test_add_and_remove_groups(self):
+        self.users[0].groups.add(self.editors)
+        selection = get_selection(uuids=[u.uuid for u in self.users])
+
+        self.assertEqual(
+            UserBulkAction('add_groups', groups=[self.editors.pk]).run(selection), 4
+        )
+        self.assertEqual(self.editors.user_set.count(), 5)
+
+        self.assertEqual(
+            UserBulkAction('remove_groups', groups=[self.editors.pk]).run(selection), 5
+        )
+        self.assertEqual(self.editors.user_set.count(), 0)
+
+    def test_invite(self):
+        User.objects.filter(pk__in=[u.pk for u in self.users]).update(is_active=True)
+        User.objects.filter(pk=self.users[0].pk).update(
+            password=make_password('demo1234')
+        )
+
+        affected = UserBulkAction('invite').run(
+            get_selection(uuids=[u.uuid for u in self.users])
+        )
+        self.assertEqual(affected, 4)
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_invite_runs_in_background(self):
+        self.as_admin()
+        User.objects.filter(pk__in=[u.pk for u in self.users]).update(is_active=True)
+        self.post({
+            'action': 'invite',
+            'users': [str(u.uuid) for u in self.users[:2]],
+        })
+
+        job = UserBulkJob.objects.get()
+        self.assertEqual((job.action, job.total), ('invite', 2))
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('run_user_bulk_jobs', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_delete(self):
+        self.admin_user.user_permissions.add(
+            Permission.objects.get(codename='delete_user')
+        )
+        self.users[0].is_active = True
+        self.as_admin()
+        with run_on_commit():
+            self.users[0].save()
+            self.post({'action': 'delete', 'all': '1', 'search': 'user'})
+
+        # Deactivated and queued for deletion.
+        users = User.objects.filter(username__startswith='user')
+        self.assertFalse(users.filter(is_active=True).exists())
+        self.assertFalse(users.filter(deletion_requested_at__isnull=True).exists())
+        jobs = UserDeletionJob.objects.filter(status=UserDeletionJob.PENDING)
+        self.assertEqual(
+            set(jobs.values_list('user_id', flat=True)), {u.pk for u in self.users}
+        )
+        self.assertEqual(jobs.first().requested_by, self.admin_user)
+        self.assertEqual(self.counter('pending'), 5)
+
+        with run_on_commit():
+            call_command('delete_pending_users', stdout=StringIO())
+
+        self.assertFalse(users.exists())
+        self.assertTrue(User.objects.filter(pk=self.normal_user.pk).exists())
+        self.assertEqual(self.counter('pending'), 0)
+        self.assertEqual(self.counter('user'), 1)
+
+    @override_settings(ACCOUNT_USER_DELETION_ASYNC=False)
+    def test_delete_sync(self):
+        self.admin_user.user_permissions.add(
+            Permission.objects.get(codename='delete_user')
+        )
+        self.as_admin()
+        self.post({'action': 'delete', 'all': '1', 'search': 'user'})
+
+        self.assertFalse(User.objects.filter(username__startswith='user').exists())
+        self.assertFalse(UserDeletionJob.objects.exists())
+
+    def test_unknown_groups(self):
+        self.client.login(username=self.superuser.email, password=self.superuser_pwd)
+        response = self.post({
+            'action': 'add_groups',
+            'all': '1',
+            'groups': [self.editors.pk, self.editors.pk + 1],
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.users[0].groups.exists())
+
+    def test_permissions(self):
+        self.as_admin()
+        # Deleting requires the delete permission.
+        response = self.post({'action': 'delete', 'all': '1'})
+        self.assertEqual(response.status_code, 403)
+        # Staff users are managed by superusers.
+        response = self.post({'action': 'activate', 'all': '1', 'segment': 'staff'})
+        self.assertEqual(response.status_code, 403)
+
+        self.client.login(username=self.normal_user.email, password=self.normal_user_pwd)
+        response = self.post({'action': 'activate', 'all': '1'})
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(ACCOUNT_BULK_ACTION_SYNC_LIMIT=3, ACCOUNT_BULK_ACTION_CHUNK_SIZE=2)
+    def test_large_selection_runs_in_background(self):
+        self.as_admin()
+        self.post({'action': 'activate', 'all': '1'})
+
+        job = UserBulkJob.objects.get()
+        self.assertEqual((job.status, job.total), (UserBulkJob.PENDING, 6))
+        self.users[0].refresh_from_db()
+        self.assertFalse(self.users[0].is_active)
+
+        stdout = StringIO()
+        call_command('run_user_bulk_jobs', stdout=stdout)
+        self.assertIn('Job {}: 2/6 users processed'.format(job.pk), stdout.getvalue())
+
+        response = self.client.get(reverse('account-admin:user-bulk-job', args=[job.pk]))
+        progress = json.loads(response.content.decode())
+        self.assertEqual(progress['status'], UserBulkJob.DONE)
+        self.assertEqual((progress['processed'], progress['affected']), (6, 5))
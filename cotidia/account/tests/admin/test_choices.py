@@ -0,0 +1,53 @@
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+
+from cotidia.account.choices import get_choices, get_timeout
+from cotidia.account.forms.admin.group import GroupAddForm
+from cotidia.account.forms.admin.user import SuperUserAddForm
+
+
+class ChoicesCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.editors = Group.objects.create(name='Editors')
+
+    def test_forms_render_cached_choices(self):
+        str(SuperUserAddForm())
+
+        with self.assertNumQueries(0):
+            html = str(SuperUserAddForm()) + str(GroupAddForm())
+
+        permission = Permission.objects.select_related('content_type').first()
+        self.assertIn(str(permission), html)
+        self.assertIn('Editors', html)
+
+    def test_permission_labels_single_query(self):
+        with self.assertNumQueries(1):
+            get_choices('permissions')
+
+    def test_group_changes_invalidate(self):
+        self.assertEqual(get_choices('groups'), [(self.editors.pk, 'Editors')])
+
+        writers = Group.objects.create(name='Writers')
+        self.assertEqual(
+            get_choices('groups'),
+            [(self.editors.pk, 'Editors'), (writers.pk, 'Writers')]
+        )
+
+        self.editors.delete()
+        self.assertEqual(get_choices('groups'), [(writers.pk, 'Writers')])
+
+    def test_submitted_values_are_validated(self):
+        form = GroupAddForm(data={'name': 'Writers', 'permissions': ['0']})
+        self.assertFalse(form.is_valid())
+        self.assertIn('permissions', form.errors)
+
+    @override_settings(
+        ACCOUNT_CHOICES_CACHE_TIMEOUT=3600,
+        ACCOUNT_CHOICES_LOCAL_CACHE_TIMEOUT=60,
+    )
+    def test_local_cache_timeout(self):
+        self.assertEqual(get_timeout(caches['default']), 60)
+        self.assertEqual(get_timeout(object()), 3600)
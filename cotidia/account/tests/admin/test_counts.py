@@ -0,0 +1,120 @@
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from cotidia.account import fixtures
+from cotidia.account.counts import get_count
+from cotidia.account.models import User, UserCounter
+from cotidia.account.tests.utils import run_on_commit
+
+
+class UserCounterTests(TestCase):
+
+    def setUp(self):
+        with run_on_commit():
+            self.create_users()
+
+    @fixtures.normal_user
+    @fixtures.admin_user
+    @fixtures.superuser
+    def create_users(self):
+        pass
+
+    def counts(self):
+        return dict(UserCounter.objects.values_list('segment', 'count'))
+
+    def test_counters_follow_saves(self):
+        self.assertEqual(
+            self.counts(),
+            {'user': 1, 'staff': 1, 'superuser': 1, 'active': 3, 'pending': 0}
+        )
+
+        self.normal_user.is_active = False
+        self.normal_user.is_staff = True
+        with run_on_commit():
+            self.normal_user.save()
+            # Not changed until committed.
+            self.assertEqual(self.counts()['staff'], 1)
+        self.assertEqual(
+            self.counts(),
+            {'user': 0, 'staff': 2, 'superuser': 1, 'active': 2, 'pending': 1}
+        )
+
+        with run_on_commit():
+            self.admin_user.delete()
+        self.assertEqual(self.counts()['staff'], 1)
+
+    def test_unchanged_flags_do_not_count(self):
+        # The saved flags and the update, no counter update.
+        with self.assertNumQueries(2), run_on_commit():
+            self.normal_user.save(update_fields=['is_active'])
+
+    def test_deferred_flags(self):
+        user = User.objects.only('pk', 'email').get(pk=self.admin_user.pk)
+        user.is_superuser = True
+        with run_on_commit():
+            user.save()
+        self.assertEqual(self.counts()['staff'], 0)
+        self.assertEqual(self.counts()['superuser'], 2)
+
+    def test_unrelated_save_does_not_count(self):
+        with self.assertNumQueries(1):
+            self.normal_user.save(update_fields=['last_login'])
+
+    def test_segment_count(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_count(User.objects.all(), 'active'), 3)
+
+    def test_refresh_command(self):
+        User.objects.update(is_active=False)
+        self.assertEqual(self.counts()['active'], 3)
+
+        call_command('refresh_user_counts', stdout=StringIO())
+
+        self.assertEqual(self.counts()['active'], 0)
+        self.assertEqual(self.counts()['pending'], 3)
+
+
+class FilteredCountTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for i in range(5):
+            User.objects.create(
+                username='user{}'.format(i), email='user{}@example.com'.format(i)
+            )
+
+    def test_exact_below_threshold(self):
+        users = User.objects.filter(email__endswith='@example.com')
+        self.assertEqual(get_count(users), 5)
+
+    @override_settings(ACCOUNT_USER_COUNT_EXACT_THRESHOLD=2)
+    def test_cached_above_threshold(self):
+        users = User.objects.filter(email__endswith='@example.com')
+        self.assertEqual(get_count(users), 5)
+
+        User.objects.create(username='user5', email='user5@example.com')
+
+        # The cached count is served until refreshed.
+        with self.assertNumQueries(1):
+            self.assertEqual(get_count(users), 5)
+
+    @override_settings(ACCOUNT_USER_COUNT_EXACT_THRESHOLD=2)
+    def test_stale_count_is_refreshed_by_command(self):
+        users = User.objects.filter(email__endswith='@example.com')
+        get_count(users)
+        User.objects.create(username='user5', email='user5@example.com')
+
+        later = time.time() + 301
+        with mock.patch('cotidia.account.counts.time.time', return_value=later):
+            # Queued, the previous count is served meanwhile.
+            self.assertEqual(get_count(users), 5)
+
+        stdout = StringIO()
+        call_command('refresh_user_counts', stdout=stdout)
+        self.assertIn('1 filtered counts refreshed', stdout.getvalue())
+        self.assertEqual(get_count(users), 6)
@@ -0,0 +1,124 @@
+from io import StringIO
+
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db.models import F
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from cotidia.account.deletion import request_deletion
+from cotidia.account.models import User, UserBulkJob, UserDeletionJob
+from cotidia.account.tests.admin.utils import BaseAdminTestCase
+from cotidia.account.tests.profile.models import Profile
+
+
+class UserDeletionTests(BaseAdminTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            self.normal_user.groups.add(Group.objects.create(name='Group {}'.format(i)))
+        Profile.objects.create(user=self.normal_user, company='Cotidia')
+        self.bulk_job = UserBulkJob.objects.create(
+            action='activate', created_by=self.normal_user
+        )
+
+    def delete_pending_users(self, *args):
+        stdout = StringIO()
+        call_command('delete_pending_users', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_delete_view_deactivates(self):
+        self.client.login(username=self.superuser.email, password=self.superuser_pwd)
+        url = reverse('account-admin:user-delete', kwargs={'pk': self.normal_user.pk})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 302)
+
+        user = User.objects.get(pk=self.normal_user.pk)
+        self.assertFalse(user.is_active)
+        self.assertIsNotNone(user.deletion_requested_at)
+        self.assertEqual(user.token_version, self.normal_user.token_version + 1)
+        self.assertFalse(Token.objects.filter(user=user).exists())
+
+        job = UserDeletionJob.objects.get(user_id=user.pk)
+        self.assertEqual(job.status, UserDeletionJob.PENDING)
+        self.assertEqual(job.requested_by, self.superuser)
+
+    def test_request_deletion_keeps_concurrent_revocations(self):
+        user = User.objects.get(pk=self.normal_user.pk)
+        # Revoked by another request since the user was loaded.
+        User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+
+        request_deletion(user)
+
+        expected = self.normal_user.token_version + 2
+        self.assertEqual(user.token_version, expected)
+        self.assertEqual(User.objects.get(pk=user.pk).token_version, expected)
+
+    def test_delete_by_chunks(self):
+        request_deletion(self.normal_user)
+
+        output = self.delete_pending_users('--chunk-size', '2')
+
+        # The progress is reported after each chunk.
+        self.assertGreater(output.count('rows deleted'), 3)
+        self.assertFalse(User.objects.filter(pk=self.normal_user.pk).exists())
+        self.assertFalse(Profile.objects.exists())
+        self.assertEqual(Group.objects.count(), 3)
+
+        self.bulk_job.refresh_from_db()
+        self.assertIsNone(self.bulk_job.created_by)
+
+        job = UserDeletionJob.objects.get(user_id=self.normal_user.pk)
+        self.assertEqual(job.status, UserDeletionJob.DONE)
+        # Memberships, search terms, profile, bulk job and the user.
+        self.assertGreater(job.deleted, 6)
+
+    def test_resume(self):
+        job = request_deletion(self.normal_user)
+        # Left running by a worker which stopped.
+        UserDeletionJob.objects.filter(pk=job.pk).update(
+            status=UserDeletionJob.RUNNING
+        )
+        self.normal_user.groups.clear()
+
+        self.delete_pending_users()
+        self.assertTrue(User.objects.filter(pk=self.normal_user.pk).exists())
+
+        self.delete_pending_users('--resume')
+        self.assertFalse(User.objects.filter(pk=self.normal_user.pk).exists())
+
+    def test_sessions_are_refused(self):
+        self.client.login(username=self.superuser.email, password=self.superuser_pwd)
+        request_deletion(self.superuser)
+
+        response = self.client.get(reverse('account-admin:user-list'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_reactivation_cancels(self):
+        job = request_deletion(self.normal_user)
+
+        user = User.objects.get(pk=self.normal_user.pk)
+        user.is_active = True
+        user.save()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, UserDeletionJob.CANCELLED)
+        user.refresh_from_db()
+        self.assertIsNone(user.deletion_requested_at)
+
+        self.delete_pending_users()
+        self.assertTrue(User.objects.filter(pk=self.normal_user.pk).exists())
+
+    def test_job_stops_for_active_user(self):
+        request_deletion(self.normal_user)
+        # Reactivated without `post_save`, like a queryset update.
+        User.objects.filter(pk=self.normal_user.pk).update(is_active=True)
+
+        self.delete_pending_users()
+
+        self.assertTrue(User.objects.filter(pk=self.normal_user.pk).exists())
+        self.assertEqual(self.normal_user.groups.count(), 3)
+        job = UserDeletionJob.objects.get(user_id=self.normal_user.pk)
+        self.assertEqual(job.status, UserDeletionJob.CANCELLED)
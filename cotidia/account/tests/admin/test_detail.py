@@ -0,0 +1,47 @@
+import re
+
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from cotidia.account.tests.admin.utils import BaseAdminTestCase
+from cotidia.account.tests.profile.models import Profile
+
+
+@override_settings(ACCOUNT_PROFILE_MODEL='profile.Profile')
+class UserDetailQueriesTests(BaseAdminTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.login(username=self.superuser.email, password=self.superuser_pwd)
+
+    def get_queries(self, user):
+        url = reverse('account-admin:user-detail', kwargs={'pk': user.pk})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_user_is_loaded_once(self):
+        lookup = re.compile(
+            r'FROM "account_user" .*"account_user"."id" = {}\b'.format(
+                self.normal_user.pk
+            )
+        )
+        queries = self.get_queries(self.normal_user)
+        user_queries = [sql for sql in queries if lookup.search(sql)]
+        self.assertEqual(len(user_queries), 1)
+
+    def test_queries_do_not_grow_with_relations(self):
+        expected = len(self.get_queries(self.admin_user))
+
+        for i in range(3):
+            self.admin_user.groups.add(Group.objects.create(name='Group {}'.format(i)))
+        self.admin_user.user_permissions.add(
+            *Permission.objects.filter(codename__in=['add_user', 'change_user'])
+        )
+        Profile.objects.create(user=self.admin_user, company='Cotidia')
+
+        self.assertEqual(len(self.get_queries(self.admin_user)), expected)
@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import Group, Permission
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+from cotidia.account.exporter import UserExport
+from cotidia.account.factory import UserFactory
+from cotidia.account.tests.admin.utils import BaseAdminTestCase
+from cotidia.account.tests.profile.models import Profile
+
+
+@override_settings(ACCOUNT_PROFILE_MODEL='profile.Profile')
+class UserExportTests(BaseAdminTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.editors = Group.objects.create(name='Editors')
+        self.normal_user.groups.add(self.editors)
+        self.normal_user.user_permissions.add(
+            Permission.objects.get(codename='change_user')
+        )
+        Profile.objects.create(user=self.normal_user, company='Cotidia')
+
+    def read_csv(self, export):
+        return list(csv.DictReader(io.StringIO(''.join(export.stream('csv')))))
+
+    def test_export_csv(self):
+        rows = self.read_csv(UserExport(groups=True, permissions=True, profile=True))
+
+        self.assertEqual(len(rows), 3)
+        row = next(r for r in rows if r['id'] == str(self.normal_user.pk))
+        self.assertEqual(row['email'], self.normal_user.email)
+        self.assertEqual(row['uuid'], str(self.normal_user.uuid))
+        self.assertEqual(row['groups'], 'Editors')
+        self.assertEqual(row['permissions'], 'account.change_user')
+        self.assertEqual(row['profile.company'], 'Cotidia')
+
+    def test_export_jsonl(self):
+        data = ''.join(UserExport(groups=True).stream('jsonl'))
+        rows = [json.loads(line) for line in data.splitlines()]
+
+        self.assertEqual(len(rows), 3)
+        row = next(r for r in rows if r['id'] == self.normal_user.pk)
+        self.assertEqual(row['groups'], ['Editors'])
+        self.assertNotIn('permissions', row)
+
+    def test_export_queries_per_chunk(self):
+        for i in range(7):
+            UserFactory.create()
+
+        export = UserExport(
+            groups=True, permissions=True, profile=True, chunk_size=5
+        )
+        # Users, groups, permissions and profiles for each of the two
+        # chunks, then the query finding no more users.
+        with self.assertNumQueries(9):
+            rows = self.read_csv(export)
+        self.assertEqual(len(rows), 10)
+
+    def test_export_view(self):
+        url = reverse('account-admin:user-export')
+
+        self.client.force_login(self.admin_user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.superuser)
+        response = self.client.get(url, {'format': 'jsonl', 'groups': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(len(content.splitlines()), 3)
+
+    def test_export_command(self):
+        path = os.path.join(tempfile.mkdtemp(), 'users.csv')
+        err = io.StringIO()
+
+        call_command('export_users', '--output', path, '--groups', stderr=err)
+
+        with open(path) as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 3)
+        self.assertIn('MB/s', err.getvalue())
+        self.assertIn('peak RSS', err.getvalue())
@@ -0,0 +1,89 @@
+from django.contrib.auth.models import Permission
+from django.urls import reverse
+
+from cotidia.account.models import User
+from cotidia.account.pagination import (
+    InvalidCursor,
+    KeysetPaginator,
+    encode_cursor,
+)
+from cotidia.account.tests.admin.utils import BaseAdminTestCase
+
+
+class KeysetPaginationTests(BaseAdminTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Same names, only the primary key breaks the ties.
+        for i in range(7):
+            User.objects.create(
+                username='sam{}'.format(i),
+                email='sam{}@example.com'.format(i),
+                first_name='Sam',
+                last_name='Jones' if i % 2 else 'Brown',
+            )
+        self.users = list(
+            User.objects.order_by('first_name', 'last_name', 'id')
+        )
+
+    def test_pages_forward_and_backward(self):
+        paginator = KeysetPaginator(User.objects.all(), 3)
+
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_page_number()))
+
+        self.assertEqual([u for page in pages for u in page], self.users)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = paginator.page(pages[-1].previous_page_number())
+        self.assertEqual(list(previous), list(pages[-2]))
+        self.assertTrue(previous.has_next())
+
+    def test_deep_page_single_query(self):
+        paginator = KeysetPaginator(User.objects.all(), 3)
+        cursor = encode_cursor('next', paginator.get_key(self.users[5]))
+
+        with self.assertNumQueries(1):
+            page = paginator.page(cursor)
+        self.assertEqual(list(page), self.users[6:9])
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(User.objects.all(), 3)
+        for cursor in ('not-a-cursor', encode_cursor('next', ['Sam'])):
+            with self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+
+    def test_api(self):
+        url = reverse('account-api:user-list')
+
+        self.client.login(username=self.normal_user.email, password=self.normal_user_pwd)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+        self.admin_user.user_permissions.add(
+            Permission.objects.get(codename='change_user')
+        )
+        self.client.login(username=self.admin_user.email, password=self.admin_user_pwd)
+        response = self.client.get(url, {'role': 'staff'})
+        self.assertEqual(response.status_code, 403)
+
+        emails = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            emails.extend(user['email'] for user in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(
+            emails,
+            [
+                u.email for u in self.users
+                if not u.is_staff and not u.is_superuser
+            ]
+        )
+
+        response = self.client.get(
+            reverse('account-api:user-list'), {'cursor': 'not-a-cursor'}
+        )
+        self.assertEqual(response.status_code, 404)
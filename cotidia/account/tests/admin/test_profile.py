@@ -1,5 +1,11 @@
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
 from django.urls import reverse
 
+from cotidia.account import profiles
+from cotidia.account.forms.admin.user import SuperUserAddForm, UserAddForm
 from cotidia.account.models import User
 from cotidia.account.factory import UserFactory
 from cotidia.account.tests.admin.utils import BaseAdminTestCase
@@ -84,3 +90,57 @@ class ProfileAdminTests(BaseAdminTestCase):
 
         user = User.objects.filter().latest('id')
         self.assertEquals(hasattr(user, 'profile'), False)
+
+
+@override_settings(
+    ACCOUNT_PROFILE_MODEL='profile.Profile',
+    ACCOUNT_PROFILE_FORM='cotidia.account.tests.profile.forms.ProfileAddForm',
+)
+class ProfileFormTests(BaseAdminTestCase):
+
+    def test_resolved_once(self):
+        form_path = 'cotidia.account.tests.profile.forms.ProfileAddForm'
+        with self.settings(ACCOUNT_PROFILE_FORM=form_path), mock.patch(
+            'cotidia.account.profiles.import_string',
+            wraps=profiles.import_string,
+        ) as import_string:
+            form_classes = [
+                profiles.get_user_form_class(form_class)
+                for form_class in [UserAddForm, SuperUserAddForm] * 3
+            ]
+        self.assertEqual(import_string.call_count, 1)
+        self.assertIs(profiles.get_profile_model(), Profile)
+
+        # One class per user form.
+        self.assertEqual(len(set(form_classes)), 2)
+        self.assertEqual(
+            form_classes[0].form_classes['profile'].__name__, 'ProfileAddForm'
+        )
+        self.assertIs(form_classes[1].form_classes['user'], SuperUserAddForm)
+
+    def test_user_add_with_profile(self):
+        self.client.login(username=self.superuser.email, password=self.superuser_pwd)
+        url = reverse('account-admin:user-add')
+        data = {
+            'user-email': 'profile@test.com',
+            'user-username': 'profile',
+            'profile-company': 'Cotidia',
+        }
+        for i in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        user = User.objects.get(email='profile@test.com')
+        self.assertEqual(user.profile.company, 'Cotidia')
+
+    @override_settings(ACCOUNT_PROFILE_FORM=None)
+    def test_missing_form(self):
+        with self.assertRaises(ImproperlyConfigured):
+            profiles.get_user_form_class(UserAddForm)
+
+    @override_settings(ACCOUNT_PROFILE_MODEL=None)
+    def test_no_profile(self):
+        self.assertIs(profiles.get_user_form_class(UserAddForm), UserAddForm)
+        self.assertIsNone(profiles.get_profile_model())
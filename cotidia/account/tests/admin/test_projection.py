@@ -0,0 +1,61 @@
+from django.test import TestCase, override_settings
+
+from cotidia.account import fixtures
+from cotidia.account.models import User
+from cotidia.account.views.admin.user import (
+    UserList,
+    UserListPaginationMixin,
+    UserListProjectionMixin,
+)
+
+
+class AllUsersView:
+    def get_queryset(self):
+        return User.objects.all()
+
+
+class ProjectedUserList(
+    UserListPaginationMixin, UserListProjectionMixin, AllUsersView
+):
+    columns = UserList.columns
+
+
+class UserListProjectionTests(TestCase):
+
+    @fixtures.normal_user
+    def setUp(self):
+        self.invited = User.objects.create(
+            username='invited',
+            email='invited@example.com',
+            first_name='Ann',
+            last_name='Lee',
+        )
+
+    def test_columns_are_loaded(self):
+        users = list(ProjectedUserList().get_queryset().order_by('_name'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [(u.name, u.email, u.has_password) for u in users],
+                [
+                    ('Ann Lee', 'invited@example.com', False),
+                    (self.normal_user.name, self.normal_user.email, True),
+                ]
+            )
+            for user in users:
+                self.assertTrue(user.is_active)
+                self.assertIsNotNone(user.date_joined)
+                self.assertIn(str(user.uuid), user.get_absolute_url())
+
+    def test_password_is_not_loaded(self):
+        queryset = ProjectedUserList().get_queryset()
+        self.assertNotIn('"password"', str(queryset.query))
+
+        user = queryset.get(pk=self.normal_user.pk)
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertIn('first_name', user.get_deferred_fields())
+
+    @override_settings(ACCOUNT_USER_LIST_KEYSET_PAGINATION=True)
+    def test_keyset_fields_are_loaded(self):
+        user = ProjectedUserList().get_queryset().get(pk=self.normal_user.pk)
+        self.assertNotIn('first_name', user.get_deferred_fields())
@@ -0,0 +1,117 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from cotidia.account.models import User, UserSearchTerm
+from cotidia.account.search import get_search_backend
+
+
+class TokenIndexSearchBackendTests(TestCase):
+
+    def setUp(self):
+        self.jane = User.objects.create(
+            username='jane',
+            first_name='Jane',
+            last_name='Smith',
+            email='jane.smith@example.com'
+        )
+        self.john = User.objects.create(
+            username='john',
+            first_name='John',
+            last_name='Doe',
+            email='jdoe@company.org'
+        )
+        self.alexander = User.objects.create(
+            username='alexander',
+            first_name='Alexander',
+            last_name='Grant',
+            email='agrant@example.net'
+        )
+        self.backend = get_search_backend()
+
+    def search(self, value):
+        return list(self.backend.search(User.objects.order_by('pk'), value))
+
+    def test_prefix(self):
+        self.assertEqual(self.search('ja'), [self.jane])
+        self.assertEqual(self.search('Smi'), [self.jane])
+        self.assertEqual(self.search('company'), [self.john])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search('jane smith'), [self.jane])
+        self.assertEqual(self.search('jane doe'), [])
+
+    def test_fuzzy(self):
+        self.assertEqual(self.search('alexnader'), [self.alexander])
+        self.assertEqual(self.search('alexnader grant'), [self.alexander])
+
+    def test_uuid(self):
+        self.assertEqual(self.search(str(self.john.uuid)), [self.john])
+
+    def test_fuzzy_candidates_are_capped(self):
+        # The candidates come from the rarest trigrams, shared with nobody.
+        with mock.patch.object(self.backend, 'max_fuzzy_candidates', 1):
+            self.assertEqual(self.search('alexnader'), [self.alexander])
+
+        with mock.patch.object(self.backend, 'max_fuzzy_candidates', 0):
+            self.assertEqual(self.search('alexnader'), [])
+            self.assertEqual(self.search('alex'), [self.alexander])
+
+    def test_single_query(self):
+        # The trigram frequencies are counted on the first search.
+        self.search('jane smith')
+        with self.assertNumQueries(1):
+            self.search('jane smith')
+
+    def test_index_follows_changes(self):
+        self.jane.last_name = 'Brown'
+        self.jane.save()
+
+        self.assertEqual(self.search('smith'), [])
+        self.assertEqual(self.search('brown'), [self.jane])
+
+    def test_only_changed_terms_are_rewritten(self):
+        terms = UserSearchTerm.objects.filter(user=self.jane)
+        kept = terms.get(term='jane', is_trigram=False).pk
+
+        self.jane.last_name = 'Brown'
+        self.jane.save()
+        self.assertEqual(terms.get(term='jane', is_trigram=False).pk, kept)
+        self.assertFalse(terms.filter(term='smith').exists())
+
+        # The update and the terms, none of which changed.
+        with self.assertNumQueries(2):
+            self.jane.save(update_fields=['first_name'])
+
+    def test_unrelated_save_does_not_reindex(self):
+        with self.assertNumQueries(1):
+            self.jane.save(update_fields=['last_login'])
+
+    def test_rebuild(self):
+        UserSearchTerm.objects.all().delete()
+        self.assertEqual(self.search('jane'), [])
+
+        call_command('rebuild_user_search_index', stdout=StringIO())
+
+        self.assertEqual(self.search('jane'), [self.jane])
+
+    def test_benchmark(self):
+        stdout = StringIO()
+        call_command(
+            'benchmark_user_search', 'jane', '--users', '10', '--repeat', '2',
+            stdout=stdout
+        )
+        self.assertIn('Searching 10 users', stdout.getvalue())
+        self.assertIn("'jane': median", stdout.getvalue())
+        # The generated users are rolled back.
+        self.assertEqual(User.objects.count(), 3)
+
+    @override_settings(
+        ACCOUNT_USER_SEARCH_BACKEND='cotidia.account.search.ContainsSearchBackend'
+    )
+    def test_contains_backend(self):
+        backend = get_search_backend()
+        users = backend.search(User.objects.all(), 'mith@exa')
+        self.assertEqual(list(users), [self.jane])
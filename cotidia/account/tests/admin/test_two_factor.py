@@ -0,0 +1,177 @@
+from unittest import mock
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from django_otp import devices_for_user
+from django_otp.plugins.otp_static.models import StaticDevice, StaticToken
+from django_otp.plugins.otp_totp.models import TOTPDevice
+from two_factor.utils import default_device
+
+from cotidia.account.managers import get_device_models
+from cotidia.account.models import User
+from cotidia.account.tests.admin.utils import BaseAdminTestCase
+from cotidia.account.views.admin.two_factor import (
+    DisableView,
+    GenerateBackupTokensView,
+    ListBackupTokensView,
+    UserDisableView,
+)
+
+
+class TwoFactorQueriesTests(BaseAdminTestCase):
+    """The views are called directly, the two-factor urls being disabled."""
+
+    def setUp(self):
+        super().setUp()
+        self.contexts = []
+        patcher = mock.patch(
+            'cotidia.account.views.admin.two_factor.render',
+            side_effect=self.render,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def render(self, request, template_name, context):
+        self.contexts.append(context)
+        return HttpResponse()
+
+    def request(self, view, user, data=None, **kwargs):
+        factory = RequestFactory()
+        if data is None:
+            request = factory.get('/')
+        else:
+            request = factory.post('/', data)
+        request.user = user
+        request.user.is_verified = lambda: True
+        return view.as_view()(request, **kwargs)
+
+    def add_devices(self, user, totp=1, static=1, tokens=1):
+        for i in range(totp):
+            TOTPDevice.objects.create(user=user, name='TOTP {}'.format(i))
+        for i in range(static):
+            device = StaticDevice.objects.create(user=user, name='Static {}'.format(i))
+            StaticToken.objects.bulk_create(
+                [
+                    StaticToken(device=device, token=StaticToken.random_token())
+                    for n in range(tokens)
+                ]
+            )
+
+    def count_queries(self, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            response = self.request(*args, **kwargs)
+        self.assertIn(response.status_code, [200, 302])
+        return len(context.captured_queries)
+
+    def test_list_backup_tokens(self):
+        device = StaticDevice.objects.create(user=self.normal_user, name='backup')
+        for i in range(3):
+            device.token_set.create(token=StaticToken.random_token())
+
+        # The device and its tokens.
+        with self.assertNumQueries(2):
+            self.request(ListBackupTokensView, self.normal_user)
+        self.assertTrue(self.contexts[-1]['has_backup_tokens'])
+
+        with self.assertNumQueries(2):
+            self.request(
+                ListBackupTokensView,
+                self.normal_user,
+                {'password': self.normal_user_pwd},
+            )
+        self.assertEqual(len(self.contexts[-1]['tokens']), 3)
+
+    def test_generate_backup_tokens(self):
+        StaticDevice.objects.create(user=self.normal_user, name='backup')
+        data = {'password': self.normal_user_pwd}
+
+        with mock.patch.object(GenerateBackupTokensView, 'number_of_tokens', 2):
+            expected = self.count_queries(
+                GenerateBackupTokensView, self.normal_user, data
+            )
+
+        with CaptureQueriesContext(connection) as context:
+            self.request(GenerateBackupTokensView, self.normal_user, data)
+        self.assertEqual(len(context.captured_queries), expected)
+
+        inserts = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('INSERT INTO "otp_static_statictoken"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(StaticToken.objects.filter(device__user=self.normal_user).count(), 10)
+        self.assertEqual(len(self.contexts[-1]['tokens']), 10)
+
+    def test_disable(self):
+        data = {'password': self.normal_user_pwd}
+
+        self.add_devices(self.normal_user)
+        expected = self.count_queries(DisableView, self.normal_user, data)
+        self.assertEqual(list(devices_for_user(self.normal_user)), [])
+
+        self.add_devices(self.normal_user, totp=3, static=2, tokens=5)
+        self.assertEqual(self.count_queries(DisableView, self.normal_user, data), expected)
+        self.assertEqual(list(devices_for_user(self.normal_user)), [])
+
+    def test_user_disable(self):
+        data = {'password': self.superuser_pwd}
+        kwargs = {'uuid': self.normal_user.uuid}
+
+        self.add_devices(self.normal_user)
+        expected = self.count_queries(UserDisableView, self.superuser, data, **kwargs)
+        self.assertEqual(list(devices_for_user(self.normal_user)), [])
+
+        self.add_devices(self.normal_user, totp=3, static=2, tokens=5)
+        self.assertEqual(
+            self.count_queries(UserDisableView, self.superuser, data, **kwargs),
+            expected,
+        )
+        self.assertEqual(list(devices_for_user(self.normal_user)), [])
+
+
+class TwoFactorStatusTests(BaseAdminTestCase):
+
+    def setUp(self):
+        super().setUp()
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username='staff{}'.format(i),
+                    email='staff{}@example.com'.format(i),
+                    is_staff=True,
+                )
+                for i in range(100)
+            ]
+        )
+        self.staff = list(
+            User.objects.filter(username__in=[u.username for u in users]).order_by('pk')
+        )
+        for i, user in enumerate(self.staff):
+            if i % 3 == 0:
+                TOTPDevice.objects.create(user=user, name='default')
+            elif i % 3 == 1:
+                StaticDevice.objects.create(user=user, name='backup')
+            if i % 10 == 0:
+                TOTPDevice.objects.create(user=user, name='default', confirmed=False)
+
+    def test_page_of_staff_users(self):
+        queryset = (
+            User.objects.filter(pk__in=[user.pk for user in self.staff])
+            .with_two_factor_status()
+            .order_by('pk')
+        )
+        # The users and one query per device model.
+        with self.assertNumQueries(1 + len(get_device_models())):
+            status = [user.two_factor_auth_enabled for user in queryset]
+
+        expected = [default_device(user) for user in queryset.order_by('pk')]
+        self.assertEqual(status, expected)
+        self.assertEqual(len([device for device in status if device]), 34)
+
+    def test_not_prefetched(self):
+        user = self.staff[0]
+        self.assertEqual(user.two_factor_auth_enabled, default_device(user))
+        self.assertFalse(self.normal_user.two_factor_auth_enabled)
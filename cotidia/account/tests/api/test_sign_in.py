@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from cotidia.account import fixtures
+
+
+@override_settings(ACCOUNT_ENABLE_TWO_FACTOR=False)
+class SignInAPITests(APITestCase):
+
+    @fixtures.normal_user
+    def setUp(self):
+        self.url = reverse('account-api:sign-in')
+        self.data = {
+            'email': self.normal_user.email,
+            'password': self.normal_user_pwd,
+        }
+
+    def test_sign_in_hashes_password_once(self):
+        """The credentials must only be verified by the serializer."""
+
+        with mock.patch.object(
+            PBKDF2PasswordHasher,
+            'verify',
+            autospec=True,
+            side_effect=PBKDF2PasswordHasher.verify
+        ) as verify:
+            response = self.client.post(self.url, self.data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(verify.call_count, 1)
+        self.assertEqual(response.data['token'], self.normal_user_token.key)
+        self.assertEqual(response.data['uuid'], str(self.normal_user.uuid))
+
+    def test_sign_in_loads_user_and_token_once(self):
+        """The user and its token are fetched with a single query."""
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, self.data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        selects = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        user_selects = [sql for sql in selects if 'FROM "account_user"' in sql]
+        token_selects = [sql for sql in selects if 'FROM "authtoken_token"' in sql]
+        self.assertEqual(len(user_selects), 1)
+        self.assertEqual(token_selects, [])
+
+    def test_sign_in_invalid_password(self):
+        data = {'email': self.normal_user.email, 'password': 'wrong-password'}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
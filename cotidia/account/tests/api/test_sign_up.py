@@ -0,0 +1,59 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from cotidia.account import fixtures
+from cotidia.account.models import User
+
+
+@override_settings(ACCOUNT_ALLOW_SIGN_UP=True, ACCOUNT_FORCE_ACTIVATION=False)
+class SignUpAPITests(APITestCase):
+
+    @fixtures.normal_user
+    def setUp(self):
+        self.url = reverse('account-api:sign-up')
+        self.data = {
+            'full_name': 'Jane Doe',
+            'email': 'jane@example.com',
+            'password': 'demo1234',
+        }
+
+    def get_queries(self, context, table):
+        return [
+            query['sql'] for query in context.captured_queries
+            if '"{}"'.format(table) in query['sql']
+        ]
+
+    def test_sign_up_inserts_user_once(self):
+        """The user is inserted with its password, without checking first."""
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, self.data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        user_queries = self.get_queries(context, 'account_user')
+        self.assertEqual(len(user_queries), 1)
+        self.assertTrue(user_queries[0].startswith('INSERT'))
+
+        token_queries = self.get_queries(context, 'authtoken_token')
+        self.assertEqual(len(token_queries), 1)
+        self.assertTrue(token_queries[0].startswith('INSERT'))
+
+        user = User.objects.get(email_key='jane@example.com')
+        self.assertTrue(user.check_password('demo1234'))
+        self.assertEqual(response.data['token'], user.token.key)
+
+    def test_sign_up_duplicate_email(self):
+        data = dict(self.data, email=self.normal_user.email.upper())
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['email'], ['This email is already used.'])
+        self.assertEqual(
+            User.objects.filter(email_key=data['email'].lower()).count(), 1
+        )
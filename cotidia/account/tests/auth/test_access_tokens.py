@@ -0,0 +1,146 @@
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from cotidia.account import fixtures, tokens
+from cotidia.account.authentication import AccessTokenAuthentication
+from cotidia.account.models import User
+
+
+@override_settings(ACCOUNT_ACCESS_TOKEN_KEYS=['new-key', 'old-key'])
+class AccessTokenTests(TestCase):
+
+    @fixtures.normal_user
+    def setUp(self):
+        pass
+
+    def test_verify_without_database(self):
+        token = tokens.make_access_token(self.normal_user)
+
+        with self.assertNumQueries(0):
+            claims = tokens.verify_access_token(token)
+
+        self.assertEqual(claims['uid'], self.normal_user.pk)
+        self.assertEqual(claims['uuid'], str(self.normal_user.uuid))
+
+    def test_expired_token(self):
+        token = tokens.make_access_token(self.normal_user)
+
+        expired = time.time() + tokens.get_lifetime(tokens.ACCESS) + 1
+        with mock.patch('django.core.signing.time.time', return_value=expired):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.verify_access_token(token)
+
+    def test_refresh_token_is_not_an_access_token(self):
+        token = tokens.make_refresh_token(self.normal_user)
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify_access_token(token)
+
+    def test_key_rotation(self):
+        with self.settings(ACCOUNT_ACCESS_TOKEN_KEYS=['old-key']):
+            token = tokens.make_access_token(self.normal_user)
+
+        # Still accepted while the old key is listed.
+        tokens.verify_access_token(token)
+
+        with self.settings(ACCOUNT_ACCESS_TOKEN_KEYS=['new-key']):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.verify_access_token(token)
+
+    def test_refresh_and_revoke(self):
+        refresh_token = tokens.make_refresh_token(self.normal_user)
+
+        user, data = tokens.refresh_tokens(refresh_token)
+        self.assertEqual(user, self.normal_user)
+        self.assertEqual(
+            tokens.verify_access_token(data['access_token'])['uid'],
+            self.normal_user.pk
+        )
+
+        tokens.revoke_tokens(self.normal_user)
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.refresh_tokens(refresh_token)
+
+    def test_revoke_stale_instance(self):
+        stale = User.objects.get(pk=self.normal_user.pk)
+        tokens.revoke_tokens(self.normal_user)
+
+        tokens.revoke_tokens(stale)
+
+        expected = self.normal_user.token_version + 1
+        self.assertEqual(stale.token_version, expected)
+        self.assertEqual(User.objects.get(pk=stale.pk).token_version, expected)
+
+    def test_authentication_class(self):
+        token = tokens.make_access_token(self.normal_user)
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION='Bearer {}'.format(token)
+        )
+
+        user, claims = AccessTokenAuthentication().authenticate(request)
+        self.assertEqual(user, self.normal_user)
+
+        tokens.revoke_tokens(self.normal_user)
+
+        with self.assertRaises(AuthenticationFailed):
+            AccessTokenAuthentication().authenticate(request)
+
+
+@override_settings(
+    ACCOUNT_ENABLE_TWO_FACTOR=False,
+    ACCOUNT_ACCESS_TOKEN_ENABLED=True
+)
+class AccessTokenAPITests(APITestCase):
+
+    @fixtures.normal_user
+    def setUp(self):
+        pass
+
+    def sign_in(self):
+        url = reverse('account-api:sign-in')
+        data = {
+            'email': self.normal_user.email,
+            'password': self.normal_user_pwd,
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_sign_in_returns_signed_tokens(self):
+        data = self.sign_in()
+
+        self.assertEqual(data['token'], self.normal_user_token.key)
+        self.assertIn('access_token', data)
+        self.assertIn('refresh_token', data)
+
+        response = self.client.post(
+            reverse('account-api:authenticate'),
+            {'token': data['access_token']},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['uuid'], str(self.normal_user.uuid))
+
+    def test_refresh_token(self):
+        data = self.sign_in()
+
+        url = reverse('account-api:refresh-token')
+        response = self.client.post(
+            url, {'refresh_token': data['refresh_token']}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access_token', response.data)
+
+        response = self.client.post(
+            url, {'refresh_token': 'invalid'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['message'], 'TOKEN_INVALID')
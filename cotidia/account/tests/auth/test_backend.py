@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.apps import apps
+from django.test import TestCase
+
+from cotidia.account import fixtures
+from cotidia.account.auth import EmailBackend
+
+
+class EmailBackendTests(TestCase):
+
+    @fixtures.normal_user
+    def setUp(self):
+        self.backend = EmailBackend()
+
+    def test_authenticate_with_email(self):
+        with self.assertNumQueries(1):
+            user = self.backend.authenticate(
+                username=self.normal_user.email,
+                password=self.normal_user_pwd
+            )
+            # The token is joined with the user.
+            self.assertEqual(user.token, self.normal_user_token)
+
+        self.assertEqual(user, self.normal_user)
+        self.assertIn('date_joined', user.get_deferred_fields())
+        self.assertNotIn('password', user.get_deferred_fields())
+
+    def test_authenticate_with_email_ignores_case(self):
+        with self.assertNumQueries(1):
+            user = self.backend.authenticate(
+                username=self.normal_user.email.upper(),
+                password=self.normal_user_pwd
+            )
+        self.assertEqual(user, self.normal_user)
+
+    def test_authenticate_with_username(self):
+        self.normal_user.username = 'bob'
+        self.normal_user.save()
+
+        with self.assertNumQueries(1):
+            user = self.backend.authenticate(
+                username='bob',
+                password=self.normal_user_pwd
+            )
+
+        self.assertEqual(user, self.normal_user)
+
+    def test_authenticate_invalid(self):
+        with self.assertNumQueries(1):
+            user = self.backend.authenticate(
+                username=self.normal_user.email,
+                password='wrong-password'
+            )
+        self.assertIsNone(user)
+
+        with self.assertNumQueries(1):
+            user = self.backend.authenticate(
+                username='nobody@example.com',
+                password=self.normal_user_pwd
+            )
+        self.assertIsNone(user)
+
+    def test_get_user(self):
+        with self.assertNumQueries(1):
+            user = self.backend.get_user(self.normal_user.pk)
+        self.assertEqual(user, self.normal_user)
+        self.assertEqual(user.get_deferred_fields(), set())
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.backend.get_user(0))
+
+    def test_user_model_is_not_resolved_per_call(self):
+        with mock.patch.object(apps, 'get_model', wraps=apps.get_model) as get_model:
+            self.backend.authenticate(
+                username=self.normal_user.email,
+                password=self.normal_user_pwd
+            )
+            self.backend.get_user(self.normal_user.pk)
+
+        get_model.assert_not_called()
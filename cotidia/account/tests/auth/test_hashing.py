@@ -0,0 +1,128 @@
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from cotidia.account import fixtures
+from cotidia.account.auth import EmailBackend
+from cotidia.account.hashing import (
+    HashingOverloaded,
+    HashingPool,
+    get_hashing_pool,
+)
+from cotidia.account.models import User
+
+
+class HashingPoolTests(SimpleTestCase):
+
+    def test_hash_in_processes(self):
+        pool = HashingPool(workers=1)
+        self.addCleanup(pool.shutdown)
+
+        encoded = pool.make_password('secret')
+        self.assertTrue(check_password('secret', encoded))
+        self.assertTrue(pool.check_password('secret', make_password('secret')))
+        self.assertFalse(pool.check_password('wrong', encoded))
+        self.assertFalse(pool.check_password('secret', make_password(None)))
+        self.assertFalse(pool.check_password('secret', ''))
+
+        stats = pool.stats()
+        self.assertEqual(stats['completed'], 3)
+        self.assertEqual(stats['in_progress'], 0)
+        self.assertGreater(stats['max_latency'], 0)
+
+    def test_overloaded(self):
+        cache = caches['default']
+        cache.clear()
+        pool = HashingPool(limit=2, cache=cache, retry_after=5)
+        # A process sharing the cache.
+        other = HashingPool(limit=2, cache=cache)
+        encoded = make_password('secret')
+
+        # Two hashes in progress in the other process.
+        first = other.acquire()
+        other.acquire()
+        self.assertEqual(pool.stats()['queue_depth'], 2)
+        with self.assertRaises(HashingOverloaded) as context:
+            pool.check_password('secret', encoded)
+        self.assertEqual(context.exception.wait, 5)
+        self.assertEqual(pool.stats()['rejected'], 1)
+
+        other.release(first)
+        self.assertTrue(pool.check_password('secret', encoded))
+        self.assertEqual(pool.stats()['queue_depth'], 1)
+
+    @override_settings(
+        PASSWORD_HASHERS=[
+            'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+            'django.contrib.auth.hashers.MD5PasswordHasher',
+        ]
+    )
+    def test_hash_upgrade(self):
+        pool = HashingPool(workers=0)
+        encoded = make_password('secret', hasher='md5')
+        updated = []
+
+        self.assertTrue(pool.check_password('secret', encoded, updated.append))
+        self.assertEqual(updated, ['secret'])
+
+
+@override_settings(ACCOUNT_ENABLE_TWO_FACTOR=False)
+class HashingOverloadedTests(APITestCase):
+
+    @fixtures.normal_user
+    def setUp(self):
+        pass
+
+    def test_sign_in_is_hashed_in_the_pool(self):
+        completed = get_hashing_pool().stats()['completed']
+        user = EmailBackend().authenticate(
+            username=self.normal_user.email, password=self.normal_user_pwd
+        )
+        self.assertEqual(user, self.normal_user)
+        self.assertEqual(get_hashing_pool().stats()['completed'], completed + 1)
+
+        # Other callers, like the management commands, are not limited.
+        user.set_password('new password')
+        self.assertEqual(get_hashing_pool().stats()['completed'], completed + 1)
+
+    def test_change_password_is_hashed_in_the_pool(self):
+        completed = get_hashing_pool().stats()['completed']
+        self.client.force_authenticate(self.normal_user)
+        data = {
+            'current_password': self.normal_user_pwd,
+            'password1': 'new password',
+            'password2': 'new password',
+        }
+        response = self.client.post(
+            reverse('account-api:change-password'), data, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The current password checked and the new one hashed.
+        self.assertEqual(get_hashing_pool().stats()['completed'], completed + 2)
+
+    @override_settings(
+        ACCOUNT_HASHING_MAX_IN_PROGRESS=0, ACCOUNT_HASHING_RETRY_AFTER=3
+    )
+    def test_sign_in_fails_fast(self):
+        data = {'email': self.normal_user.email, 'password': self.normal_user_pwd}
+        response = self.client.post(reverse('account-api:sign-in'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '3')
+
+    @override_settings(ACCOUNT_ALLOW_SIGN_UP=True, ACCOUNT_HASHING_MAX_IN_PROGRESS=0)
+    def test_sign_up_fails_fast(self):
+        data = {
+            'full_name': 'Jane Doe',
+            'email': 'jane@example.com',
+            'password': 'demo1234',
+        }
+        response = self.client.post(reverse('account-api:sign-up'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(User.objects.filter(email='jane@example.com').exists())
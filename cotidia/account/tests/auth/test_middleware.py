@@ -0,0 +1,67 @@
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+
+from cotidia.account import fixtures
+from cotidia.account.middleware import AccountMiddleware
+
+
+@override_settings(
+    ROOT_URLCONF='cotidia.account.tests.auth.urls',
+    ACCOUNT_ENABLE_TWO_FACTOR=True,
+    ACCOUNT_FORCE_ADMIN_TWO_FACTOR=True,
+    ACCOUNT_MIDDLEWARE_EXEMPT_PATHS=['/static/', '/api/'],
+)
+class AccountMiddlewareTests(TestCase):
+
+    @fixtures.admin_user
+    def setUp(self):
+        self.middleware = AccountMiddleware()
+
+    def unloaded_user(self):
+        return SimpleLazyObject(lambda: self.fail('The user was loaded.'))
+
+    def process(self, path, user):
+        request = RequestFactory().get(path)
+        request.user = user
+        return self.middleware.process_request(request)
+
+    @override_settings(ACCOUNT_FORCE_ADMIN_TWO_FACTOR=False)
+    def test_enforcement_off(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.process('/admin/account/', self.unloaded_user()))
+
+    def test_exempt_paths(self):
+        paths = [
+            '/static/admin/css/base.css',
+            '/api/account/sign-in',
+            reverse('account-admin:setup'),
+            reverse('account-admin:qr'),
+            reverse('account-admin:logout'),
+        ]
+        with self.assertNumQueries(0):
+            for path in paths:
+                self.assertIsNone(self.process(path, self.unloaded_user()))
+
+    def test_unverified_user_is_redirected(self):
+        self.admin_user.is_verified = lambda: False
+        with mock.patch('cotidia.account.middleware.messages') as messages:
+            response = self.process('/admin/account/', self.admin_user)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], reverse('account-admin:setup'))
+        self.assertTrue(messages.warning.called)
+
+        self.admin_user.is_verified = lambda: True
+        self.assertIsNone(self.process('/admin/account/', self.admin_user))
+        self.assertIsNone(self.process('/admin/account/', AnonymousUser()))
+
+    def test_urls_are_reversed_once(self):
+        with mock.patch(
+            'cotidia.account.middleware.reverse', wraps=reverse
+        ) as reverse_mock:
+            for i in range(3):
+                self.process('/admin/account/', AnonymousUser())
+        self.assertEqual(reverse_mock.call_count, 3)
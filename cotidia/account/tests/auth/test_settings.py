@@ -0,0 +1,32 @@
+from django.conf import settings as django_settings
+from django.test import SimpleTestCase, override_settings
+
+from cotidia.account.conf import settings
+from cotidia.account.context_processor import account_settings
+
+
+class AccountSettingsTests(SimpleTestCase):
+
+    def test_snapshot_follows_overrides(self):
+        self.assertFalse(settings.ACCOUNT_ENABLE_TWO_FACTOR)
+        with override_settings(ACCOUNT_ENABLE_TWO_FACTOR=True):
+            self.assertTrue(settings.ACCOUNT_ENABLE_TWO_FACTOR)
+            self.assertTrue(account_settings(None)['ACCOUNT_ENABLE_TWO_FACTOR'])
+        self.assertFalse(settings.ACCOUNT_ENABLE_TWO_FACTOR)
+        self.assertFalse(account_settings(None)['ACCOUNT_ENABLE_TWO_FACTOR'])
+
+    def test_snapshot_is_read_only(self):
+        with self.assertRaises(AttributeError):
+            settings.ACCOUNT_ALLOW_SIGN_UP = False
+        with self.assertRaises(TypeError):
+            account_settings(None)['ACCOUNT_FORCE_ACTIVATION'] = False
+
+        with override_settings(ACCOUNT_MIDDLEWARE_EXEMPT_PATHS=['/static/']):
+            self.assertEqual(settings.ACCOUNT_MIDDLEWARE_EXEMPT_PATHS, ('/static/',))
+
+    def test_other_settings(self):
+        self.assertEqual(settings.SITE_URL, django_settings.SITE_URL)
+        with self.assertRaises(AttributeError):
+            settings.ACCOUNT_UNKNOWN_SETTING
+        with override_settings(ACCOUNT_PROFILE_FORM='profile.forms.ProfileForm'):
+            self.assertEqual(settings.ACCOUNT_PROFILE_FORM, 'profile.forms.ProfileForm')
@@ -0,0 +1,149 @@
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from cotidia.account import fixtures
+from cotidia.account.authentication import CachedTokenAuthentication
+from cotidia.account.cache import TokenCache, get_token_cache
+
+
+# Invalidations run on commit, they need the transactions to be committed.
+@override_settings(ACCOUNT_TOKEN_CACHE='locmem')
+class CachedTokenAuthenticationTests(TransactionTestCase):
+
+    @fixtures.normal_user
+    @fixtures.alt_user
+    def setUp(self):
+        get_token_cache().clear()
+        self.authentication = CachedTokenAuthentication()
+        self.request = self.make_request(self.normal_user_token.key)
+
+    def make_request(self, key):
+        return APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION='Token {}'.format(key)
+        )
+
+    def test_token_lookup_is_cached(self):
+        # Same cost as the stock authentication on the first request.
+        with self.assertNumQueries(1):
+            TokenAuthentication().authenticate(self.request)
+        # The user of the key is recorded, then the user is cached.
+        for i in range(2):
+            with self.assertNumQueries(1):
+                user, token = self.authentication.authenticate(self.request)
+
+        with self.assertNumQueries(0):
+            for i in range(10):
+                user, token = self.authentication.authenticate(self.request)
+
+        self.assertEqual(user, self.normal_user)
+        self.assertEqual(token.key, self.normal_user_token.key)
+        self.assertEqual(get_token_cache().stats(), {'hits': 10, 'misses': 2})
+
+    def test_other_users_are_kept(self):
+        for i in range(2):
+            self.authentication.authenticate(self.request)
+
+        self.alt_user.save()
+
+        with self.assertNumQueries(0):
+            self.authentication.authenticate(self.request)
+
+    @override_settings(ACCOUNT_TOKEN_CACHE=None)
+    def test_disabled(self):
+        self.assertIsNone(get_token_cache())
+        for i in range(2):
+            with self.assertNumQueries(1):
+                user, token = self.authentication.authenticate(self.request)
+        self.assertEqual(user, self.normal_user)
+
+    def test_deactivated_user_is_rejected(self):
+        for i in range(2):
+            self.authentication.authenticate(self.request)
+
+        self.normal_user.is_active = False
+        self.normal_user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate(self.request)
+
+    def test_password_change_reloads_user(self):
+        self.authentication.authenticate(self.request)
+
+        self.normal_user.set_password('new-password')
+        self.normal_user.save()
+
+        with self.assertNumQueries(1):
+            user, token = self.authentication.authenticate(self.request)
+        self.assertTrue(user.check_password('new-password'))
+
+    def test_deleted_token_is_rejected(self):
+        for i in range(2):
+            self.authentication.authenticate(self.request)
+
+        self.normal_user_token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate(self.request)
+
+    def test_regenerated_token(self):
+        for i in range(2):
+            self.authentication.authenticate(self.request)
+
+        self.normal_user_token.delete()
+        new_token = self.normal_user_token.__class__.objects.create(
+            user=self.normal_user
+        )
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate(self.request)
+
+        user, token = self.authentication.authenticate(
+            self.make_request(new_token.key)
+        )
+        self.assertEqual(user, self.normal_user)
+
+    @override_settings(ACCOUNT_TOKEN_CACHE_MAX_ENTRIES=1)
+    def test_cache_is_bounded(self):
+        self.authentication.authenticate(self.request)
+        self.authentication.authenticate(
+            self.make_request(self.alt_user_token.key)
+        )
+        self.assertEqual(len(get_token_cache().storage), 1)
+
+
+class SharedTokenCacheTests(TestCase):
+    """Two caches on the same storage stand for two processes."""
+
+    @fixtures.normal_user
+    def setUp(self):
+        storage = caches['default']
+        storage.clear()
+        self.cache = TokenCache(storage, timeout=60)
+        self.other_cache = TokenCache(storage, timeout=60)
+        self.key = self.normal_user_token.key
+
+    def fill(self, cache):
+        user, state = cache.get(self.key)
+        cache.set(self.key, state, self.normal_user)
+
+    def test_invalidation_reaches_other_processes(self):
+        for i in range(2):
+            self.fill(self.cache)
+        self.assertEqual(self.other_cache.get(self.key)[0], self.normal_user)
+
+        self.other_cache.invalidate_user(self.normal_user.pk)
+        self.assertIsNone(self.cache.get(self.key)[0])
+
+    def test_stale_fill_is_dropped(self):
+        self.fill(self.cache)
+        user, state = self.cache.get(self.key)
+
+        # The user changes while the first process loads it.
+        self.other_cache.invalidate_user(self.normal_user.pk)
+        self.cache.set(self.key, state, self.normal_user)
+
+        self.assertIsNone(self.cache.get(self.key)[0])
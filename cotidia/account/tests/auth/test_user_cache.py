@@ -0,0 +1,138 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.db import transaction
+from django.test import TransactionTestCase, SimpleTestCase, override_settings
+
+from cotidia.account import fixtures
+from cotidia.account.auth import EmailBackend
+from cotidia.account.cache import LRUCache, get_user_cache
+
+
+class LRUCacheTests(SimpleTestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2, timeout=None)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_entries_expire(self):
+        cache = LRUCache(max_entries=10, timeout=60)
+
+        with mock.patch('cotidia.account.cache.time.monotonic', return_value=100):
+            cache.set('a', 1)
+            cache.set('b', 2, None)
+            self.assertFalse(cache.add('a', 3))
+
+        with mock.patch('cotidia.account.cache.time.monotonic', return_value=161):
+            self.assertIsNone(cache.get('a'))
+            self.assertEqual(cache.get('b'), 2)
+            self.assertTrue(cache.add('a', 3))
+            self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 3, 'b': 2})
+
+
+# Invalidations run on commit, they need the transactions to be committed.
+class UserCacheTests(TransactionTestCase):
+
+    @fixtures.normal_user
+    def setUp(self):
+        self.backend = EmailBackend()
+
+        # Start every test with an empty cache.
+        caches['default'].clear()
+        override = override_settings(ACCOUNT_USER_CACHE='locmem')
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_disabled_by_default(self):
+        with self.settings(ACCOUNT_USER_CACHE=None):
+            self.assertIsNone(get_user_cache())
+
+    def test_get_user_is_cached(self):
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.normal_user.pk)
+
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.normal_user.pk)
+
+        self.assertEqual(user, self.normal_user)
+        self.assertEqual(get_user_cache().stats(), {'hits': 1, 'misses': 1})
+
+    def test_cached_copies_are_independent(self):
+        user = self.backend.get_user(self.normal_user.pk)
+        user.first_name = 'Changed'
+
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.normal_user.pk)
+        self.assertEqual(user.first_name, 'Bob')
+
+    def test_user_save_invalidates(self):
+        self.backend.get_user(self.normal_user.pk)
+
+        self.normal_user.first_name = 'Robert'
+        self.normal_user.save()
+
+        with self.assertNumQueries(1):
+            user = self.backend.get_user(self.normal_user.pk)
+        self.assertEqual(user.first_name, 'Robert')
+
+    def test_user_save_invalidates_on_commit(self):
+        self.backend.get_user(self.normal_user.pk)
+
+        with transaction.atomic():
+            self.normal_user.first_name = 'Robert'
+            self.normal_user.save()
+
+            # Other requests do not see the change yet, nor cache it.
+            with self.assertNumQueries(0):
+                user = self.backend.get_user(self.normal_user.pk)
+            self.assertEqual(user.first_name, 'Bob')
+
+        with self.assertNumQueries(1):
+            user = self.backend.get_user(self.normal_user.pk)
+        self.assertEqual(user.first_name, 'Robert')
+
+    def test_stale_write_is_dropped(self):
+        user_cache = get_user_cache()
+        user, version = user_cache.get(self.normal_user.pk)
+        self.assertIsNone(user)
+
+        # The user changes while the request is loading it.
+        self.normal_user.save()
+        user_cache.set(self.normal_user.pk, version, self.normal_user)
+
+        user, version = user_cache.get(self.normal_user.pk)
+        self.assertIsNone(user)
+
+    def test_group_changes_invalidate(self):
+        group = Group.objects.create(name='Editors')
+        self.backend.get_user(self.normal_user.pk)
+
+        self.normal_user.groups.add(group)
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.normal_user.pk)
+
+        group.name = 'Writers'
+        group.save()
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.normal_user.pk)
+
+    @override_settings(ACCOUNT_USER_CACHE='default')
+    def test_django_cache_backend(self):
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.normal_user.pk)
+
+        with self.assertNumQueries(0):
+            self.backend.get_user(self.normal_user.pk)
+
+        pk = self.normal_user.pk
+        self.normal_user.delete()
+        self.assertIsNone(self.backend.get_user(pk))
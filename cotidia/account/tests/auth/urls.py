@@ -0,0 +1,15 @@
+from django.conf.urls import include, url
+from django.contrib.auth.views import LogoutView
+
+from cotidia.account.urls.admin.two_factor import urlpatterns as two_factor_urlpatterns
+
+
+# The admin urls with the two-factor pages, mounted when
+# `ACCOUNT_ENABLE_TWO_FACTOR` is set at import time only.
+admin_urlpatterns = two_factor_urlpatterns + [
+    url(r'^logout/$', LogoutView.as_view(), name='logout'),
+]
+
+urlpatterns = [
+    url(r'^admin/account/', include((admin_urlpatterns, 'account-admin'))),
+]
@@ -0,0 +1,207 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from cotidia.account import fixtures
+from cotidia.account.importer import UserImport, read_rows
+from cotidia.account.models import User
+
+
+CSV = (
+    "email,full_name,password,groups\n"
+    "jane@example.com,Jane Doe,demo1234,Editors\n"
+    "JOHN@example.com,John Smith,,\n"
+    "not-an-email,Bad Row,demo1234,\n"
+    "jane@example.com,Jane Again,demo1234,\n"
+    "al@example.com,Al Jones,demo1234,Unknown\n"
+)
+
+
+class UserImportTests(TestCase):
+
+    @fixtures.normal_user
+    def setUp(self):
+        self.editors = Group.objects.create(name='Editors')
+
+    def test_import_csv(self):
+        result = UserImport(chunk_size=2, workers=0).run(
+            read_rows(StringIO(CSV), 'csv')
+        )
+
+        self.assertEqual(result['rows'], 5)
+        self.assertEqual(result['created'], 2)
+        self.assertEqual([e['row'] for e in result['errors']], [3, 4, 5])
+
+        jane = User.objects.get_by_email('jane@example.com')
+        self.assertEqual((jane.first_name, jane.last_name), ('Jane', 'Doe'))
+        self.assertTrue(jane.check_password('demo1234'))
+        self.assertEqual(list(jane.groups.all()), [self.editors])
+        self.assertTrue(Token.objects.filter(user=jane).exists())
+
+        john = User.objects.get_by_email('john@example.com')
+        self.assertEqual(john.email_key, 'john@example.com')
+        self.assertFalse(john.has_usable_password())
+
+    def test_import_rejects_existing_email(self):
+        rows = [{
+            'email': self.normal_user.email.upper(),
+            'full_name': 'Other Name',
+        }]
+        result = UserImport(workers=0).run(rows)
+
+        self.assertEqual(result['created'], 0)
+        self.assertIn('email', result['errors'][0]['errors'])
+
+    def test_import_queries_per_chunk(self):
+        rows = [
+            {
+                'email': 'user{}@example.com'.format(i),
+                'full_name': 'User Name',
+                'groups': ['Editors'],
+            }
+            for i in range(20)
+        ]
+        user_import = UserImport(chunk_size=20, workers=0)
+        user_import.get_group_ids()
+
+        # Email check, users, ids, tokens, search terms and groups, in a
+        # savepoint. The counters are updated on commit.
+        with self.assertNumQueries(8):
+            result = user_import.run(rows)
+        self.assertEqual(result['created'], 20)
+
+    def test_import_hashes_in_process_pool(self):
+        rows = [
+            {'email': 'user{}@example.com'.format(i), 'full_name': 'User Name',
+             'password': 'demo1234'}
+            for i in range(4)
+        ]
+        result = UserImport(workers=2).run(rows)
+
+        self.assertEqual(result['created'], 4)
+        user = User.objects.get_by_email('user3@example.com')
+        self.assertTrue(user.check_password('demo1234'))
+
+    def test_import_resumes(self):
+        result = UserImport(workers=0).run(
+            read_rows(StringIO(CSV), 'csv'), start=1
+        )
+
+        self.assertEqual(result['rows'], 5)
+        # The first row was skipped, the later one with the same email is
+        # imported instead.
+        jane = User.objects.get_by_email('jane@example.com')
+        self.assertEqual(jane.last_name, 'Again')
+        self.assertTrue(User.objects.filter(email_key='john@example.com').exists())
+
+
+class ImportUsersCommandTests(TestCase):
+
+    def setUp(self):
+        Group.objects.create(name='Editors')
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, 'users.jsonl')
+        self.state = os.path.join(directory, 'users.state')
+        with open(self.path, 'w') as f:
+            for i in range(5):
+                f.write(json.dumps({
+                    'email': 'user{}@example.com'.format(i),
+                    'full_name': 'User Name',
+                    'password': 'demo1234',
+                }) + '\n')
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            'import_users', self.path, '--workers=0', '--chunk-size=2',
+            '--state', self.state, stdout=out, stderr=StringIO()
+        )
+
+        self.assertIn('rows/s', out.getvalue())
+        self.assertIn('Imported 5 users', out.getvalue())
+        self.assertEqual(User.objects.count(), 5)
+        with open(self.state) as f:
+            self.assertEqual(json.load(f), {'rows': 5})
+
+    def test_command_resumes_from_state(self):
+        with open(self.state, 'w') as f:
+            json.dump({'rows': 3}, f)
+
+        call_command(
+            'import_users', self.path, '--workers=0', '--state', self.state,
+            stdout=StringIO(), stderr=StringIO()
+        )
+
+        self.assertEqual(
+            sorted(User.objects.values_list('email', flat=True)),
+            ['user3@example.com', 'user4@example.com']
+        )
+
+
+class ImportUsersAPITests(APITestCase):
+
+    @fixtures.normal_user
+    @fixtures.superuser
+    def setUp(self):
+        Group.objects.create(name='Editors')
+        self.url = reverse('account-api:import-users')
+
+    def test_import_file(self):
+        self.client.force_authenticate(self.superuser)
+        upload = SimpleUploadedFile('users.csv', CSV.encode('utf-8'))
+
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(len(response.data['errors']), 3)
+
+    def test_import_rows(self):
+        self.client.force_authenticate(self.superuser)
+        data = {'users': [{'email': 'jane@example.com', 'full_name': 'Jane Doe'}]}
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+
+    def test_import_requires_permission(self):
+        self.client.force_authenticate(self.normal_user)
+        data = {'users': [{'email': 'jane@example.com', 'full_name': 'Jane Doe'}]}
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(ACCOUNT_IMPORT_SYNC_LIMIT=1)
+    def test_import_too_large(self):
+        self.client.force_authenticate(self.superuser)
+        upload = SimpleUploadedFile('users.csv', CSV.encode('utf-8'))
+
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['message'], 'IMPORT_FILE_TOO_LARGE')
+        self.assertFalse(User.objects.filter(email='jane@example.com').exists())
+
+    def test_import_invalid_file_creates_nothing(self):
+        self.client.force_authenticate(self.superuser)
+        content = '{"email": "jane@example.com", "full_name": "Jane Doe"}\n{'
+        upload = SimpleUploadedFile('users.jsonl', content.encode('utf-8'))
+
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['message'], 'IMPORT_FILE_INVALID')
+        self.assertFalse(User.objects.filter(email='jane@example.com').exists())
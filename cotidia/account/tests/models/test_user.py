@@ -0,0 +1,77 @@
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from cotidia.account import fixtures
+from cotidia.account.models import User
+
+
+class UserUUIDTests(TestCase):
+
+    @fixtures.normal_user
+    def setUp(self):
+        pass
+
+    def test_uuid_is_unique(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create(
+                username='duplicate',
+                email='duplicate@example.com',
+                uuid=self.normal_user.uuid
+            )
+
+    def test_lookup_by_uuid(self):
+        with self.assertNumQueries(1):
+            user = User.objects.get(uuid=self.normal_user.uuid)
+        self.assertEqual(user, self.normal_user)
+
+
+class UserEmailKeyTests(TestCase):
+
+    @fixtures.normal_user
+    def setUp(self):
+        pass
+
+    def test_email_key_is_normalized_on_save(self):
+        self.normal_user.email = ' Steve@Example.COM'
+        self.normal_user.save(update_fields=['email'])
+
+        self.normal_user.refresh_from_db()
+        self.assertEqual(self.normal_user.email_key, 'steve@example.com')
+
+    def test_email_key_is_null_without_email(self):
+        user = User.objects.create(username='noemail', email='')
+        self.assertIsNone(user.email_key)
+
+    def test_get_by_email_ignores_case(self):
+        with self.assertNumQueries(1):
+            user = User.objects.get_by_email(self.normal_user.email.upper())
+        self.assertEqual(user, self.normal_user)
+
+    def test_get_by_email_blank(self):
+        User.objects.create(username='noemail', email='')
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_by_email('')
+
+    def test_email_differing_in_case_is_rejected(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create(
+                username='duplicate',
+                email=self.normal_user.email.upper()
+            )
+
+    def test_validate_unique_reports_email(self):
+        user = User(username='duplicate', email=self.normal_user.email.upper())
+        with self.assertRaises(ValidationError) as cm:
+            user.validate_unique()
+        self.assertIn('email', cm.exception.message_dict)
+
+    def test_save_with_email_differing_in_case_is_rejected(self):
+        user = User.objects.create(username='other', email='other@example.com')
+        user.email = self.normal_user.email.upper()
+        with self.assertRaises(ValidationError) as cm:
+            user.save()
+        self.assertIn('email', cm.exception.message_dict)
+
+        user.refresh_from_db()
+        self.assertEqual(user.email_key, 'other@example.com')
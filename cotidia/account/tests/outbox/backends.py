@@ -0,0 +1,44 @@
+import smtplib
+import time
+
+from django.core.mail.backends import locmem
+
+
+class SlowEmailBackend(locmem.EmailBackend):
+    """A local stand-in for a slow SMTP server.
+
+    Opening a connection and sending each message take `delay` seconds,
+    messages to `failing_recipients` are refused. Delivered messages are
+    appended to `django.core.mail.outbox`.
+    """
+
+    delay = 0.01
+    failing_recipients = ()
+    connections = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.is_open = False
+
+    def open(self):
+        if self.is_open:
+            return False
+        time.sleep(self.delay)
+        type(self).connections += 1
+        self.is_open = True
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, messages):
+        new_connection = self.open()
+        try:
+            for message in messages:
+                time.sleep(self.delay)
+                if set(message.recipients()) & set(self.failing_recipients):
+                    raise smtplib.SMTPRecipientsRefused(message.recipients())
+            return super().send_messages(messages)
+        finally:
+            if new_connection:
+                self.close()
@@ -0,0 +1,152 @@
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cotidia.account.models import OutboxEmail
+from cotidia.account.outbox import claim, send_batch, send_outbox_emails
+from cotidia.account.tests.outbox.backends import SlowEmailBackend
+
+
+@override_settings(
+    EMAIL_BACKEND='cotidia.account.outbox.OutboxEmailBackend',
+    ACCOUNT_OUTBOX_EMAIL_BACKEND=(
+        'cotidia.account.tests.outbox.backends.SlowEmailBackend'
+    ),
+)
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        SlowEmailBackend.connections = 0
+
+    def send(self, count, recipient='jane@example.com'):
+        for i in range(count):
+            mail.send_mail(
+                'Subject {}'.format(i),
+                'Body',
+                'from@example.com',
+                [recipient]
+            )
+
+    def test_emails_are_stored(self):
+        self.send(2)
+
+        self.assertEqual(OutboxEmail.objects.count(), 2)
+        self.assertEqual(len(mail.outbox), 0)
+
+        email = OutboxEmail.objects.first()
+        self.assertIn(b'Subject: Subject 0', bytes(email.message))
+        message = email.get_message()
+        self.assertEqual(message.to, ['jane@example.com'])
+        self.assertEqual(message.subject, 'Subject 0')
+
+    def test_bcc_recipients_are_kept(self):
+        mail.EmailMessage(
+            'Subject', 'Body', 'from@example.com', ['jane@example.com'],
+            bcc=['john@example.com'],
+        ).send()
+
+        message = OutboxEmail.objects.get().get_message()
+        self.assertEqual(
+            message.recipients(), ['jane@example.com', 'john@example.com']
+        )
+        self.assertNotIn('Bcc', message.message())
+
+    def test_emails_are_discarded_on_rollback(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.send(1)
+            raise ValueError
+
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    @override_settings(ACCOUNT_ALLOW_SIGN_UP=True, ACCOUNT_FORCE_ACTIVATION=True)
+    def test_sign_up_does_not_wait_for_mail_server(self):
+        with mock.patch.object(SlowEmailBackend, 'delay', 10):
+            response = self.client.post(
+                reverse('account-api:sign-up'),
+                {
+                    'full_name': 'Jane Doe',
+                    'email': 'jane@example.com',
+                    'password': 'demo1234',
+                }
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(SlowEmailBackend.connections, 0)
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    def test_send_reuses_connection(self):
+        self.send(5)
+
+        self.assertEqual(send_outbox_emails(batch_size=10), 5)
+
+        self.assertEqual(SlowEmailBackend.connections, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_send_in_batches(self):
+        self.send(5)
+
+        self.assertEqual(send_outbox_emails(batch_size=2), 5)
+
+        self.assertEqual(SlowEmailBackend.connections, 3)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_reclaimed_emails_are_skipped(self):
+        self.send(2)
+        emails = claim()
+
+        # The lease of the second email ended and another worker claimed it.
+        OutboxEmail.objects.filter(pk=emails[1].pk).update(
+            available_at=timezone.now()
+        )
+
+        self.assertEqual(send_batch(emails), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutboxEmail.objects.get().pk, emails[1].pk)
+
+    @override_settings(ACCOUNT_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_emails_are_retried_later(self):
+        self.send(1, recipient='refused@example.com')
+        self.send(1)
+
+        with mock.patch.object(
+                SlowEmailBackend,
+                'failing_recipients',
+                ['refused@example.com']):
+            self.assertEqual(send_outbox_emails(), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.attempts, 1)
+        self.assertIsNone(email.failed_at)
+        self.assertGreater(email.available_at, timezone.now())
+        self.assertIn('SMTPRecipientsRefused', email.last_error)
+
+        # Not claimed again before the retry delay.
+        self.assertEqual(send_outbox_emails(), 0)
+
+        OutboxEmail.objects.update(available_at=timezone.now())
+        with mock.patch.object(
+                SlowEmailBackend,
+                'failing_recipients',
+                ['refused@example.com']):
+            send_outbox_emails()
+
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 2)
+        self.assertIsNotNone(email.failed_at)
+
+    def test_command(self):
+        self.send(3)
+
+        out = StringIO()
+        call_command('send_outbox_emails', stdout=out)
+
+        self.assertIn('Sent 3 email(s)', out.getvalue())
+        self.assertEqual(len(mail.outbox), 3)
@@ -10,6 +10,7 @@ from django.utils.http import urlsafe_base64_encode
 
 from cotidia.account.conf import settings
 from cotidia.account.factory import UserFactory
+from cotidia.account.forms.admin import AccountUserCreationForm
 
 
 @override_settings(ACCOUNT_ENABLE_TWO_FACTOR=False)
@@ -139,6 +140,33 @@ class AccountPublicTests(TestCase):
         # Shoud not redirect as not allowed to login
         self.assertEquals(response.status_code, 200)
 
+    def test_signup_duplicate_email(self):
+        UserFactory.create(email="test@test.com")
+
+        data = {
+            "email": "Test@Test.com",
+            "password1": "demo123",
+            "password2": "demo123",
+        }
+        response = self.client.post(reverse("account-public:sign-up"), data)
+        self.assertEquals(response.status_code, 200)
+        self.assertFormError(
+            response, "form", "email", "This email is already used."
+        )
+
+    def test_creation_form_duplicate_email(self):
+        UserFactory.create(email="test@test.com")
+
+        form = AccountUserCreationForm(
+            {
+                "email": "test@test.com",
+                "password1": "demo123",
+                "password2": "demo123",
+            }
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("email", form.errors)
+
     def test_send_match_email_redirect(self):
         """
         We need to cover a scenario when the user reset his password then
@@ -1,4 +1,7 @@
 import re
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
 
 
 def get_confirmation_url_from_email(email_message):
@@ -19,3 +22,20 @@ def get_reset_url_from_email(email_message):
     reset_code = m.group(3)
 
     return reset_url, user_uuid, reset_code
+
+
+@contextmanager
+def run_on_commit(using=DEFAULT_DB_ALIAS):
+    """Run the `transaction.on_commit` callbacks registered within the block.
+
+    The transaction of a `TestCase` is never committed, they would not run.
+    """
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    try:
+        yield
+    finally:
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+    for sids, func in callbacks:
+        func()
@@ -0,0 +1,129 @@
+"""
+Signed access tokens, an alternative to the database `Token`.
+
+Access tokens are short-lived and `verify_access_token` checks them with
+the signing keys only, so any service sharing the keys can validate them
+without a database connection. Refresh tokens live longer and are checked
+against the user's `token_version` when exchanged for a new pair.
+
+Incrementing the version revokes every token of the user. Refresh tokens
+are rejected straight away. Services verifying only the signature keep
+accepting the access tokens until they expire, within
+`ACCOUNT_ACCESS_TOKEN_LIFETIME`. The account API itself is not stateless:
+`AccessTokenAuthentication` and the `Authenticate` view load the user, from
+the user cache when enabled, and reject revoked access tokens at once.
+
+The first key of `ACCOUNT_ACCESS_TOKEN_KEYS` signs new tokens and every key
+of the list is accepted, which allows rotating keys without signing out
+users.
+
+"""
+from django.core import signing
+from django.db.models import F
+
+from cotidia.account.cache import invalidate_cached_users
+from cotidia.account.conf import settings
+from cotidia.account.models import User
+
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+SALTS = {
+    ACCESS: "cotidia.account.tokens.access",
+    REFRESH: "cotidia.account.tokens.refresh",
+}
+
+
+class InvalidToken(Exception):
+    """The token is malformed, expired, revoked or signed with an unknown key."""
+
+
+def get_signing_keys():
+    return settings.ACCOUNT_ACCESS_TOKEN_KEYS or [settings.SECRET_KEY]
+
+
+def get_lifetime(token_type):
+    if token_type == ACCESS:
+        return settings.ACCOUNT_ACCESS_TOKEN_LIFETIME
+    return settings.ACCOUNT_REFRESH_TOKEN_LIFETIME
+
+
+def sign(user, token_type):
+    claims = {"uid": user.pk, "uuid": str(user.uuid), "ver": user.token_version}
+    return signing.dumps(
+        claims, key=get_signing_keys()[0], salt=SALTS[token_type], compress=True
+    )
+
+
+def verify(token, token_type):
+    """Return the claims of a token, raise `InvalidToken` if it is not valid.
+
+    No database query is made, the claims are trusted because they are
+    signed.
+    """
+    for key in get_signing_keys():
+        try:
+            return signing.loads(
+                token,
+                key=key,
+                salt=SALTS[token_type],
+                max_age=get_lifetime(token_type),
+            )
+        except signing.SignatureExpired:
+            raise InvalidToken("The token has expired.")
+        except signing.BadSignature:
+            continue
+    raise InvalidToken("The token signature is invalid.")
+
+
+def make_access_token(user):
+    return sign(user, ACCESS)
+
+
+def make_refresh_token(user):
+    return sign(user, REFRESH)
+
+
+def verify_access_token(token):
+    return verify(token, ACCESS)
+
+
+def make_tokens(user):
+    """Return a new pair of access and refresh tokens for the user."""
+    return {
+        "access_token": make_access_token(user),
+        "refresh_token": make_refresh_token(user),
+        "expires_in": settings.ACCOUNT_ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def check_claims(user, claims):
+    """Raise `InvalidToken` if the claims do not match the current user."""
+    if not user.is_active:
+        raise InvalidToken("The user is not active.")
+    if user.token_version != claims["ver"]:
+        raise InvalidToken("The token has been revoked.")
+
+
+def refresh_tokens(refresh_token):
+    """Exchange a refresh token for a `(user, tokens)` tuple."""
+    claims = verify(refresh_token, REFRESH)
+
+    try:
+        user = User.objects.get(pk=claims["uid"])
+    except User.DoesNotExist:
+        raise InvalidToken("The user does not exist.")
+
+    check_claims(user, claims)
+
+    return user, make_tokens(user)
+
+
+def revoke_tokens(user):
+    """Revoke all the access and refresh tokens issued to the user."""
+    # Incremented by the database, the instance may come from a cache and
+    # a concurrent revocation must not be lost.
+    User.objects.filter(pk=user.pk).update(token_version=F("token_version") + 1)
+    user.refresh_from_db(fields=["token_version"])
+    invalidate_cached_users([user.pk])
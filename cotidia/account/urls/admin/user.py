@@ -10,7 +10,10 @@ from cotidia.account.views.admin.user import (
     UserUpdate,
     UserDelete,
     UserChangePassword,
-    UserInvite
+    UserInvite,
+    UserExport,
+    UserBulk,
+    UserBulkJobDetail,
 )
 
 ure = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
@@ -31,6 +34,21 @@ urlpatterns = [
         UserListSuperuser.as_view(),
         name='user-list-superuser'
     ),
+    url(
+        r'^export$',
+        UserExport.as_view(),
+        name='user-export'
+    ),
+    url(
+        r'^bulk$',
+        UserBulk.as_view(),
+        name='user-bulk'
+    ),
+    url(
+        r'^bulk/(?P<pk>[\d]+)$',
+        UserBulkJobDetail.as_view(),
+        name='user-bulk-job'
+    ),
     url(
         r'^add$',
         UserCreate.as_view(),
@@ -23,6 +23,10 @@ urlpatterns = [
         name="resend-activation-link",
     ),
     url(r"^authenticate$", api.Authenticate.as_view(), name="authenticate"),
+    url(
+        r"^refresh-token$", api.RefreshAccessToken.as_view(), name="refresh-token"
+    ),
+    url(r"^revoke-tokens$", api.RevokeAccessTokens.as_view(), name="revoke-tokens"),
     url(r"^reset-password$", api.ResetPassword.as_view(), name="reset-password"),
     url(
         r"^reset-password-validate/(?P<uuid>" + ure + ")/(?P<token>[a-z0-9\-]+)$",
@@ -36,6 +40,8 @@ urlpatterns = [
     ),
     url(r"^update-details$", api.UpdateDetails.as_view(), name="update-details"),
     url(r"^change-password$", api.ChangePassword.as_view(), name="change-password"),
+    url(r"^import-users$", api.ImportUsers.as_view(), name="import-users"),
+    url(r"^users$", api.UserList.as_view(), name="user-list"),
     path(
         "dynamic-list/auth/group",
         DynamicListAPIView.as_view(permission_required=["auth.change_group"]),
@@ -5,10 +5,13 @@ from django.shortcuts import render, redirect, resolve_url, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
 from django.urls import reverse
+from django.apps import apps
 from django.contrib import messages
+from django.db import transaction
 
-from django_otp import devices_for_user, user_has_device
+from django_otp import user_has_device
 from django_otp.decorators import otp_required
+from django_otp.models import Device
 from django_otp.plugins.otp_static.models import StaticToken
 
 from two_factor.models import get_available_phone_methods
@@ -39,6 +42,13 @@ from cotidia.account.forms import (
 from cotidia.account.models import User
 
 
+def delete_devices(user):
+    """Remove all the devices of a user, with one delete per device class."""
+    for model in apps.get_models():
+        if issubclass(model, Device):
+            model._default_manager.filter(user=user).delete()
+
+
 @class_view_decorator(sensitive_post_parameters())
 @class_view_decorator(never_cache)
 class TwoFactorLoginView(BaseLoginView):
@@ -92,8 +102,7 @@ class DisableView(View):
 
         if form.is_valid():
             # Remove all the devices from the user
-            for device in devices_for_user(self.request.user):
-                device.delete()
+            delete_devices(self.request.user)
 
             return redirect(resolve_url("account-admin:edit"))
 
@@ -142,8 +151,7 @@ class UserDisableView(View):
             user = self.get_user(uuid)
 
             # Remove all the devices from the user
-            for device in devices_for_user(user):
-                device.delete()
+            delete_devices(user)
 
             return redirect(resolve_url("account-admin:user-detail", pk=user.id))
 
@@ -152,22 +160,33 @@ class UserDisableView(View):
 
 @class_view_decorator(never_cache)
 @class_view_decorator(otp_required)
-class ListBackupTokensView(View):
+class BackupDeviceMixin:
+    """Load the backup device of the user once per request."""
+
+    def get_device(self):
+        if not hasattr(self, "_device"):
+            self._device = self.request.user.staticdevice_set.get_or_create(
+                name="backup"
+            )[0]
+        return self._device
+
+    def get_tokens(self):
+        if not hasattr(self, "_tokens"):
+            self._tokens = list(self.get_device().token_set.all())
+        return self._tokens
+
+
+@class_view_decorator(never_cache)
+@class_view_decorator(otp_required)
+class ListBackupTokensView(BackupDeviceMixin, View):
     """View for listing backup tokens with password protection."""
 
     form_class = PasswordProtectionForm
     template_name = "admin/account/two_factor/core/list_backup_tokens.html"
 
-    def get_device(self):
-        return self.request.user.staticdevice_set.get_or_create(name="backup")[0]
-
     @property
-    def has_backup_tokens(self, **kwargs):
-        device = self.get_device()
-        if device.token_set.count() > 0:
-            return True
-        else:
-            return False
+    def has_backup_tokens(self):
+        return len(self.get_tokens()) > 0
 
     def get(self, request, *args, **kwargs):
         form = self.form_class(user=request.user)
@@ -181,15 +200,16 @@ class ListBackupTokensView(View):
         form = self.form_class(data=request.POST, user=request.user)
         context = {"form": form, "has_backup_tokens": self.has_backup_tokens}
         if form.is_valid():
-            # Add the device to the context to retrieve the list of tokens
+            # Add the device and its tokens to the context to list them
             context["device"] = self.get_device()
+            context["tokens"] = self.get_tokens()
 
         return render(request, self.template_name, context)
 
 
 @class_view_decorator(never_cache)
 @class_view_decorator(otp_required)
-class GenerateBackupTokensView(View):
+class GenerateBackupTokensView(BackupDeviceMixin, View):
     """Generate backup tokens with password protection."""
 
     form_class = PasswordProtectionForm
@@ -197,14 +217,6 @@ class GenerateBackupTokensView(View):
     initial = {}
     number_of_tokens = 10
 
-    def get_device(self):
-        return self.request.user.staticdevice_set.get_or_create(name="backup")[0]
-
-    def get_context_data(self, **kwargs):
-        context = super(ListBackupTokensView, self).get_context_data(**kwargs)
-        context["device"] = self.get_device()
-        return context
-
     def get(self, request, *args, **kwargs):
         form = self.form_class(initial=self.initial, user=request.user)
         return render(request, self.template_name, {"form": form})
@@ -214,12 +226,18 @@ class GenerateBackupTokensView(View):
         context = {"form": form}
         if form.is_valid():
             # Delete the existing tokens and generate some new ones
-            device = self.get_device()
-            device.token_set.all().delete()
-            for n in range(self.number_of_tokens):
-                device.token_set.create(token=StaticToken.random_token())
+            with transaction.atomic():
+                device = self.get_device()
+                device.token_set.all().delete()
+                tokens = StaticToken.objects.bulk_create(
+                    [
+                        StaticToken(device=device, token=StaticToken.random_token())
+                        for n in range(self.number_of_tokens)
+                    ]
+                )
 
             context["device"] = device
+            context["tokens"] = tokens
 
         return render(request, self.template_name, context)
 
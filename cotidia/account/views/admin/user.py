@@ -1,18 +1,25 @@
 import django_filters
-import importlib
 import uuid
 
-from django.db.models import Q
-from django.http import HttpResponseRedirect
+from django.db.models import BooleanField, Case, CharField, Q, Value, When
+from django.db.models.functions import Concat
+from django.http import HttpResponseBadRequest, HttpResponseRedirect
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
-from django.core.exceptions import ObjectDoesNotExist
-from django.apps import apps
+from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
 from django import forms
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.contrib.auth.models import Group
+from django.views.generic import View
 
-from betterforms.multiform import MultiModelForm
-
+from cotidia.account import bulk, deletion, exporter
 from cotidia.account.conf import settings
+from cotidia.account.counts import UserCountPaginator
+from cotidia.account.pagination import KeysetPaginationMixin
+from cotidia.account.profiles import get_profile_model, get_user_form_class
+from cotidia.account.search import get_search_backend
 from cotidia.admin.views import (
     AdminListView,
     AdminDetailView,
@@ -20,7 +27,7 @@ from cotidia.admin.views import (
     AdminUpdateView,
     AdminDeleteView,
 )
-from cotidia.account.models import User
+from cotidia.account.models import User, UserBulkJob
 from cotidia.account.forms.admin.user import (
     UserAddForm,
     SuperUserAddForm,
@@ -31,6 +38,25 @@ from cotidia.account.forms.admin.user import (
 )
 
 
+class UserObjectMixin:
+    """Load the user of the view once per request, with its relations."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset().prefetch_related(
+            "groups", "user_permissions__content_type"
+        )
+        if get_profile_model() is not None:
+            queryset = queryset.select_related("profile")
+        return queryset
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, "_user_object"):
+            self._user_object = super().get_object()
+        return self._user_object
+
+
 class CheckUserMixin:
     def check_user(self, user):
         obj = self.get_object()
@@ -58,23 +84,78 @@ class UserFilter(django_filters.FilterSet):
         fields = ["first_name"]
 
     def search(self, queryset, name, value):
+        return get_search_backend().search(queryset, value)
 
-        q_objects = (
-            Q(first_name__icontains=value)
-            | Q(last_name__icontains=value)
-            | Q(email__icontains=value)
+
+class UserListPaginationMixin(KeysetPaginationMixin):
+    paginator_class = UserCountPaginator
+    # The user counter matching the list when it is not filtered.
+    count_segment = None
+
+    def get_keyset_pagination(self):
+        return settings.ACCOUNT_USER_LIST_KEYSET_PAGINATION
+
+    def get_count_segment(self):
+        if any(self.request.GET.get(name) for name in UserFilter.base_filters):
+            return None
+        return self.count_segment
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return super().get_paginator(
+            queryset, per_page, segment=self.get_count_segment(), **kwargs
         )
 
-        try:
-            val = uuid.UUID(value, version=4)
-            q_objects |= Q(uuid=val)
-        except ValueError:
-            pass
 
-        return queryset.filter(q_objects)
+class UserListProjectionMixin:
+    """Load the fields shown by the `columns` only.
+
+    `name` and the `has_password` flag used by the date joined column are
+    computed by the database, so the names and password hashes are not
+    loaded. The annotations are named `_name` and `_has_password`, read by
+    the properties of `User`.
+    """
 
+    # Always loaded, used by the row links.
+    projection_fields = ("id", "uuid")
 
-class UserList(AdminListView):
+    def get_column_annotations(self):
+        return {
+            "name": {
+                "_name": Concat(
+                    "first_name", Value(" "), "last_name", output_field=CharField()
+                )
+            },
+            "date_joined": {
+                "_has_password": Case(
+                    When(Q(password="") | Q(password__isnull=True), then=Value(False)),
+                    default=Value(True),
+                    output_field=BooleanField(),
+                )
+            },
+        }
+
+    def get_projection(self):
+        """Return the fields to load and the annotations to add."""
+        field_names = {field.attname for field in User._meta.concrete_fields}
+        column_annotations = self.get_column_annotations()
+
+        fields = list(self.projection_fields)
+        annotations = {}
+        for label, accessor in self.columns:
+            if accessor in field_names:
+                fields.append(accessor)
+            annotations.update(column_annotations.get(accessor, {}))
+        if self.get_keyset_pagination():
+            # The cursors are built from the sort key.
+            fields.extend(self.keyset_ordering)
+        return fields, annotations
+
+    def get_queryset(self):
+        fields, annotations = self.get_projection()
+        return super().get_queryset().annotate(**annotations).only(*fields)
+
+
+class UserList(UserListPaginationMixin, UserListProjectionMixin, AdminListView):
     columns = (
         ("Name", "name"),
         ("Email", "email"),
@@ -85,12 +166,15 @@ class UserList(AdminListView):
     row_click_action = "detail"
     row_actions = ["view"]
     filterset = UserFilter
+    count_segment = "user"
 
     def get_queryset(self):
         return super().get_queryset().exclude(Q(is_staff=True) | Q(is_superuser=True))
 
 
-class UserListStaff(AdminListView):
+class UserListStaff(
+    UserListPaginationMixin, UserListProjectionMixin, AdminListView
+):
     columns = (
         ("Name", "name"),
         ("Email", "email"),
@@ -103,6 +187,7 @@ class UserListStaff(AdminListView):
     row_click_action = "detail"
     row_actions = ["view"]
     filterset = UserFilter
+    count_segment = "staff"
 
     def check_user(self, user):
         if user.is_superuser:
@@ -114,7 +199,9 @@ class UserListStaff(AdminListView):
         return super().get_queryset().filter(is_staff=True).exclude(is_superuser=True)
 
 
-class UserListSuperuser(AdminListView):
+class UserListSuperuser(
+    UserListPaginationMixin, UserListProjectionMixin, AdminListView
+):
     columns = (
         ("Name", "name"),
         ("Email", "email"),
@@ -127,6 +214,7 @@ class UserListSuperuser(AdminListView):
     row_click_action = "detail"
     row_actions = ["view"]
     filterset = UserFilter
+    count_segment = "superuser"
 
     def check_user(self, user):
         if user.is_superuser:
@@ -138,7 +226,7 @@ class UserListSuperuser(AdminListView):
         return super().get_queryset().filter(is_superuser=True)
 
 
-class UserDetail(CheckUserMixin, AdminDetailView):
+class UserDetail(UserObjectMixin, CheckUserMixin, AdminDetailView):
     model = User
     fieldsets = [
         {
@@ -168,15 +256,20 @@ class UserDetail(CheckUserMixin, AdminDetailView):
         },
     ]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if settings.ACCOUNT_ENABLE_TWO_FACTOR:
+            # Shown by the security fieldset.
+            queryset = queryset.with_two_factor_status()
+        return queryset
+
     def get_fieldsets(self):
         fieldsets = self.fieldsets.copy()
 
         user = self.get_object()
 
-        if settings.ACCOUNT_PROFILE_MODEL:
-            app_label, model_name = settings.ACCOUNT_PROFILE_MODEL.split(".")
-            profile_class = apps.get_model(app_label=app_label, model_name=model_name)
-
+        profile_class = get_profile_model()
+        if profile_class is not None:
             try:
                 user.profile
                 has_profile = True
@@ -231,42 +324,7 @@ class UserCreate(AdminCreateView):
 
     @property
     def form_class(self):
-        try:
-            # This is here to throw an attribute error if it does not exist
-            if settings.ACCOUNT_PROFILE_MODEL:
-                module_name = ".".join(settings.ACCOUNT_PROFILE_FORM.split(".")[:-1])
-                form_name = settings.ACCOUNT_PROFILE_FORM.split(".")[-1]
-                module = importlib.import_module(module_name)
-
-                class TempMultiForm(MultiModelForm):
-                    form_classes = {
-                        "user": self.get_single_form_class(),
-                        "profile": getattr(module, form_name),
-                    }
-
-                    def save(self, commit=True):
-                        objects = super(TempMultiForm, self).save(commit=False)
-
-                        if commit:
-                            user = objects["user"]
-                            user.save()
-                            profile = objects["profile"]
-                            profile.user = user
-                            profile.save()
-
-                        return objects.get("user")
-
-                return TempMultiForm
-            else:
-                return self.get_single_form_class()
-        except AttributeError as e:
-            # Checks to see the attribute error is raised due to the setting
-            # not existing not due to the module not having the given form
-            if "'ACCOUNT_PROFILE_MODEL'" in str(e):
-                return self.get_single_form_class()
-            else:
-                # If the error is not due to a missing setting we fail loudly
-                raise
+        return get_user_form_class(self.get_single_form_class())
 
     def get_single_form_class(self):
         if self.request.user.is_superuser:
@@ -275,16 +333,17 @@ class UserCreate(AdminCreateView):
             return UserAddForm
 
 
-class UserUpdate(CheckUserMixin, AdminUpdateView):
+class UserUpdate(UserObjectMixin, CheckUserMixin, AdminUpdateView):
     model = User
 
     def form_valid(self, form):
-        previous_instance = self.get_object()
+        # The form updated the object, its initial data holds the saved state.
+        was_active = form.initial.get("is_active")
         response = super().form_valid(form)
 
         # If `is_active` change state from False to True, send the invitation
         if (
-            not previous_instance.is_active
+            not was_active
             and self.object.is_active
             and self.object.is_staff
         ):
@@ -301,7 +360,7 @@ class UserUpdate(CheckUserMixin, AdminUpdateView):
             return UserUpdateForm
 
 
-class UserInvite(CheckUserMixin, AdminUpdateView):
+class UserInvite(UserObjectMixin, CheckUserMixin, AdminUpdateView):
     model = User
     form_class = UserInviteForm
 
@@ -326,9 +385,23 @@ class UserInvite(CheckUserMixin, AdminUpdateView):
         return self.build_success_url()
 
 
-class UserDelete(AdminDeleteView):
+class UserDelete(UserObjectMixin, AdminDeleteView):
     model = User
 
+    def delete(self, request, *args, **kwargs):
+        if not settings.ACCOUNT_USER_DELETION_ASYNC:
+            return super().delete(request, *args, **kwargs)
+
+        self.object = self.get_object()
+        deletion.request_deletion(self.object, requested_by=request.user)
+        messages.success(
+            request,
+            "{} has been deactivated and will be deleted shortly.".format(
+                self.object
+            ),
+        )
+        return HttpResponseRedirect(self.get_success_url())
+
     def check_user(self, user):
         obj = self.get_object()
         if obj.is_superuser:
@@ -343,7 +416,7 @@ class UserDelete(AdminDeleteView):
         return False
 
 
-class UserChangePassword(CheckUserMixin, AdminUpdateView):
+class UserChangePassword(UserObjectMixin, CheckUserMixin, AdminUpdateView):
     model = User
     form_class = UserChangePasswordForm
 
@@ -357,3 +430,154 @@ class UserChangePassword(CheckUserMixin, AdminUpdateView):
         del kwargs["instance"]
         kwargs["user"] = self.get_object()
         return kwargs
+
+
+class UserExport(UserPassesTestMixin, View):
+    """Stream all the users as a CSV or JSON lines file.
+
+    The `format` query parameter is `csv` (default) or `jsonl`, `groups`,
+    `permissions` and `profile` add the matching columns when set to 1.
+    """
+
+    login_url = settings.ACCOUNT_ADMIN_LOGIN_URL
+
+    def test_func(self):
+        # The export includes staff and superusers, like their lists.
+        return self.request.user.is_superuser
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.GET.get("format", "csv")
+        if file_format not in exporter.FORMATS:
+            return HttpResponseBadRequest("Unknown export format.")
+
+        export = exporter.UserExport(
+            groups=request.GET.get("groups") == "1",
+            permissions=request.GET.get("permissions") == "1",
+            profile=request.GET.get("profile") == "1",
+        )
+        response = StreamingHttpResponse(
+            export.stream(file_format),
+            content_type=exporter.CONTENT_TYPES[file_format],
+        )
+        response["Content-Disposition"] = 'attachment; filename="users.{}"'.format(
+            file_format
+        )
+        return response
+
+
+class UserBulk(UserPassesTestMixin, View):
+    """Run a bulk action over selected users or a user list filter result.
+
+    The `action` applies to the `users` UUIDs selected in the `segment`
+    list, or to all its users matching `search` when `all` is 1. The group
+    actions take the `groups` primary keys. Invitations and larger
+    selections than `ACCOUNT_BULK_ACTION_SYNC_LIMIT` are run in the
+    background.
+    """
+
+    login_url = settings.ACCOUNT_ADMIN_LOGIN_URL
+    http_method_names = ["post"]
+
+    list_urls = {
+        "user": "account-admin:user-list",
+        "staff": "account-admin:user-list-staff",
+        "superuser": "account-admin:user-list-superuser",
+    }
+
+    def test_func(self):
+        user = self.request.user
+        return user.is_staff and user.has_perm("account.change_user")
+
+    def check_action(self, action, segment):
+        user = self.request.user
+        # Like the single user views, staff and superusers and their roles
+        # are managed by superusers.
+        if segment != "user" or action in ("add_groups", "remove_groups"):
+            return user.is_superuser
+        if action == "delete":
+            return user.has_perm("account.delete_user")
+        return True
+
+    def get_selection(self):
+        data = self.request.POST
+        selection = {
+            "segment": data.get("segment") or "user",
+            "search": data.get("search") or None,
+            # Users do not act on their own account.
+            "exclude": [self.request.user.pk],
+        }
+        if data.get("all") != "1":
+            try:
+                selection["uuids"] = [
+                    str(uuid.UUID(value)) for value in data.getlist("users")
+                ]
+            except ValueError:
+                return None
+        return selection
+
+    def post(self, request, *args, **kwargs):
+        action = request.POST.get("action")
+        if action not in bulk.ACTIONS:
+            return HttpResponseBadRequest("Unknown bulk action.")
+
+        selection = self.get_selection()
+        if selection is None or selection["segment"] not in self.list_urls:
+            return HttpResponseBadRequest("Invalid selection.")
+
+        try:
+            groups = {int(pk) for pk in request.POST.getlist("groups")}
+        except ValueError:
+            return HttpResponseBadRequest("Invalid groups.")
+        if groups and Group.objects.filter(pk__in=groups).count() != len(groups):
+            return HttpResponseBadRequest("Invalid groups.")
+        groups = sorted(groups)
+
+        if not self.check_action(action, selection["segment"]):
+            raise PermissionDenied
+
+        queryset = bulk.get_selection(**selection)
+        total = queryset.count()
+        if (
+            action in bulk.JOB_ACTIONS
+            or total > settings.ACCOUNT_BULK_ACTION_SYNC_LIMIT
+        ):
+            job = bulk.create_job(
+                action, selection, groups, created_by=request.user, total=total
+            )
+            messages.info(
+                request,
+                '{} users will be updated in the background. <a href="{}">'
+                "Progress</a>".format(
+                    total, reverse("account-admin:user-bulk-job", args=[job.pk])
+                ),
+            )
+        else:
+            affected = bulk.UserBulkAction(
+                action, groups=groups, requested_by=request.user
+            ).run(queryset)
+            messages.success(request, "{} of {} users updated.".format(affected, total))
+
+        return HttpResponseRedirect(reverse(self.list_urls[selection["segment"]]))
+
+
+class UserBulkJobDetail(UserPassesTestMixin, View):
+    """Return the progress of a bulk job as JSON."""
+
+    login_url = settings.ACCOUNT_ADMIN_LOGIN_URL
+
+    def test_func(self):
+        user = self.request.user
+        return user.is_staff and user.has_perm("account.change_user")
+
+    def get(self, request, *args, **kwargs):
+        job = get_object_or_404(UserBulkJob, pk=kwargs["pk"])
+        return JsonResponse(
+            {
+                "action": job.action,
+                "status": job.status,
+                "total": job.total,
+                "processed": job.processed,
+                "affected": job.affected,
+                "error": job.error,
+            }
+        )
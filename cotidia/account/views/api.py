@@ -1,5 +1,10 @@
+import csv
+import io
+import itertools
+import os
+
 from django.db import transaction
-from django.contrib.auth import authenticate, login as auth_login
+from django.contrib.auth import login as auth_login
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
@@ -7,23 +12,30 @@ from django.contrib.auth.tokens import default_token_generator as token_generato
 from django.urls import reverse
 
 from rest_framework import status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.generics import ListAPIView
+from rest_framework.permissions import BasePermission, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 
-from cotidia.account import signals
+from cotidia.account import importer, signals, tokens
 from cotidia.account.conf import settings
+from cotidia.account.hashing import get_hashing_pool
 from cotidia.account.serializers import (
     SignUpSerializer,
     SignInTokenSerializer,
     AuthenticateTokenSerializer,
+    RefreshTokenSerializer,
     UserSerializer,
+    UserListSerializer,
     ResetPasswordSerializer,
     SetPasswordSerializer,
     ChangePasswordSerializer,
 )
 from cotidia.account.models import User
 from cotidia.account.notices import ResetPasswordNotice
+from cotidia.account.pagination import KeysetPagination
 
 
 class SignUp(APIView):
@@ -59,10 +71,10 @@ class SignUp(APIView):
             if settings.ACCOUNT_FORCE_ACTIVATION is True:
                 user.send_activation_link(app=True)
 
-            token, created = Token.objects.get_or_create(user=user)
-
-            data = {"token": token.key}
-            data.update(user_serializer_class(token.user).data)
+            data = {"token": user.token.key}
+            if settings.ACCOUNT_ACCESS_TOKEN_ENABLED:
+                data.update(tokens.make_tokens(user))
+            data.update(user_serializer_class(user).data)
 
             signals.user_sign_up.send(sender=None, request=request, user=user)
 
@@ -100,16 +112,15 @@ class SignIn(APIView):
 
         if serializer.is_valid():
 
-            user = authenticate(
-                username=serializer.data["email"], password=serializer.data["password"]
-            )
+            # The serializer already authenticated the credentials, reuse its
+            # user rather than hashing the password a second time.
+            user = serializer.user
             auth_login(request, user)
 
-            token, created = Token.objects.get_or_create(user=user)
-
-            data = {"token": token.key}
-            user = user_serializer_class(token.user)
-            data.update(user.data)
+            data = {"token": user.token.key}
+            if settings.ACCOUNT_ACCESS_TOKEN_ENABLED:
+                data.update(tokens.make_tokens(user))
+            data.update(user_serializer_class(user).data)
 
             return Response(data)
 
@@ -190,25 +201,84 @@ class Authenticate(APIView):
         serializer = self.serializer_class(data=request.data)
 
         if serializer.is_valid():
-            try:
-                token = Token.objects.get(key=serializer.data["token"])
-            except Token.DoesNotExist:
-                return Response(
-                    {"message": "TOKEN_INVALID"}, status=status.HTTP_400_BAD_REQUEST
-                )
+            key = serializer.data["token"]
+
+            # Signed access tokens contain the `:` separator, database token
+            # keys never do. The user is loaded in both cases, to return its
+            # details and reject revoked access tokens.
+            if settings.ACCOUNT_ACCESS_TOKEN_ENABLED and ":" in key:
+                try:
+                    claims = tokens.verify_access_token(key)
+                    user = User.objects.get(pk=claims["uid"])
+                except (tokens.InvalidToken, User.DoesNotExist):
+                    return Response(
+                        {"message": "TOKEN_INVALID"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                if user.token_version != claims["ver"]:
+                    return Response(
+                        {"message": "TOKEN_INVALID"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+            else:
+                try:
+                    user = Token.objects.select_related("user").get(key=key).user
+                except Token.DoesNotExist:
+                    return Response(
+                        {"message": "TOKEN_INVALID"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
 
-            if not token.user.is_active:
+            if not user.is_active:
                 return Response(
                     {"message": "USER_INACTIVE"}, status=status.HTTP_400_BAD_REQUEST
                 )
 
-            user = user_serializer_class(token.user)
+            user = user_serializer_class(user)
 
             return Response(user.data)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class RefreshAccessToken(APIView):
+    """Exchange a refresh token for a new pair of signed tokens."""
+
+    authentication_classes = ()
+    permission_classes = ()
+    serializer_class = RefreshTokenSerializer
+
+    def post(self, request):
+
+        if settings.ACCOUNT_ACCESS_TOKEN_ENABLED is False:
+            return Response(
+                {"message": "ACCESS_TOKEN_DISABLED"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            user, data = tokens.refresh_tokens(serializer.data["refresh_token"])
+        except tokens.InvalidToken:
+            return Response(
+                {"message": "TOKEN_INVALID"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class RevokeAccessTokens(APIView):
+    """Revoke all the signed tokens issued to the current user."""
+
+    @transaction.atomic
+    def post(self, request):
+        tokens.revoke_tokens(request.user)
+
+        return Response({"message": "TOKENS_REVOKED"}, status=status.HTTP_200_OK)
+
+
 class ResetPassword(APIView):
     """Reset the password for an exiting user."""
 
@@ -222,7 +292,7 @@ class ResetPassword(APIView):
         serializer.is_valid(raise_exception=True)
 
         try:
-            user = User.objects.get(email=serializer.data["email"])
+            user = User.objects.get_by_email(serializer.data["email"])
         except User.DoesNotExist:
             user = None
 
@@ -307,7 +377,7 @@ class SetPassword(APIView):
         serializer.is_valid(raise_exception=True)
 
         # Set the new password
-        user.set_password(serializer.data["password1"])
+        get_hashing_pool().set_user_password(user, serializer.data["password1"])
         user.save()
 
         return Response({"message": "PASSWORD_SET"}, status=status.HTTP_200_OK)
@@ -342,7 +412,106 @@ class ChangePassword(APIView):
         serializer.is_valid(raise_exception=True)
 
         # Set the new password
-        request.user.set_password(serializer.data["password1"])
+        get_hashing_pool().set_user_password(
+            request.user, serializer.data["password1"]
+        )
         request.user.save()
 
         return Response({"message": "PASSWORD_CHANGED"}, status=status.HTTP_200_OK)
+
+
+class CanAddUsers(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.has_perm("account.add_user")
+
+
+class ImportUsers(APIView):
+    """Import users from an uploaded CSV or JSON lines file.
+
+    The file is sent as `file`, its format is guessed from its extension
+    unless `format` is given. Rows may also be posted as a JSON list under
+    `users`. Passwords are hashed in the request process, imports of more
+    than `ACCOUNT_IMPORT_SYNC_LIMIT` rows are refused and should use the
+    `import_users` management command instead.
+
+    The whole file is read and validated before any user is created.
+    """
+
+    permission_classes = (IsAuthenticated, CanAddUsers)
+
+    def post(self, request):
+        limit = settings.ACCOUNT_IMPORT_SYNC_LIMIT
+
+        upload = request.FILES.get("file")
+        if upload is not None:
+            file_format = request.data.get("format") or (
+                os.path.splitext(upload.name)[1].lstrip(".").lower()
+            )
+            if file_format not in importer.FORMATS:
+                return Response(
+                    {"message": "IMPORT_FORMAT_INVALID"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            rows = importer.read_rows(
+                io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline=""),
+                file_format,
+            )
+            try:
+                rows = list(itertools.islice(rows, limit + 1))
+            except (ValueError, csv.Error):
+                return Response(
+                    {"message": "IMPORT_FILE_INVALID"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        elif isinstance(request.data.get("users"), list):
+            rows = request.data["users"]
+        else:
+            return Response(
+                {"message": "IMPORT_FILE_MISSING"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(rows) > limit:
+            return Response(
+                {"message": "IMPORT_FILE_TOO_LARGE"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # A single chunk, the rows are all validated before the insert.
+        result = importer.UserImport(chunk_size=limit, workers=0).run(rows)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class CanChangeUsers(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_staff and request.user.has_perm("account.change_user")
+
+
+class UserList(ListAPIView):
+    """List the users like the admin lists, paged with a cursor.
+
+    The `role` query parameter selects the normal users (default), the
+    `staff` or the `superuser` list, the last two for superusers only.
+
+    The dynamic-list API of `cotidia.admin` only serves the groups here and
+    sorts by any column requested, which a fixed sort key can not page.
+    This endpoint is always sorted by `USER_ORDERING` instead.
+    """
+
+    permission_classes = (IsAuthenticated, CanChangeUsers)
+    serializer_class = UserListSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        role = self.request.query_params.get("role", "user")
+        queryset = User.objects.all()
+
+        if role == "user":
+            return queryset.filter(is_staff=False, is_superuser=False)
+
+        if not self.request.user.is_superuser:
+            raise PermissionDenied()
+        if role == "staff":
+            return queryset.filter(is_staff=True, is_superuser=False)
+        if role == "superuser":
+            return queryset.filter(is_superuser=True)
+        return queryset.none()
@@ -1,5 +1,6 @@
 import hashlib
 
+from django.db import IntegrityError
 from django.http import HttpResponseRedirect, Http404
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse
@@ -11,10 +12,11 @@ from django.contrib.auth.views import (
 )
 from django.contrib.auth.views import LogoutView as AuthLogoutView
 from django.contrib.auth.tokens import default_token_generator
-from django.contrib.auth import authenticate, login as auth_login
+from django.contrib.auth import login as auth_login
 from django.contrib import messages
 
 from cotidia.account.conf import settings
+from cotidia.account.hashing import get_hashing_pool
 
 from cotidia.account.forms import (
     UpdateDetailsForm,
@@ -94,50 +96,57 @@ def sign_up(
 
     if request.method == "POST":
         form = sign_up_form(request.POST)
+        form.defer_unique_email = True
         if form.is_valid():
             user = form.save(commit=False)
             # Hash the email address to generate a unique username
             m = hashlib.md5()
             m.update(form.cleaned_data["email"].encode('utf-8'))
             user.username = m.hexdigest()[0:30]
-            user.set_password(form.cleaned_data["password1"])
-            user.save()
+            get_hashing_pool().set_user_password(
+                user, form.cleaned_data["password1"]
+            )
 
             if settings.ACCOUNT_FORCE_ACTIVATION is True:
                 user.is_active = False
-                user.save()
-            else:
-                # Log the user straight away
-                new_user = authenticate(
-                    username=user.username,
-                    password=form.cleaned_data['password1']
-                )
-                auth_login(request, new_user)
-                messages.success(
-                    request, _('Your have successfully signed up'))
-
-            # Create and send the confirmation email
-            user.send_activation_link(app=False)
-
-            # Send the activation signals
-            signals.user_sign_up.send(
-                sender=None,
-                request=request,
-                user=user)
 
-            if settings.ACCOUNT_FORCE_ACTIVATION is True:
-                return HttpResponseRedirect(
-                    reverse(
-                        'account-public:activation-pending',
-                        kwargs={
-                            'uuid': user.uuid
-                        })
-                    )
-            elif success_url:
-                return HttpResponseRedirect(success_url)
+            try:
+                User.objects.insert(user)
+            except IntegrityError:
+                form.add_error('email', _('This email is already used.'))
             else:
-                return HttpResponseRedirect(
-                    reverse('account-public:dashboard'))
+                if settings.ACCOUNT_FORCE_ACTIVATION is not True:
+                    # Log the user straight away, its password was just set.
+                    auth_login(
+                        request,
+                        user,
+                        backend=settings.AUTHENTICATION_BACKENDS[0]
+                    )
+                    messages.success(
+                        request, _('Your have successfully signed up'))
+
+                # Create and send the confirmation email
+                user.send_activation_link(app=False)
+
+                # Send the activation signals
+                signals.user_sign_up.send(
+                    sender=None,
+                    request=request,
+                    user=user)
+
+                if settings.ACCOUNT_FORCE_ACTIVATION is True:
+                    return HttpResponseRedirect(
+                        reverse(
+                            'account-public:activation-pending',
+                            kwargs={
+                                'uuid': user.uuid
+                            })
+                        )
+                elif success_url:
+                    return HttpResponseRedirect(success_url)
+                else:
+                    return HttpResponseRedirect(
+                        reverse('account-public:dashboard'))
 
     context = {'form': form, 'success_url': success_url}
     return render(request, template_name, context)